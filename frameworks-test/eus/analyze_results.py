@@ -0,0 +1,112 @@
+import os
+import csv
+import sys
+import json
+import logging
+import argparse
+from modules.columnar_store import ResultStore
+from modules.run_comparison import RunComparison
+
+
+def print_rows(rows: list, output: str = None) -> None:
+    """Print rows as an aligned table, or write them to a CSV or JSON file."""
+    if output:
+        with open(output, 'w', newline='') as file:
+            if output.endswith('.json'):
+                json.dump(rows, file, indent=4)
+            else:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [])
+                writer.writeheader()
+                writer.writerows(rows)
+        logging.info(f"{len(rows)} rows written to {output}")
+        return
+    if not rows:
+        print("No rows.")
+        return
+    cells = [[f"{value:.4f}" if isinstance(value, float) else str(value) for value in row.values()] for row in rows]
+    widths = [max(len(name), *(len(cell[index]) for cell in cells)) for index, name in enumerate(rows[0])]
+    print('  '.join(name.ljust(width) for name, width in zip(rows[0], widths)))
+    for cell in cells:
+        print('  '.join(value.ljust(width) for value, width in zip(cell, widths)))
+
+
+def default_store_path(config_file: str) -> str:
+    """Return result_store.path of the configuration file, as test_rag_frameworks.py stores runs there, or the default store."""
+    if os.path.exists(config_file):
+        with open(config_file, 'r') as file:
+            path = json.load(file).get('result_store', {}).get('path')
+        if path:
+            return path
+    return './results/store'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store SCARF runs in the columnar result store and query them')
+    parser.add_argument('--config', type=str, default='./config.json', help='Path to the configuration file whose result_store.path is the default store')
+    parser.add_argument('--store', type=str, help='Directory of the columnar result store, by default result_store.path of the configuration file or ./results/store')
+    parser.add_argument('--loglevel', type=str, default='INFO', help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help='Add a run saved as JSON results to the store')
+    import_parser.add_argument('run_id', type=str, help='Id the run is stored under')
+    import_parser.add_argument('--results-dir', type=str, default='results', help='Directory of test_results.json and evaluation_results.json')
+
+    commands.add_parser('runs', help='List the stored runs')
+
+    aggregate_parser = commands.add_parser('aggregate', help='Score statistics by group, across runs')
+    aggregate_parser.add_argument('--by', type=str, nargs='+', default=['framework', 'filename', 'metric'], help='Columns to group by, e.g. run_id framework metric')
+    aggregate_parser.add_argument('--runs', type=str, nargs='+', help='Only these runs; all runs by default')
+    aggregate_parser.add_argument('--output', type=str, help='Write the rows to this CSV or JSON file instead of printing them')
+
+    latency_parser = commands.add_parser('latency', help='Question latency statistics by group, across runs')
+    latency_parser.add_argument('--by', type=str, nargs='+', default=['framework'], help='Columns to group by, e.g. run_id framework')
+    latency_parser.add_argument('--runs', type=str, nargs='+', help='Only these runs; all runs by default')
+    latency_parser.add_argument('--output', type=str, help='Write the rows to this CSV or JSON file instead of printing them')
+
+    compare_parser = commands.add_parser('compare', help='Score and latency deltas of runs against a baseline run; exits with 1 on a significant regression')
+    compare_parser.add_argument('baseline', type=str, help='Run id of the baseline')
+    compare_parser.add_argument('candidates', type=str, nargs='+', help='Run ids compared with the baseline')
+    compare_parser.add_argument('--by', type=str, nargs='+', default=['framework', 'metric'], help='Columns the deltas are grouped by, among framework, filename and metric')
+    compare_parser.add_argument('--resamples', type=int, default=2000, help='Bootstrap resamples of every confidence interval')
+    compare_parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals')
+    compare_parser.add_argument('--min-score-delta', type=float, default=0.02, help='Smallest mean score drop reported as a regression')
+    compare_parser.add_argument('--min-latency-delta', type=float, default=0.05, help='Smallest mean latency increase, in seconds, reported as a regression')
+    compare_parser.add_argument('--seed', type=int, default=0, help='Seed of the bootstrap, so reports are reproducible')
+    compare_parser.add_argument('--output', type=str, help='Write the rows to this CSV or JSON file instead of printing them')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.loglevel.upper(), logging.INFO), format='%(asctime)s - %(levelname)s - %(message)s')
+    args.store = args.store or default_store_path(args.config)
+    store = ResultStore(args.store)
+
+    if args.command == 'import':
+        results_path = os.path.join(args.results_dir, 'test_results.json')
+        evaluations_path = os.path.join(args.results_dir, 'evaluation_results.json')
+        if not os.path.exists(results_path) and not os.path.exists(evaluations_path):
+            logging.error(f"No test_results.json or evaluation_results.json in {args.results_dir}.")
+            sys.exit(1)
+        store.import_json(args.run_id, results_path, evaluations_path)
+    elif args.command == 'runs':
+        for run_id in store.runs():
+            print(run_id)
+    elif args.command == 'aggregate':
+        print_rows(store.aggregate(by=args.by, runs=args.runs), args.output)
+    elif args.command == 'latency':
+        print_rows(store.latency(by=args.by, runs=args.runs), args.output)
+    elif args.command == 'compare':
+        missing = [run_id for run_id in [args.baseline] + args.candidates if run_id not in store.runs()]
+        if missing:
+            logging.error(f"Runs {missing} are not in the store {args.store}.")
+            sys.exit(2)
+        comparison = RunComparison(store, args.baseline, args.candidates, by=args.by, resamples=args.resamples, confidence=args.confidence, min_score_delta=args.min_score_delta, min_latency_delta=args.min_latency_delta, seed=args.seed)
+        rows = comparison.compare()
+        print_rows(rows, args.output)
+        regressions = comparison.regressions(rows)
+        for row in regressions:
+            group = ', '.join(f"{key}={row[key]}" for key in args.by if row.get(key) is not None)
+            print(f"REGRESSION: {row['candidate']} {row['measure']} ({group}) changed by {row['delta']:+.4f}, {args.confidence:.0%} CI [{row['ci_low']:+.4f}, {row['ci_high']:+.4f}]")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
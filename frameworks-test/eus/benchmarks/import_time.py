@@ -0,0 +1,84 @@
+"""Measure the startup cost of the SCARF command line tools and fail when it regresses.
+
+Run from frameworks-test/eus:
+    python benchmarks/import_time.py                 # check against the budgets
+    python benchmarks/import_time.py --save-baseline benchmarks/import_baseline.json
+    python benchmarks/import_time.py --baseline benchmarks/import_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded before a framework or the evaluator is actually used
+DEFERRED_MODULES = ['deepeval', 'aiohttp', 'requests', 'modules.evaluator_gpt', 'modules.cheshirecat_api', 'modules.anythingllm_api']
+
+COMMANDS = {
+    'import test_rag_frameworks': [sys.executable, '-c', 'import test_rag_frameworks'],
+    'test_rag_frameworks.py --help': [sys.executable, 'test_rag_frameworks.py', '--help'],
+    'script_gpt.py --help': [sys.executable, 'script_gpt.py', '--help'],
+}
+
+
+def time_command(command: list, repeats: int) -> float:
+    """Return the median wall time of a command, in seconds."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def loaded_deferred_modules(module: str) -> list:
+    """Return the deferred modules that importing module loads."""
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    loaded = json.loads(output.strip().splitlines()[-1])
+    return [name for name in DEFERRED_MODULES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import-time benchmark of the SCARF command line tools')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per command; the median is reported')
+    parser.add_argument('--max-seconds', type=float, default=2.0, help='Absolute budget of every command')
+    parser.add_argument('--baseline', type=str, help='JSON file of previous timings to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed slowdown against the baseline, as a fraction')
+    parser.add_argument('--save-baseline', type=str, help='Write the measured timings to this JSON file')
+    args = parser.parse_args()
+
+    failures = []
+    eager = loaded_deferred_modules('test_rag_frameworks')
+    if eager:
+        failures.append(f"test_rag_frameworks eagerly imports {eager}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    timings = {}
+    for name, command in COMMANDS.items():
+        timings[name] = time_command(command, args.repeats)
+        print(f"{name}: {timings[name] * 1000:.0f} ms")
+        if timings[name] > args.max_seconds:
+            failures.append(f"{name} took {timings[name]:.2f}s, budget is {args.max_seconds}s")
+        if name in baseline and timings[name] > baseline[name] * (1 + args.tolerance):
+            failures.append(f"{name} took {timings[name]:.2f}s, baseline is {baseline[name]:.2f}s")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(timings, file, indent=4)
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
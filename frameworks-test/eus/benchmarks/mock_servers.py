@@ -0,0 +1,459 @@
+"""Offline stand-ins for the CheshireCat and AnythingLLM APIs, with configurable latency and failure rate.
+
+Run from frameworks-test/eus, then point base_url in config.json at the printed address:
+    python benchmarks/mock_servers.py --framework cheshirecat --port 1865
+    python benchmarks/mock_servers.py --framework anythingllm --port 3001 --latency-ms 800 --distribution lognormal --failure-rate 0.02
+
+Streamed answers wait for the message latency before the first token and for --token-latency-ms between tokens.
+"""
+import re
+import base64
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+
+DISTRIBUTIONS = ['fixed', 'uniform', 'lognormal', 'exponential']
+FRAMEWORKS = ['cheshirecat', 'anythingllm']
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WORDS = "retrieval augmented generation answers questions from document chunks stored in a vector database".split()
+
+
+class LatencyModel:
+    def __init__(self, median_ms: float = 0.0, distribution: str = 'fixed', sigma: float = 0.5, seed: Optional[int] = None):
+        """Initialize a latency distribution with the given median, in milliseconds."""
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'. Expected one of {DISTRIBUTIONS}.")
+        self.median = median_ms / 1000
+        self.distribution = distribution
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """Return a latency, in seconds."""
+        if self.median <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == 'uniform':
+                return self._random.uniform(0, 2 * self.median)
+            if self.distribution == 'lognormal':
+                return self.median * math.exp(self._random.gauss(0, self.sigma))
+            if self.distribution == 'exponential':
+                # The median of an exponential distribution is ln(2) / rate
+                return self._random.expovariate(math.log(2) / self.median)
+        return self.median
+
+
+def mock_answer(question: str, words: int) -> str:
+    """Return a deterministic answer of the given number of words."""
+    seed = int(hashlib.sha256(question.encode('utf-8')).hexdigest()[:8], 16)
+    return ' '.join(WORDS[(seed + index) % len(WORDS)] for index in range(words)).capitalize() + '.'
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; with Nagle on, keep-alive clients wait for a delayed ACK on every response
+    disable_nagle_algorithm = True
+    # (method, path pattern, handler name, whether the route is slow and can fail)
+    ROUTES: List[Tuple[str, str, str, bool]] = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method: str) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        path = self.path.split('?', 1)[0]
+        for route_method, pattern, name, slow in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send(404, {'error': f"No mock route for {method} {path}"})
+        mock = self.server.mock
+        if slow:
+            time.sleep(mock.latency_for(name).sample())
+            if mock.should_fail(name):
+                return self._send(mock.failure_status, {'error': 'Injected mock failure'})
+        mock.count(name)
+        reply = getattr(self, f"handle_{name}")(body, **match.groupdict())
+        # Streaming handlers write their response themselves
+        if reply is not None:
+            self._send(*reply)
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        content = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _stream_tokens(self, answer: str, send) -> None:
+        """Send the words of an answer one by one, waiting for the token latency between them."""
+        for index, token in enumerate(re.findall(r'\S+\s*', answer)):
+            if index:
+                time.sleep(self.server.mock.token_latency.sample())
+            send(token)
+
+    def _write_chunk(self, data: bytes) -> None:
+        """Write one chunk of a chunked response; an empty chunk ends it."""
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+
+    def _read_frame(self) -> bytes:
+        """Read one masked websocket frame sent by the client."""
+        header = self.rfile.read(2)
+        length = header[1] & 0x7f
+        if length == 126:
+            length = int.from_bytes(self.rfile.read(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(self.rfile.read(8), 'big')
+        mask = self.rfile.read(4) if header[1] & 0x80 else b'\0\0\0\0'
+        return bytes(byte ^ mask[index % 4] for index, byte in enumerate(self.rfile.read(length)))
+
+    def _write_frame(self, payload: bytes, opcode: int = 0x1) -> None:
+        """Write one unmasked websocket frame, text by default."""
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x80 | opcode, length])
+        elif length < 65536:
+            header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, 'big')
+        else:
+            header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, 'big')
+        self.wfile.write(header + payload)
+
+    def _uploaded_file(self, body: bytes) -> Tuple[str, int]:
+        """Return the file name and size of a multipart upload."""
+        match = re.search(rb'filename="([^"]+)"\r\n(?:[^\r\n]+\r\n)*\r\n', body)
+        if not match:
+            return 'unknown', len(body)
+        return match.group(1).decode('utf-8', 'replace'), len(body) - match.end()
+
+
+class CheshireCatHandler(MockHandler):
+    ROUTES = [
+        ('POST', r'/auth/token', 'token', False),
+        ('GET', r'/status', 'status', False),
+        ('POST', r'/rabbithole/', 'upload', True),
+        ('POST', r'/message', 'message', True),
+        ('GET', r'/ws/(?P<user>[^/]+)', 'stream', False),
+        ('GET', r'/memory/collections/declarative/points', 'points', False),
+        ('GET', r'/memory/collections', 'collections', False),
+        ('DELETE', r'/memory/collections/declarative', 'wipe', False),
+    ]
+
+    def handle_token(self, body: bytes):
+        return 200, {'access_token': uuid.uuid4().hex, 'token_type': 'bearer'}
+
+    def handle_status(self, body: bytes):
+        return 200, {'status': 'We\'re all mad here, dear!', 'version': 'mock'}
+
+    def handle_upload(self, body: bytes):
+        source, size = self._uploaded_file(body)
+        chunk_size = re.search(rb'name="chunk_size"\r\n\r\n(\d+)', body)
+        chunk_overlap = re.search(rb'name="chunk_overlap"\r\n\r\n(\d+)', body)
+        step = max(1, int(chunk_size.group(1) if chunk_size else 512) - int(chunk_overlap.group(1) if chunk_overlap else 64))
+        self.server.mock.add_document(source, max(1, math.ceil(size / step)))
+        return 200, {'filename': source, 'content_type': 'application/octet-stream', 'info': 'File is being ingested asynchronously'}
+
+    def handle_message(self, body: bytes):
+        # Like the Cat, the conversation history belongs to the user
+        return 200, self._chat(json.loads(body or b'{}').get('text', ''), self.headers.get('user_id', 'user'))
+
+    def handle_stream(self, body: bytes, user: str):
+        """Answer a message sent over the websocket of a user with chat_token messages, then the chat message."""
+        accept = base64.b64encode(hashlib.sha1((self.headers.get('Sec-WebSocket-Key', '') + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+        question = json.loads(self._read_frame() or b'{}').get('text', '')
+        mock = self.server.mock
+        time.sleep(mock.latency.sample())
+        if mock.should_fail('stream'):
+            self._write_frame(json.dumps({'type': 'error', 'name': 'MockFailure', 'description': 'Injected mock failure'}).encode('utf-8'))
+        else:
+            message = self._chat(question, user)
+            self._stream_tokens(message['content'], lambda token: self._write_frame(json.dumps({'type': 'chat_token', 'content': token}).encode('utf-8')))
+            self._write_frame(json.dumps(message).encode('utf-8'))
+        self._write_frame(b'', opcode=0x8)
+
+    def _chat(self, question: str, user: str) -> Dict[str, Any]:
+        memories = [{'page_content': chunk, 'metadata': {'source': source}} for source, chunk in self.server.mock.recall(question)]
+        answer = mock_answer(question, self.server.mock.answer_words)
+        prompt_tokens, completion_tokens = self.server.mock.converse(user, question, answer)
+        return {
+            'type': 'chat',
+            'content': answer,
+            'why': {
+                'input': question,
+                'memory': {'declarative': memories, 'episodic': [], 'procedural': []},
+                'model_interactions': [{'model_type': 'llm', 'input_tokens': prompt_tokens, 'output_tokens': completion_tokens}]
+            }
+        }
+
+    def handle_points(self, body: bytes):
+        points = [{'id': f"{source}-{index}", 'payload': {'metadata': {'source': source}}} for source, count in self.server.mock.documents().items() for index in range(count)]
+        return 200, {'points': points, 'next_offset': None}
+
+    def handle_collections(self, body: bytes):
+        return 200, {'collections': [{'name': 'declarative', 'vectors_count': sum(self.server.mock.documents().values())}]}
+
+    def handle_wipe(self, body: bytes):
+        self.server.mock.clear()
+        return 200, {'deleted': {'declarative': True}}
+
+
+class AnythingLLMHandler(MockHandler):
+    ROUTES = [
+        ('GET', r'/api/v1/auth', 'auth', False),
+        ('POST', r'/api/v1/document/upload', 'upload', True),
+        ('POST', r'/api/v1/workspace/new', 'new_workspace', False),
+        ('POST', r'/api/v1/workspace/(?P<slug>[^/]+)/chat', 'chat', True),
+        ('POST', r'/api/v1/workspace/(?P<slug>[^/]+)/stream-chat', 'stream_chat', True),
+        ('POST', r'/api/v1/workspace/(?P<slug>[^/]+)/update-embeddings', 'embed', False),
+        ('GET', r'/api/v1/workspace/(?P<slug>[^/]+)', 'workspace', False),
+        ('DELETE', r'/api/v1/workspace/(?P<slug>[^/]+)', 'delete_workspace', False),
+        ('GET', r'/api/v1/system/vector-count', 'vector_count', False),
+        ('GET', r'/api/v1/admin/system-preferences', 'get_preferences', False),
+        ('POST', r'/api/v1/admin/system-preferences', 'preferences', False),
+    ]
+
+    def handle_auth(self, body: bytes):
+        return 200, {'authenticated': True}
+
+    def handle_upload(self, body: bytes):
+        name, size = self._uploaded_file(body)
+        location = f"custom-documents/{name}-{uuid.uuid4()}.json"
+        self.server.mock.uploads[location] = (name, max(1, math.ceil(size / 1000)))
+        return 200, {'success': True, 'error': None, 'documents': [{'location': location, 'title': name, 'wordCount': size // 6}]}
+
+    def handle_chat(self, body: bytes, slug: str):
+        return 200, self._chat(json.loads(body or b'{}'), slug)
+
+    def handle_stream_chat(self, body: bytes, slug: str):
+        """Answer with server-sent events: one textResponseChunk per token, then a closing event with the sources and metrics."""
+        reply = self._chat(json.loads(body or b'{}'), slug)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_event(event):
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+
+        self._stream_tokens(reply['textResponse'], lambda token: send_event({'id': reply['id'], 'type': 'textResponseChunk', 'textResponse': token, 'sources': [], 'close': False, 'error': False}))
+        send_event({**reply, 'type': 'finalizeResponseStream', 'textResponse': None, 'close': True, 'error': False})
+        self._write_chunk(b'')
+
+    def _chat(self, payload: Dict[str, Any], slug: str) -> Dict[str, Any]:
+        question = payload.get('message', '')
+        recalled = self.server.mock.recall(question)
+        answer = mock_answer(question, self.server.mock.answer_words)
+        prompt_tokens, completion_tokens = self.server.mock.converse(f"{slug}/{payload.get('sessionId')}", question, answer)
+        return {
+            'id': str(uuid.uuid4()),
+            'type': 'textResponse',
+            'textResponse': answer,
+            'metrics': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+            'sources': [{'title': source, 'text': chunk} for source, chunk in recalled],
+            # SCARF's AnythingLLM adapter reads the retrieval context from this key
+            'source': [chunk for _, chunk in recalled],
+            'close': True,
+            'error': None
+        }
+
+    def handle_embed(self, body: bytes, slug: str):
+        for location in json.loads(body or b'{}').get('adds', []):
+            if location in self.server.mock.uploads:
+                self.server.mock.add_document(*self.server.mock.uploads[location])
+        return 200, {'workspace': {'slug': slug}}
+
+    def handle_workspace(self, body: bytes, slug: str):
+        documents = [{'filename': f"{source}.json", 'metadata': json.dumps({'title': source})} for source in self.server.mock.documents()]
+        return 200, {'workspace': [{'slug': slug, 'documents': documents}]}
+
+    def handle_new_workspace(self, body: bytes):
+        name = json.loads(body or b'{}').get('name', 'workspace')
+        return 200, {'workspace': {'slug': re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')}, 'message': None}
+
+    def handle_delete_workspace(self, body: bytes, slug: str):
+        self.server.mock.clear()
+        return 200, {}
+
+    def handle_vector_count(self, body: bytes):
+        return 200, {'vectorCount': sum(self.server.mock.documents().values())}
+
+    def handle_get_preferences(self, body: bytes):
+        return 200, {'settings': dict(self.server.mock.preferences)}
+
+    def handle_preferences(self, body: bytes):
+        self.server.mock.preferences.update(json.loads(body or b'{}'))
+        return 200, {'success': True, 'error': None}
+
+
+HANDLERS = {'cheshirecat': CheshireCatHandler, 'anythingllm': AnythingLLMHandler}
+
+
+class MockServer:
+    def __init__(self, framework: str, host: str = '127.0.0.1', port: int = 0, latency: Optional[LatencyModel] = None, upload_latency: Optional[LatencyModel] = None, token_latency: Optional[LatencyModel] = None, failure_rate: float = 0.0, failure_status: int = 500, answer_words: int = 40, context_chunks: int = 3, seed: Optional[int] = None):
+        """Initialize a mock server; messages wait for latency, uploads for upload_latency, streamed tokens for token_latency, and either fails with failure_rate."""
+        if framework not in HANDLERS:
+            raise ValueError(f"Unknown framework '{framework}'. Expected one of {FRAMEWORKS}.")
+        self.framework = framework
+        self.latency = latency or LatencyModel()
+        self.upload_latency = upload_latency or LatencyModel()
+        self.token_latency = token_latency or LatencyModel()
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.answer_words = answer_words
+        self.context_chunks = context_chunks
+        self.uploads: Dict[str, Tuple[str, int]] = {}
+        self._documents: Dict[str, int] = {}
+        self._history: Dict[str, int] = {}
+        self.preferences: Dict[str, Any] = {'text_splitter_chunk_size': 1000, 'text_splitter_chunk_overlap': 20}
+        self._counts: Dict[str, int] = {}
+        self._failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), HANDLERS[framework])
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockServer':
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f"mock-{self.framework}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.stop()
+
+    def latency_for(self, route: str) -> LatencyModel:
+        return self.upload_latency if route == 'upload' else self.latency
+
+    def should_fail(self, route: str) -> bool:
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self._failures += 1
+            return failed
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+
+    def add_document(self, source: str, chunks: int) -> None:
+        with self._lock:
+            self._documents[source] = chunks
+
+    def documents(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._documents)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+
+    def converse(self, session: str, question: str, answer: str) -> Tuple[int, int]:
+        """Add a turn to the history of a session and return its prompt and completion tokens, counted as words."""
+        prompt_tokens, completion_tokens = len(question.split()), len(answer.split())
+        with self._lock:
+            history = self._history.get(session, 0)
+            self._history[session] = history + prompt_tokens + completion_tokens
+        return history + prompt_tokens, completion_tokens
+
+    def recall(self, question: str) -> List[Tuple[str, str]]:
+        """Return the (source, chunk) pairs retrieved for a question, chosen deterministically among the ingested chunks."""
+        documents = self.documents()
+        if not documents:
+            return []
+        sources = sorted(documents)
+        seed = int(hashlib.sha256(question.encode('utf-8')).hexdigest()[:8], 16)
+        recalled = []
+        for index in range(self.context_chunks):
+            source = sources[(seed + index) % len(sources)]
+            chunk = (seed + index) % documents[source]
+            recalled.append((source, self._chunks_of(source, chunk)))
+        return recalled
+
+    @staticmethod
+    def _chunks_of(source: str, index: int) -> str:
+        return f"Chunk {index} of {source}: " + mock_answer(f"{source}/{index}", 20)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of served requests per route and of injected failures."""
+        with self._lock:
+            return {'requests': dict(self._counts), 'failures': self._failures, 'sessions': len(self._history)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline mock of a RAG framework API')
+    parser.add_argument('--framework', type=str, choices=FRAMEWORKS, required=True, help='API to mock')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=0, help='Port to listen on; 0 picks a free one')
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Median latency of a message')
+    parser.add_argument('--upload-latency-ms', type=float, default=500.0, help='Median latency of a document upload')
+    parser.add_argument('--token-latency-ms', type=float, default=20.0, help='Median latency between two tokens of a streamed answer')
+    parser.add_argument('--distribution', type=str, choices=DISTRIBUTIONS, default='lognormal', help='Latency distribution')
+    parser.add_argument('--sigma', type=float, default=0.5, help='Spread of the lognormal distribution')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of messages and uploads answered with failure-status')
+    parser.add_argument('--failure-status', type=int, default=500, help='HTTP status of an injected failure')
+    parser.add_argument('--answer-words', type=int, default=40, help='Length of the mock answers')
+    parser.add_argument('--seed', type=int, help='Seed of the latency and failure draws')
+    args = parser.parse_args()
+
+    server = MockServer(
+        args.framework,
+        host=args.host,
+        port=args.port,
+        latency=LatencyModel(args.latency_ms, args.distribution, args.sigma, args.seed),
+        upload_latency=LatencyModel(args.upload_latency_ms, args.distribution, args.sigma, args.seed),
+        token_latency=LatencyModel(args.token_latency_ms, args.distribution, args.sigma, args.seed),
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        answer_words=args.answer_words,
+        seed=args.seed
+    )
+    print(f"Mock {args.framework} API listening on {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
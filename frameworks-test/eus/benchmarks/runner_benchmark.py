@@ -0,0 +1,204 @@
+"""Measure SCARF's own overhead against the offline mock servers and fail when it regresses.
+
+Three things are measured, with no live framework or judge:
+- runner throughput: questions per second and overhead per question over the mock latency, per framework, client and concurrency
+- memory: peak traced allocations of a whole suite, per question
+- evaluation scheduling: overhead per job of the evaluator around a judge of fixed latency
+
+Run from frameworks-test/eus:
+    python benchmarks/runner_benchmark.py
+    python benchmarks/runner_benchmark.py --questions 500 --save-baseline benchmarks/runner_baseline.json
+    python benchmarks/runner_benchmark.py --baseline benchmarks/runner_baseline.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from argparse import Namespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import FRAMEWORKS, LatencyModel, MockServer
+from modules.evaluator_gpt import EvaluatorGPT
+from modules.local_metrics import LocalScorer
+from modules.question_dataset import write_questions
+from test_rag_frameworks import run_framework_suite
+
+# Whether a larger value of a measure is better, for the baseline comparison
+HIGHER_IS_BETTER = {'questions_per_sec': True, 'overhead_ms': False, 'peak_kb_per_question': False, 'jobs_per_sec': True}
+
+
+class NullJudgeEvaluator(EvaluatorGPT):
+    def __init__(self, judge_seconds: float, **kwargs):
+        """Initialize an evaluator whose judge only waits, so the time left is the evaluator's own scheduling."""
+        super().__init__(api_key=None, **kwargs)
+        self.judge_seconds = judge_seconds
+
+    def create_judge(self):
+        return None
+
+    def get_metric(self, name: str, judge=None):
+        return name
+
+    def create_test_case(self, input: str, output: str, expected_output=None, rag_output=None):
+        return (input, output, expected_output, rag_output)
+
+    def evaluate_test_cases(self, test_cases, metric):
+        time.sleep(self.judge_seconds)
+        return 1.0, "Null judge."
+
+
+def write_dataset(folder: str, questions: int, documents: int) -> str:
+    """Write documents and a question file asking about them; return the question file path."""
+    file_names = [f"doc{index}.md" for index in range(documents)]
+    for file_name in file_names:
+        with open(os.path.join(folder, file_name), 'w') as file:
+            file.write(f"# {file_name}\n\n" + "SCARF benchmarks RAG frameworks. " * 200)
+    records = ({'file': file_names[index % documents] if documents else '', 'question': f"Question {index} about the document?", 'expected_answer': f"Answer {index}", 'tags': ['benchmark']} for index in range(questions))
+    path = os.path.join(folder, 'questions.jsonl')
+    write_questions(records, path)
+    return path
+
+
+def suite_config(framework: str, url: str, folder: str, concurrency: int) -> dict:
+    """Return a configuration pointing a framework at a mock server."""
+    section = {'base_url': url, 'api_key_file_path': os.devnull, 'max_concurrency': concurrency, 'http': {'pool_size': max(10, concurrency), 'max_retries': 0}}
+    if framework == 'cheshirecat':
+        section.update(username='user', password='user')
+    else:
+        section['workspace_slug'] = 'benchmark'
+    return {framework: section, 'dataset': {'path': folder, 'file_names': []}, 'ingestion': {'enabled': False}}
+
+
+def run_suite(framework: str, mode: str, concurrency: int, questions_file: str, folder: str, latency: LatencyModel, trace_memory: bool = False) -> dict:
+    """Run a whole test suite against a fresh mock server and return its measures."""
+    with MockServer(framework, latency=latency, upload_latency=LatencyModel(0)) as server:
+        config = suite_config(framework, server.url, folder, concurrency)
+        args = Namespace(async_clients=mode == 'async', replay_mode='off', replay_dir='', questions_file=questions_file, shard=None, no_upload=False, username=None, password=None, session_mode=None, conversations=None, stream_answers=False)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        results = run_framework_suite(framework, config, args, {framework: 'benchmark'})
+        duration = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    answered = len(results)
+    # Uploads answer at once, so the ideal suite only waits for the message latency, spread over the concurrent slots
+    ideal = answered * latency.median / concurrency
+    measures = {
+        'questions': answered,
+        'errors': sum(1 for result in results if 'error' in result['full_response']),
+        'duration': round(duration, 4),
+        'questions_per_sec': round(answered / duration, 2) if duration else None,
+        'overhead_ms': round(max(0.0, duration - ideal) / answered * 1000, 3) if answered else None
+    }
+    if trace_memory:
+        measures['peak_kb_per_question'] = round(peak / 1024 / answered, 2) if answered else None
+    return measures
+
+
+def run_evaluation(results: list, workers: int, judge_ms: float, local_metrics: bool) -> dict:
+    """Evaluate interactions with the null judge and return the scheduling overhead per job."""
+    evaluator = NullJudgeEvaluator(judge_ms / 1000, max_workers=workers, local_scorer=LocalScorer() if local_metrics else None)
+    started = time.perf_counter()
+    records = evaluator.evaluate_model(results)
+    duration = time.perf_counter() - started
+    judged = sum(1 for record in records if record['metric'] in evaluator.metrics_quality_response + evaluator.metrics_rag)
+    ideal = judged * judge_ms / 1000 / workers
+    return {
+        'jobs': len(records),
+        'duration': round(duration, 4),
+        'jobs_per_sec': round(len(records) / duration, 2) if duration else None,
+        'overhead_ms': round(max(0.0, duration - ideal) / len(records) * 1000, 3) if records else None
+    }
+
+
+def synthetic_results(framework: str, count: int) -> list:
+    """Return interactions shaped like the runner results, for the evaluation benchmark."""
+    if framework == 'cheshirecat':
+        full_response = {'status_code': 200, 'data': {'content': 'An answer.', 'why': {'memory': {'declarative': [{'page_content': 'A retrieved chunk.'}]}}}}
+    else:
+        full_response = {'status_code': 200, 'data': {'textResponse': 'An answer.', 'source': ['A retrieved chunk.']}}
+    return [{'framework': framework, 'filename': 'doc.md', 'file_path': 'doc.md', 'question': f"Question {index}?", 'text_response': 'An answer.', 'full_response': full_response, 'expected_response': 'An answer.'} for index in range(count)]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return the measures of the report that regressed beyond the tolerance."""
+    failures = []
+    for scenario, measures in report.items():
+        for name, value in measures.items():
+            previous = baseline.get(scenario, {}).get(name)
+            if name not in HIGHER_IS_BETTER or value is None or not previous:
+                continue
+            if HIGHER_IS_BETTER[name] and value < previous * (1 - tolerance):
+                failures.append(f"{scenario} {name} is {value}, baseline is {previous}")
+            elif not HIGHER_IS_BETTER[name] and value > previous * (1 + tolerance):
+                failures.append(f"{scenario} {name} is {value}, baseline is {previous}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runner, memory and evaluation scheduling benchmark of SCARF against mock servers')
+    parser.add_argument('--frameworks', type=str, nargs='+', choices=FRAMEWORKS, default=FRAMEWORKS, help='Frameworks to mock')
+    parser.add_argument('--modes', type=str, nargs='+', choices=['sync', 'async'], default=['sync', 'async'], help='Clients to run; async is skipped when aiohttp is missing')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='max_concurrency levels of the runner')
+    parser.add_argument('--questions', type=int, default=200, help='Questions per suite')
+    parser.add_argument('--documents', type=int, default=2, help='Documents uploaded before the questions')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Fixed latency of every mock message')
+    parser.add_argument('--eval-workers', type=int, default=8, help='Evaluator max_workers')
+    parser.add_argument('--judge-ms', type=float, default=5.0, help='Latency of the null judge')
+    parser.add_argument('--baseline', type=str, help='JSON report of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed regression against the baseline, as a fraction')
+    parser.add_argument('--save-baseline', type=str, help='Write the report to this JSON file')
+    parser.add_argument('--loglevel', type=str, default='WARNING', help='Logging level of the runner')
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, args.loglevel.upper(), logging.WARNING), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    modes = list(args.modes)
+    if 'async' in modes:
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            print("aiohttp is not installed, skipping the async client.")
+            modes.remove('async')
+
+    report = {}
+    latency = LatencyModel(args.latency_ms, 'fixed')
+    with tempfile.TemporaryDirectory() as folder:
+        questions_file = write_dataset(folder, args.questions, args.documents)
+        for framework in args.frameworks:
+            for mode in modes:
+                for concurrency in args.concurrency:
+                    name = f"runner {framework} {mode} c={concurrency}"
+                    report[name] = run_suite(framework, mode, concurrency, questions_file, folder, latency)
+                    print(f"{name}: {report[name]['questions_per_sec']} q/s, {report[name]['overhead_ms']} ms overhead per question, {report[name]['errors']} errors")
+            name = f"memory {framework} sync c={max(args.concurrency)}"
+            report[name] = run_suite(framework, 'sync', max(args.concurrency), questions_file, folder, latency, trace_memory=True)
+            print(f"{name}: {report[name]['peak_kb_per_question']} KB peak per question")
+
+        for local_metrics in (False, True):
+            name = f"evaluation workers={args.eval_workers}" + (" local metrics" if local_metrics else "")
+            report[name] = run_evaluation(synthetic_results(args.frameworks[0], args.questions), args.eval_workers, args.judge_ms, local_metrics)
+            print(f"{name}: {report[name]['jobs_per_sec']} jobs/s, {report[name]['overhead_ms']} ms overhead per job")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(report, file, indent=4)
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            failures = compare(report, json.load(file), args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import logging
+import importlib
+import threading
+from abc import ABC, abstractmethod
+from importlib import metadata
+from typing import Any, Dict, List
+from modules.credentials import get_api_key
+
+ENTRY_POINT_GROUP = 'scarf.adapters'
+
+# Built-in adapters, as "module:attribute" so that they are only imported when used
+BUILTIN_ADAPTERS = {
+    'cheshirecat': 'modules.cheshirecat_adapter:CheshireCatAdapter',
+    'anythingllm': 'modules.anythingllm_adapter:AnythingLLMAdapter',
+}
+
+_adapters = {}
+_lock = threading.Lock()
+
+
+class FrameworkAdapter(ABC):
+    """Everything SCARF needs to know about a framework: how to build its client and how to read its responses."""
+    name = None
+
+    @abstractmethod
+    def create_client(self, config: Dict[str, Any], args, api_keys: Dict[str, str], recorder=None, asynchronous: bool = False):
+        """Create the sync or async API client of the framework from its configuration section."""
+
+    @abstractmethod
+    def parse_response(self, full_response: Dict[str, Any]) -> Any:
+        """Return the text answer of a framework response."""
+
+    @abstractmethod
+    def extract_context(self, full_response: Dict[str, Any]) -> List[str]:
+        """Return the retrieval context of a framework response."""
+
+    def token_usage(self, full_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the prompt_tokens and completion_tokens of a response, when the framework reports them."""
+        return {}
+
+    def resolve_api_key(self, config: Dict[str, Any], api_keys: Dict[str, str]) -> str:
+        """Return the API key given on the command line, or read it from the configured file."""
+        api_key = api_keys.get(self.name)
+        if not api_key:
+            api_key = get_api_key(config[self.name]['api_key_file_path'])
+        logging.debug(f"{self.name} api_key: {api_key}")
+        return api_key
+
+
+def _entry_points() -> Dict[str, Any]:
+    """Return the adapter entry points installed by other packages, without loading them."""
+    try:
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, 'select'):
+            found = entry_points.select(group=ENTRY_POINT_GROUP)
+        else:
+            found = entry_points.get(ENTRY_POINT_GROUP, [])
+    except Exception as e:
+        logging.warning(f"Cannot read the {ENTRY_POINT_GROUP} entry points: {e}")
+        return {}
+    return {entry_point.name: entry_point for entry_point in found}
+
+
+def available_adapters() -> List[str]:
+    """Return the names of the built-in and installed adapters."""
+    names = list(BUILTIN_ADAPTERS)
+    names.extend(name for name in _entry_points() if name not in BUILTIN_ADAPTERS)
+    return names
+
+
+def get_adapter(name: str) -> FrameworkAdapter:
+    """Return the adapter of a framework, importing its module on first use."""
+    with _lock:
+        adapter = _adapters.get(name)
+        if adapter is None:
+            adapter = _load_adapter(name)
+            _adapters[name] = adapter
+        return adapter
+
+
+def _load_adapter(name: str) -> FrameworkAdapter:
+    if name in BUILTIN_ADAPTERS:
+        module_name, attribute = BUILTIN_ADAPTERS[name].split(':')
+        target = getattr(importlib.import_module(module_name), attribute)
+    else:
+        entry_point = _entry_points().get(name)
+        if entry_point is None:
+            raise ValueError(f"Unknown framework '{name}'. Available adapters: {available_adapters()}")
+        target = entry_point.load()
+    # An incomplete adapter is reported when it is loaded, not halfway through a suite
+    if isinstance(target, type):
+        if not issubclass(target, FrameworkAdapter):
+            raise TypeError(f"Adapter '{name}' ({target.__module__}.{target.__qualname__}) must subclass modules.adapter_registry.FrameworkAdapter.")
+        missing = sorted(target.__abstractmethods__)
+        if missing:
+            raise TypeError(f"Adapter '{name}' ({target.__module__}.{target.__qualname__}) does not implement {', '.join(missing)}.")
+        adapter = target()
+    elif isinstance(target, FrameworkAdapter):
+        adapter = target
+    else:
+        raise TypeError(f"Adapter '{name}' must be a FrameworkAdapter subclass or instance, got {type(target).__name__}.")
+    adapter.name = adapter.name or name
+    logging.debug(f"Loaded adapter {name}: {adapter.__class__.__name__}")
+    return adapter
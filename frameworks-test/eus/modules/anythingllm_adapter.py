@@ -0,0 +1,28 @@
+from typing import Any, Dict, List
+from modules.adapter_registry import FrameworkAdapter
+
+
+class AnythingLLMAdapter(FrameworkAdapter):
+    name = 'anythingllm'
+
+    def create_client(self, config: Dict[str, Any], args, api_keys: Dict[str, str], recorder=None, asynchronous: bool = False):
+        """Create the AnythingLLM API client from configuration and command line arguments."""
+        if asynchronous:
+            from modules.anythingllm_async_api import AsyncAnythingLLMAPI as client_class
+        else:
+            from modules.anythingllm_api import AnythingLLMAPI as client_class
+        section = config[self.name]
+        return client_class(base_url=section['base_url'], api_key=self.resolve_api_key(config, api_keys), workspace_slug=section['workspace_slug'], recorder=recorder, http_config=section.get('http'))
+
+    def parse_response(self, full_response: Dict[str, Any]) -> Any:
+        """Return the text answer of a workspace chat response."""
+        return full_response.get('data', {}).get('textResponse', {})
+
+    def extract_context(self, full_response: Dict[str, Any]) -> List[str]:
+        """Return the sources the workspace chat cited."""
+        return list(full_response.get('data', {}).get('source', []))
+
+    def token_usage(self, full_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the token counts of the chat metrics, reported by recent AnythingLLM versions."""
+        metrics = full_response.get('data', {}).get('metrics') or {}
+        return {'prompt_tokens': metrics.get('prompt_tokens'), 'completion_tokens': metrics.get('completion_tokens')}
@@ -1,16 +1,43 @@
 import os
+import json
+import time
 import requests
 import logging
 import mimetypes
 from typing import Dict, Any, Optional
+from modules.http_session import HttpSession
+from modules.latency_report import stream_timing, timing_from_response
+from modules.response_recorder import ResponseRecorder
+
+
+def parse_workspace_documents(data: Dict[str, Any]) -> Dict[str, int]:
+    """Return the documents of a workspace response, keyed by their original file name."""
+    workspace = data.get('workspace', {})
+    # Depending on the AnythingLLM version the workspace is returned alone or in a list
+    if isinstance(workspace, list):
+        workspace = workspace[0] if workspace else {}
+    documents = {}
+    for document in workspace.get('documents', []):
+        metadata = document.get('metadata', {})
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                metadata = {}
+        name = metadata.get('title') or document.get('filename')
+        if name:
+            documents[name] = documents.get(name, 0) + 1
+    return documents
 
 
 class AnythingLLMAPI:
-    def __init__(self, base_url: str, api_key: str, workspace_slug: str):
+    def __init__(self, base_url: str, api_key: str, workspace_slug: str, recorder: Optional[ResponseRecorder] = None, http_config: Optional[Dict[str, Any]] = None):
         logging.info("Starting AnythingLLM API Client")
         self.base_url = base_url
         self.api_key = api_key
         self.workspace_slug = workspace_slug
+        self.recorder = recorder
+        self.http = HttpSession(**(http_config or {}))
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'accept': 'application/json'
@@ -61,38 +88,197 @@ class AnythingLLMAPI:
 
         logging.info(f"Sending message to AnythingLLM: {message}")
         response = self._post_request(url, payload=payload)
+        timing = response.pop('timing', {})
         if response.get('status_code') == 200:
             logging.info(f"Message sent successfully: {message}")
         else:
             logging.error(f"Failed to send message: {message}")
-        return {'text_response': response.get('data', {}).get('textResponse', {}), 'full_response': response}
+        return {'text_response': response.get('data', {}).get('textResponse', {}), 'full_response': response, 'timing': timing}
+
+    def stream_message(self, message: str, mode: str = "chat", session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a message to the workspace and read the answer token by token from the streaming chat endpoint."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}/stream-chat"
+        payload = {
+            "message": message,
+            "mode": mode,
+            "sessionId": session_id if session_id else "default-session"
+        }
+
+        logging.info(f"Streaming message to AnythingLLM: {message}")
+        response = self._stream_request(url, payload=payload)
+        timing = response.pop('timing', {})
+        if response.get('status_code') == 200:
+            logging.info(f"Message streamed successfully: {message}")
+        else:
+            logging.error(f"Failed to stream message: {message}")
+        return {'text_response': response.get('data', {}).get('textResponse', {}), 'full_response': response, 'timing': timing}
+
+    def list_documents(self) -> Dict[str, Any]:
+        """List the documents embedded in the workspace, keyed by their original file name."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}"
+        response = self._get_request(url)
+        if 'error' in response:
+            return response
+        return {'documents': parse_workspace_documents(response.get('data', {}))}
+
+    def embed_document(self, upload_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed uploaded documents into the workspace."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}/update-embeddings"
+        locations = [document['location'] for document in upload_response.get('data', {}).get('documents', []) if document.get('location')]
+        if not locations:
+            return {'error': 'No uploaded document to embed'}
+        logging.info(f"Embedding {len(locations)} document(s) into workspace '{self.workspace_slug}'...")
+        return self._post_request(url, payload={"adds": locations, "deletes": []})
+
+    def get_chunking(self) -> Dict[str, Any]:
+        """Return the current text splitter chunking of document uploads."""
+        url = f"{self.base_url}/api/v1/admin/system-preferences"
+        response = self._get_request(url)
+        if 'error' in response:
+            return response
+        settings = response.get('data', {}).get('settings', {})
+        return {'chunk_size': settings.get('text_splitter_chunk_size'), 'chunk_overlap': settings.get('text_splitter_chunk_overlap')}
+
+    def set_chunking(self, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+        """Set the text splitter chunking of the next document uploads; it is a system-wide AnythingLLM setting."""
+        url = f"{self.base_url}/api/v1/admin/system-preferences"
+        payload = {"text_splitter_chunk_size": chunk_size, "text_splitter_chunk_overlap": chunk_overlap}
+        logging.info(f"Setting AnythingLLM chunking to {chunk_size}/{chunk_overlap}...")
+        return self._post_request(url, payload=payload)
+
+    def isolate_collection(self, name: str, allow_wipe: bool = False) -> Dict[str, Any]:
+        """Create a new workspace and send the next uploads and messages to it; nothing is wiped, so allow_wipe is not needed."""
+        url = f"{self.base_url}/api/v1/workspace/new"
+        response = self._post_request(url, payload={"name": name})
+        slug = response.get('data', {}).get('workspace', {}).get('slug')
+        if 'error' in response or not slug:
+            logging.error(f"Failed to create workspace '{name}'.")
+            return response if 'error' in response else {'error': f"Workspace '{name}' was not created"}
+        logging.info(f"Created workspace '{slug}'.")
+        self.workspace_slug = slug
+        return response
+
+    def delete_workspace(self, slug: str) -> Dict[str, Any]:
+        """Delete a workspace and its embeddings."""
+        url = f"{self.base_url}/api/v1/workspace/{slug}"
+        logging.info(f"Deleting workspace '{slug}'...")
+        return self._delete_request(url)
+
+    def count_vectors(self) -> Dict[str, Any]:
+        """Return the number of vectors in the whole vector database."""
+        url = f"{self.base_url}/api/v1/system/vector-count"
+        response = self._get_request(url)
+        if 'error' in response:
+            return response
+        return {'vector_count': response.get('data', {}).get('vectorCount')}
 
     def _get_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Internal method to handle GET requests."""
+        fingerprint = self.recorder.fingerprint('GET', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
         try:
             combined_headers = {**self.headers, **(headers or {})}
-            response = requests.get(url, headers=combined_headers)
+            response = self.http.request('GET', url, headers=combined_headers)
             response.raise_for_status()
             logging.info(f"GET request to {url} successful.")
-            return {"status_code": response.status_code, "data": response.json()}
+            result = {"status_code": response.status_code, "data": response.json()}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
         except requests.RequestException as e:
             logging.error(f"GET request to {url} failed: {e}")
-            return {'error': str(e)}
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
 
     def _post_request(self, url: str, payload: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Internal method to handle POST requests."""
+        fingerprint = self.recorder.fingerprint('POST', url, payload=payload, files=files, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
         try:
             combined_headers = {**self.headers, **(headers or {})}
             if files:
-                response = requests.post(url, headers=combined_headers, files=files)
+                response = self.http.request('POST', url, headers=combined_headers, files=files, idempotent=True)
             else:
-                response = requests.post(url, headers=combined_headers, json=payload)
+                response = self.http.request('POST', url, headers=combined_headers, json=payload)
             response.raise_for_status()
             logging.info(f"POST request to {url} successful.")
-            return {"status_code": response.status_code, "data": response.json()}
+            result = {"status_code": response.status_code, "data": response.json()}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
         except requests.RequestException as e:
             logging.error(f"POST request to {url} failed: {e}")
-            return {'error': str(e)}
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
         except ValueError as e:
             logging.error(f"Failed to parse JSON response from {url}: {e}")
-            return {'error': f"Failed to parse response: {e}"}
+            return {'error': f"Failed to parse response: {e}", 'timing': timing_from_response(started, response)}
+
+    def _stream_request(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Internal method to handle a POST request answered with server-sent events, merging them into one chat response."""
+        fingerprint = self.recorder.fingerprint('POST', url, payload=payload) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
+        arrivals, chunks, data, size = [], [], {}, 0
+        response, failure = None, None
+        try:
+            combined_headers = {**self.headers, 'accept': 'text/event-stream'}
+            response = self.http.request('POST', url, headers=combined_headers, json=payload, stream=True)
+            with response:
+                response.raise_for_status()
+                # chunk_size=None yields every chunk of the chunked response as soon as it arrives
+                for line in response.iter_lines(chunk_size=None):
+                    size += len(line)
+                    if not line.startswith(b'data:'):
+                        continue
+                    event = json.loads(line[len(b'data:'):])
+                    # An aborted stream is a failed request, not a truncated answer
+                    if event.get('type') == 'abort' or event.get('error'):
+                        failure = event.get('error') or 'Stream aborted by the server'
+                        break
+                    chunk = event.pop('textResponse', None)
+                    if chunk:
+                        arrivals.append(time.perf_counter())
+                        chunks.append(chunk)
+                    # The last events carry the sources, the close flag and the metrics of the answer
+                    data.update(event)
+            if failure:
+                logging.error(f"Streaming POST request to {url} failed: {failure}")
+                return {'error': str(failure), 'timing': stream_timing(started, arrivals, response.status_code, response.elapsed.total_seconds(), size)}
+            logging.info(f"Streaming POST request to {url} successful.")
+            result = {"status_code": response.status_code, "data": {**data, 'textResponse': ''.join(chunks)}}
+            result['timing'] = stream_timing(started, arrivals, response.status_code, response.elapsed.total_seconds(), size)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
+        except requests.RequestException as e:
+            logging.error(f"Streaming POST request to {url} failed: {e}")
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
+        except ValueError as e:
+            logging.error(f"Failed to parse streamed event from {url}: {e}")
+            return {'error': f"Failed to parse response: {e}", 'timing': stream_timing(started, arrivals, response.status_code if response is not None else None)}
+
+    def _delete_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle DELETE requests."""
+        fingerprint = self.recorder.fingerprint('DELETE', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            response = self.http.request('DELETE', url, headers=combined_headers)
+            response.raise_for_status()
+            logging.info(f"DELETE request to {url} successful.")
+            result = {"status_code": response.status_code}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
+        except requests.RequestException as e:
+            logging.error(f"DELETE request to {url} failed: {e}")
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
@@ -0,0 +1,164 @@
+import os
+import time
+import asyncio
+import json
+import logging
+import mimetypes
+from functools import partial
+from typing import Dict, Any, Optional
+from modules.anythingllm_api import parse_workspace_documents
+from modules.async_http_session import AsyncHttpSession, AsyncHttpError
+from modules.latency_report import build_timing
+from modules.response_recorder import ResponseRecorder
+
+
+class AsyncAnythingLLMAPI:
+    def __init__(self, base_url: str, api_key: str, workspace_slug: str, recorder: Optional[ResponseRecorder] = None, http_config: Optional[Dict[str, Any]] = None):
+        logging.info("Starting async AnythingLLM API Client")
+        self.base_url = base_url
+        self.api_key = api_key
+        self.workspace_slug = workspace_slug
+        self.recorder = recorder
+        self.http = AsyncHttpSession(**(http_config or {}))
+        self.headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'accept': 'application/json'
+        }
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def connect(self) -> 'AsyncAnythingLLMAPI':
+        """Verify authentication before the client is used."""
+        await self.verify_auth()
+        return self
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session."""
+        await self.http.close()
+
+    async def verify_auth(self) -> Dict[str, Any]:
+        """Verify authentication using the API key."""
+        url = f"{self.base_url}/api/v1/auth"
+        logging.info("Verifying authentication with AnythingLLM...")
+        response = await self._get_request(url)
+        if response.get('status_code') == 200:
+            logging.info("Authentication verified successfully.")
+        else:
+            logging.error("Authentication failed.")
+        return response
+
+    async def upload_document(self, file_path: str) -> Dict[str, Any]:
+        """Upload a document to the workspace for processing."""
+        url = f"{self.base_url}/api/v1/document/upload"
+        file_name = os.path.basename(file_path)
+        content_type, _ = mimetypes.guess_type(file_path)
+        if not content_type:
+            content_type = "application/octet-stream"
+
+        logging.info(f"Uploading document '{file_name}' to AnythingLLM...")
+        try:
+            file = open(file_path, 'rb')
+        except IOError as e:
+            logging.error(f"Document upload failed: {e}")
+            return {'error': str(e)}
+
+        # The file is streamed from its handle rather than read into memory
+        with file:
+            files = {'file': (file_name, file, content_type)}
+            response = await self._post_request(url, files=files)
+        if response.get('status_code') == 200 and response.get('data', {}).get('success'):
+            logging.info(f"Document '{file_name}' uploaded successfully.")
+        else:
+            logging.error(f"Failed to upload document '{file_name}': {response.get('data', {}).get('error', 'Unknown error')}")
+        return response
+
+    async def send_message(self, message: str, mode: str = "chat", session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a message to the workspace."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}/chat"
+        payload = {
+            "message": message,
+            "mode": mode,
+            "sessionId": session_id if session_id else "default-session"
+        }
+
+        logging.info(f"Sending message to AnythingLLM: {message}")
+        response = await self._post_request(url, payload=payload)
+        timing = response.pop('timing', {})
+        if response.get('status_code') == 200:
+            logging.info(f"Message sent successfully: {message}")
+        else:
+            logging.error(f"Failed to send message: {message}")
+        return {'text_response': response.get('data', {}).get('textResponse', {}), 'full_response': response, 'timing': timing}
+
+    async def list_documents(self) -> Dict[str, Any]:
+        """List the documents embedded in the workspace, keyed by their original file name."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}"
+        response = await self._get_request(url)
+        if 'error' in response:
+            return response
+        return {'documents': parse_workspace_documents(response.get('data', {}))}
+
+    async def embed_document(self, upload_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Embed uploaded documents into the workspace."""
+        url = f"{self.base_url}/api/v1/workspace/{self.workspace_slug}/update-embeddings"
+        locations = [document['location'] for document in upload_response.get('data', {}).get('documents', []) if document.get('location')]
+        if not locations:
+            return {'error': 'No uploaded document to embed'}
+        logging.info(f"Embedding {len(locations)} document(s) into workspace '{self.workspace_slug}'...")
+        return await self._post_request(url, payload={"adds": locations, "deletes": []})
+
+    async def _get_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle GET requests."""
+        # The recorder reads and writes files, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        fingerprint = self.recorder.fingerprint('GET', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return await loop.run_in_executor(None, self.recorder.replay, fingerprint)
+        started = time.perf_counter()
+        status_code, content, ttfb = None, b'', None
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            status_code, content, ttfb = await self.http.request('GET', url, headers=combined_headers)
+            logging.info(f"GET request to {url} successful.")
+            result = {"status_code": status_code, "data": json.loads(content)}
+            result['timing'] = build_timing(started, status_code, ttfb, len(content))
+            if fingerprint:
+                await loop.run_in_executor(None, self.recorder.record, fingerprint, result)
+            return result
+        except AsyncHttpError as e:
+            logging.error(f"GET request to {url} failed: {e}")
+            return {'error': str(e), 'timing': build_timing(started, e.status_code)}
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON response from {url}: {e}")
+            return {'error': f"Failed to parse response: {e}", 'timing': build_timing(started, status_code, ttfb, len(content))}
+
+    async def _post_request(self, url: str, payload: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle POST requests."""
+        loop = asyncio.get_running_loop()
+        fingerprint = await loop.run_in_executor(None, partial(self.recorder.fingerprint, 'POST', url, payload=payload, files=files, headers=headers)) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return await loop.run_in_executor(None, self.recorder.replay, fingerprint)
+        started = time.perf_counter()
+        status_code, content, ttfb = None, b'', None
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            if files:
+                status_code, content, ttfb = await self.http.request('POST', url, headers=combined_headers, files=files, idempotent=True)
+            else:
+                status_code, content, ttfb = await self.http.request('POST', url, headers=combined_headers, json=payload)
+            logging.info(f"POST request to {url} successful.")
+            result = {"status_code": status_code, "data": json.loads(content)}
+            result['timing'] = build_timing(started, status_code, ttfb, len(content))
+            if fingerprint:
+                await loop.run_in_executor(None, self.recorder.record, fingerprint, result)
+            return result
+        except AsyncHttpError as e:
+            logging.error(f"POST request to {url} failed: {e}")
+            return {'error': str(e), 'timing': build_timing(started, e.status_code)}
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON response from {url}: {e}")
+            return {'error': f"Failed to parse response: {e}", 'timing': build_timing(started, status_code, ttfb, len(content))}
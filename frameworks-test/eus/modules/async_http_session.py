@@ -0,0 +1,95 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+from modules.http_session import IDEMPOTENT_METHODS, NOT_PROCESSED_STATUS_CODES, RETRY_STATUS_CODES, backoff_delay
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncHttpError(Exception):
+    """Raised when an async request fails or returns an error status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncHttpSession:
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10.0, read_timeout: float = 300.0, max_retries: int = 3, backoff_factor: float = 0.5, max_backoff: float = 30.0):
+        """Initialize the settings of a non-blocking pooled session with timeouts and retries."""
+        if aiohttp is None:
+            raise ImportError("The async clients require aiohttp. Install it with `pip install aiohttp`.")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self._session = None
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, json: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, idempotent: Optional[bool] = None) -> Tuple[int, bytes, float]:
+        """Send a request with retry and backoff, returning the status code, the body and the time to first byte.
+
+        As in HttpSession, a non-idempotent request is only retried when it never reached the server or got a 429.
+        """
+        session = self._get_session()
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else NOT_PROCESSED_STATUS_CODES
+        attempt = 0
+        while True:
+            try:
+                body = self._build_form(data, files) if files else None
+                sent = time.perf_counter()
+                async with session.request(method, url, headers=headers, json=None if files else json, data=body) as response:
+                    ttfb = time.perf_counter() - sent
+                    content = await response.read()
+                    if response.status not in retry_status_codes or attempt >= self.max_retries:
+                        if response.status >= 400:
+                            raise AsyncHttpError(f"{response.status} Error for url: {url}", status_code=response.status)
+                        return response.status, content, ttfb
+                    delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff, response.headers.get('Retry-After'))
+                    logging.warning(f"{method} request to {url} returned {response.status}, retrying in {delay:.2f}s...")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries or not (idempotent or self._not_sent(e)):
+                    raise AsyncHttpError(f"{method} request to {url} failed: {e!r}") from e
+                delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff)
+                logging.warning(f"{method} request to {url} failed ({e!r}), retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self) -> None:
+        """Close the underlying session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    @staticmethod
+    def _not_sent(error: Exception) -> bool:
+        """Return whether a failed request never reached the server, because the connection could not be established."""
+        not_sent = (aiohttp.ClientConnectorError,)
+        if hasattr(aiohttp, 'ConnectionTimeoutError'):
+            not_sent += (aiohttp.ConnectionTimeoutError,)
+        return isinstance(error, not_sent)
+
+    @staticmethod
+    def _build_form(data: Optional[Dict[str, Any]], files: Dict[str, Any]):
+        """Build a multipart form from plain fields and (file_name, file, content_type) tuples, streaming each file from its handle."""
+        form = aiohttp.FormData()
+        for name, value in (data or {}).items():
+            form.add_field(name, str(value))
+        for name, (file_name, file, content_type) in files.items():
+            file.seek(0)
+            form.add_field(name, file, filename=file_name, content_type=content_type)
+        return form
@@ -0,0 +1,34 @@
+from typing import Any, Dict, List
+from modules.adapter_registry import FrameworkAdapter
+
+
+class CheshireCatAdapter(FrameworkAdapter):
+    name = 'cheshirecat'
+
+    def create_client(self, config: Dict[str, Any], args, api_keys: Dict[str, str], recorder=None, asynchronous: bool = False):
+        """Create the CheshireCat API client from configuration and command line arguments."""
+        if asynchronous:
+            from modules.cheshirecat_async_api import AsyncCheshireCatAPI as client_class
+        else:
+            from modules.cheshirecat_api import CheshireCatAPI as client_class
+        section = config[self.name]
+        username = args.username if args.username else section['username']
+        password = args.password if args.password else section['password']
+        return client_class(base_url=section['base_url'], api_key=self.resolve_api_key(config, api_keys), username=username, password=password, recorder=recorder, http_config=section.get('http'), chunk_size=section.get('chunk_size', 512), chunk_overlap=section.get('chunk_overlap', 64))
+
+    def parse_response(self, full_response: Dict[str, Any]) -> Any:
+        """Return the text answer of a /message response."""
+        return full_response.get('data', {}).get('content', {})
+
+    def extract_context(self, full_response: Dict[str, Any]) -> List[str]:
+        """Return the declarative memories the Cat recalled to answer."""
+        memories = full_response.get('data', {}).get('why', {}).get('memory', {}).get('declarative', [])
+        return [memory.get('page_content', '') for memory in memories]
+
+    def token_usage(self, full_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the token counts of the model interactions of the answer, reported by recent Cat versions."""
+        interactions = full_response.get('data', {}).get('why', {}).get('model_interactions') or []
+        llm_calls = [interaction for interaction in interactions if interaction.get('model_type') == 'llm']
+        if not llm_calls:
+            return {'prompt_tokens': None, 'completion_tokens': None}
+        return {'prompt_tokens': sum(call.get('input_tokens') or 0 for call in llm_calls), 'completion_tokens': sum(call.get('output_tokens') or 0 for call in llm_calls)}
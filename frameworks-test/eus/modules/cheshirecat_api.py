@@ -1,18 +1,37 @@
 import os
+import re
 import json
+import time
 import requests
 import logging
 import mimetypes
 from typing import Dict, Any, Optional
+from urllib.parse import quote
+from modules.http_session import HttpSession
+from modules.latency_report import stream_timing, timing_from_response
+from modules.response_recorder import ResponseRecorder
+
+
+def _require_websocket_client():
+    # websocket-client is only needed to stream answers, so it is imported when a message is streamed
+    try:
+        import websocket
+    except ImportError:
+        raise ImportError("Streaming Cheshire Cat answers needs websocket-client: pip install websocket-client")
+    return websocket
 
 
 class CheshireCatAPI:
-    def __init__(self, base_url: str, api_key: str, username: str, password: str):
+    def __init__(self, base_url: str, api_key: str, username: str, password: str, recorder: Optional[ResponseRecorder] = None, http_config: Optional[Dict[str, Any]] = None, chunk_size: int = 512, chunk_overlap: int = 64):
         logging.info("Starting CheshireCat API Client")
         self.base_url = base_url
         self.api_key = api_key
         self.username = username
         self.password = password
+        self.recorder = recorder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.http = HttpSession(**(http_config or {}))
         self.jwt = self._get_jwt_token()
         self.headers = {
             'Authorization': f'Bearer {self.jwt}',
@@ -21,11 +40,14 @@ class CheshireCatAPI:
 
     def _get_jwt_token(self) -> str:
         """Retrieve JWT token using username and password."""
+        if self.recorder and self.recorder.replaying:
+            logging.info("Replay mode: skipping JWT token retrieval.")
+            return "replay"
         url = f"{self.base_url}/auth/token"
         payload = {"username": self.username, "password": self.password}
         headers = {"Content-Type": "application/json"}
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.http.request('POST', url, json=payload, headers=headers, idempotent=True)
             response.raise_for_status()
             logging.info("JWT token retrieved successfully.")
             return response.json()["access_token"]
@@ -49,8 +71,8 @@ class CheshireCatAPI:
         }
 
         payload = {
-            "chunk_size": 512,
-            "chunk_overlap": 64,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
             "metadata": json.dumps(metadata)
         }
 
@@ -68,18 +90,35 @@ class CheshireCatAPI:
             logging.error(f"Document upload failed: {e}")
             return {'error': str(e)}
 
-    def send_message(self, message: str) -> Dict[str, Any]:
-        """Send a message to the Cheshire Cat system."""
+    def send_message(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a message to the Cheshire Cat system, in the conversation of the given session when one is given."""
         url = f"{self.base_url}/message"
         payload = {"text": message}
+        # The Cat keeps one conversation history per user, so a session is a user id
+        headers = {'user_id': session_id} if session_id else None
 
         logging.info(f"Sending message to Cheshire Cat: {message}")
-        response = self._post_request(url, payload=payload)
+        response = self._post_request(url, payload=payload, headers=headers)
+        timing = response.pop('timing', {})
         if response.get('status_code') == 200:
             logging.info(f"Message sent successfully: {message}")
         else:
             logging.error(f"Failed to send message: {message}")
-        return {'text_response': response.get('data', {}).get('content', {}), 'full_response': response}
+        return {'text_response': response.get('data', {}).get('content', {}), 'full_response': response, 'timing': timing}
+
+    def stream_message(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a message over the Cheshire Cat websocket and read the answer token by token."""
+        # The websocket path names the user, whose conversation history is the session
+        url = f"{re.sub(r'^http', 'ws', self.base_url)}/ws/{quote(session_id or 'user', safe='')}"
+
+        logging.info(f"Streaming message to Cheshire Cat: {message}")
+        response = self._websocket_request(url, payload={"text": message})
+        timing = response.pop('timing', {})
+        if response.get('status_code') == 200:
+            logging.info(f"Message streamed successfully: {message}")
+        else:
+            logging.error(f"Failed to stream message: {message}")
+        return {'text_response': response.get('data', {}).get('content', {}), 'full_response': response, 'timing': timing}
 
     def get_status(self) -> Dict[str, Any]:
         """Check the status of the Cheshire Cat system."""
@@ -87,29 +126,152 @@ class CheshireCatAPI:
         logging.info("Checking status of Cheshire Cat system...")
         return self._get_request(url)
 
+    def list_documents(self) -> Dict[str, Any]:
+        """List the sources held in the declarative memory with their number of chunks."""
+        documents = {}
+        offset = None
+        while True:
+            url = f"{self.base_url}/memory/collections/declarative/points?limit=1000"
+            if offset is not None:
+                url += f"&offset={quote(str(offset))}"
+            response = self._get_request(url)
+            if 'error' in response:
+                return response
+            data = response.get('data', {})
+            for point in data.get('points', []):
+                source = point.get('payload', {}).get('metadata', {}).get('source')
+                if source:
+                    documents[source] = documents.get(source, 0) + 1
+            offset = data.get('next_offset')
+            if offset is None:
+                return {'documents': documents}
+
+    def get_chunking(self) -> Dict[str, Any]:
+        """Return the chunking of the next document uploads."""
+        return {'chunk_size': self.chunk_size, 'chunk_overlap': self.chunk_overlap}
+
+    def set_chunking(self, chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
+        """Set the chunking of the next document uploads."""
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        return {'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap}
+
+    def isolate_collection(self, name: str, allow_wipe: bool = False) -> Dict[str, Any]:
+        """Empty the declarative memory, the only collection the Cat ingests into, so the next uploads are measured alone; refused unless allow_wipe is set."""
+        if not allow_wipe:
+            logging.error("Refusing to wipe the declarative memory of Cheshire Cat without --allow-wipe.")
+            return {'error': "Wiping the declarative memory was not allowed, pass --allow-wipe to confirm"}
+        url = f"{self.base_url}/memory/collections/declarative"
+        logging.warning(f"Wiping the declarative memory of Cheshire Cat for '{name}'...")
+        return self._delete_request(url)
+
+    def count_vectors(self) -> Dict[str, Any]:
+        """Return the number of vectors in the declarative memory."""
+        url = f"{self.base_url}/memory/collections"
+        response = self._get_request(url)
+        if 'error' in response:
+            return response
+        for collection in response.get('data', {}).get('collections', []):
+            if collection.get('name') == 'declarative':
+                return {'vector_count': collection.get('vectors_count')}
+        return {'vector_count': 0}
+
     def _get_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Internal method to handle GET requests."""
+        fingerprint = self.recorder.fingerprint('GET', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
         try:
             combined_headers = {**self.headers, **(headers or {})}
-            response = requests.get(url, headers=combined_headers)
+            response = self.http.request('GET', url, headers=combined_headers)
             response.raise_for_status()
             logging.info(f"GET request to {url} successful.")
-            return {"status_code": response.status_code, "data": response.json()}
+            result = {"status_code": response.status_code, "data": response.json()}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
         except requests.RequestException as e:
             logging.error(f"GET request to {url} failed: {e}")
-            return {'error': str(e)}
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
 
     def _post_request(self, url: str, payload: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """Internal method to handle POST requests."""
+        fingerprint = self.recorder.fingerprint('POST', url, payload=payload, files=files, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
         try:
             combined_headers = {**self.headers, **(headers or {})}
             if files:
-                response = requests.post(url, headers=combined_headers, files=files, data=payload)
+                response = self.http.request('POST', url, headers=combined_headers, files=files, data=payload, idempotent=True)
             else:
-                response = requests.post(url, headers=combined_headers, json=payload)
+                response = self.http.request('POST', url, headers=combined_headers, json=payload)
             response.raise_for_status()
             logging.info(f"POST request to {url} successful.")
-            return {"status_code": response.status_code, "data": response.json()}
+            result = {"status_code": response.status_code, "data": response.json()}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
         except requests.RequestException as e:
             logging.error(f"POST request to {url} failed: {e}")
-            return {'error': str(e)}
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
+
+    def _websocket_request(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Internal method to send a message over a websocket and wait for the chat message that ends the answer."""
+        fingerprint = self.recorder.fingerprint('WS', url, payload=payload) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        websocket = _require_websocket_client()
+        started = time.perf_counter()
+        arrivals, tokens, size = [], [], 0
+        try:
+            connection = websocket.create_connection(f"{url}?token={quote(self.jwt, safe='')}", timeout=self.http.timeout[1])
+            try:
+                connection.send(json.dumps(payload))
+                while True:
+                    frame = connection.recv()
+                    size += len(frame)
+                    event = json.loads(frame)
+                    if event.get('type') == 'chat_token':
+                        arrivals.append(time.perf_counter())
+                        tokens.append(event.get('content', ''))
+                    elif event.get('type') == 'chat':
+                        break
+                    elif event.get('type') == 'error':
+                        raise ValueError(event.get('description') or event.get('name') or 'Unknown error')
+            finally:
+                connection.close()
+        except (websocket.WebSocketException, OSError, ValueError) as e:
+            logging.error(f"Websocket request to {url} failed: {e}")
+            return {'error': str(e), 'timing': stream_timing(started, arrivals)}
+        logging.info(f"Websocket request to {url} successful.")
+        # The final chat message repeats the whole answer; the tokens are the fallback when it does not
+        event['content'] = event.get('content') or ''.join(tokens)
+        result = {"status_code": 200, "data": event}
+        result['timing'] = stream_timing(started, arrivals, 200, None, size)
+        if fingerprint:
+            self.recorder.record(fingerprint, result)
+        return result
+
+    def _delete_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle DELETE requests."""
+        fingerprint = self.recorder.fingerprint('DELETE', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return self.recorder.replay(fingerprint)
+        started = time.perf_counter()
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            response = self.http.request('DELETE', url, headers=combined_headers)
+            response.raise_for_status()
+            logging.info(f"DELETE request to {url} successful.")
+            result = {"status_code": response.status_code}
+            result['timing'] = timing_from_response(started, response)
+            if fingerprint:
+                self.recorder.record(fingerprint, result)
+            return result
+        except requests.RequestException as e:
+            logging.error(f"DELETE request to {url} failed: {e}")
+            return {'error': str(e), 'timing': timing_from_response(started, e.response)}
@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import json
+import logging
+import mimetypes
+from functools import partial
+from typing import Dict, Any, Optional
+from urllib.parse import quote
+from modules.async_http_session import AsyncHttpSession, AsyncHttpError
+from modules.latency_report import build_timing
+from modules.response_recorder import ResponseRecorder
+
+
+class AsyncCheshireCatAPI:
+    def __init__(self, base_url: str, api_key: str, username: str, password: str, recorder: Optional[ResponseRecorder] = None, http_config: Optional[Dict[str, Any]] = None, chunk_size: int = 512, chunk_overlap: int = 64):
+        logging.info("Starting async CheshireCat API Client")
+        self.base_url = base_url
+        self.api_key = api_key
+        self.username = username
+        self.password = password
+        self.recorder = recorder
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.http = AsyncHttpSession(**(http_config or {}))
+        self.jwt = None
+        self.headers = {'accept': 'application/json'}
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def connect(self) -> 'AsyncCheshireCatAPI':
+        """Retrieve the JWT token and prepare the authentication headers."""
+        self.jwt = await self._get_jwt_token()
+        self.headers = {
+            'Authorization': f'Bearer {self.jwt}',
+            'accept': 'application/json'
+        }
+        return self
+
+    async def close(self) -> None:
+        """Close the underlying HTTP session."""
+        await self.http.close()
+
+    async def _get_jwt_token(self) -> str:
+        """Retrieve JWT token using username and password."""
+        if self.recorder and self.recorder.replaying:
+            logging.info("Replay mode: skipping JWT token retrieval.")
+            return "replay"
+        url = f"{self.base_url}/auth/token"
+        payload = {"username": self.username, "password": self.password}
+        headers = {"Content-Type": "application/json"}
+        try:
+            _, content, _ = await self.http.request('POST', url, json=payload, headers=headers, idempotent=True)
+            logging.info("JWT token retrieved successfully.")
+            return json.loads(content)["access_token"]
+        except AsyncHttpError as e:
+            logging.error(f"Failed to obtain JWT token: {e}")
+            raise
+
+    async def upload_document(self, file_path: str) -> Dict[str, Any]:
+        """Upload a document to the Cheshire Cat system."""
+        url = f"{self.base_url}/rabbithole/"
+        file_name = os.path.basename(file_path)
+        content_type, _ = mimetypes.guess_type(file_path)
+        if not content_type:
+            content_type = "application/octet-stream"
+
+        metadata = {
+            "source": file_name,
+            "title": file_name,
+            "author": "Test author",
+            "year": 2024
+        }
+
+        payload = {
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "metadata": json.dumps(metadata)
+        }
+
+        logging.info(f"Uploading document '{file_name}' to Cheshire Cat...")
+        try:
+            file = open(file_path, 'rb')
+        except IOError as e:
+            logging.error(f"Document upload failed: {e}")
+            return {'error': str(e)}
+
+        # The file is streamed from its handle rather than read into memory
+        with file:
+            files = {"file": (file_name, file, content_type)}
+            response = await self._post_request(url, payload=payload, files=files)
+        if response.get('status_code') == 200:
+            logging.info(f"Document '{file_name}' uploaded successfully.")
+        else:
+            logging.error(f"Failed to upload document '{file_name}'.")
+        return response
+
+    async def send_message(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Send a message to the Cheshire Cat system, in the conversation of the given session when one is given."""
+        url = f"{self.base_url}/message"
+        payload = {"text": message}
+        # The Cat keeps one conversation history per user, so a session is a user id
+        headers = {'user_id': session_id} if session_id else None
+
+        logging.info(f"Sending message to Cheshire Cat: {message}")
+        response = await self._post_request(url, payload=payload, headers=headers)
+        timing = response.pop('timing', {})
+        if response.get('status_code') == 200:
+            logging.info(f"Message sent successfully: {message}")
+        else:
+            logging.error(f"Failed to send message: {message}")
+        return {'text_response': response.get('data', {}).get('content', {}), 'full_response': response, 'timing': timing}
+
+    async def get_status(self) -> Dict[str, Any]:
+        """Check the status of the Cheshire Cat system."""
+        url = f"{self.base_url}/status"
+        logging.info("Checking status of Cheshire Cat system...")
+        return await self._get_request(url)
+
+    async def list_documents(self) -> Dict[str, Any]:
+        """List the sources held in the declarative memory with their number of chunks."""
+        documents = {}
+        offset = None
+        while True:
+            url = f"{self.base_url}/memory/collections/declarative/points?limit=1000"
+            if offset is not None:
+                url += f"&offset={quote(str(offset))}"
+            response = await self._get_request(url)
+            if 'error' in response:
+                return response
+            data = response.get('data', {})
+            for point in data.get('points', []):
+                source = point.get('payload', {}).get('metadata', {}).get('source')
+                if source:
+                    documents[source] = documents.get(source, 0) + 1
+            offset = data.get('next_offset')
+            if offset is None:
+                return {'documents': documents}
+
+    async def _get_request(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle GET requests."""
+        # The recorder reads and writes files, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        fingerprint = self.recorder.fingerprint('GET', url, headers=headers) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return await loop.run_in_executor(None, self.recorder.replay, fingerprint)
+        started = time.perf_counter()
+        status_code, content, ttfb = None, b'', None
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            status_code, content, ttfb = await self.http.request('GET', url, headers=combined_headers)
+            logging.info(f"GET request to {url} successful.")
+            result = {"status_code": status_code, "data": json.loads(content)}
+            result['timing'] = build_timing(started, status_code, ttfb, len(content))
+            if fingerprint:
+                await loop.run_in_executor(None, self.recorder.record, fingerprint, result)
+            return result
+        except AsyncHttpError as e:
+            logging.error(f"GET request to {url} failed: {e}")
+            return {'error': str(e), 'timing': build_timing(started, e.status_code)}
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON response from {url}: {e}")
+            return {'error': f"Failed to parse response: {e}", 'timing': build_timing(started, status_code, ttfb, len(content))}
+
+    async def _post_request(self, url: str, payload: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Internal method to handle POST requests."""
+        loop = asyncio.get_running_loop()
+        fingerprint = await loop.run_in_executor(None, partial(self.recorder.fingerprint, 'POST', url, payload=payload, files=files, headers=headers)) if self.recorder else None
+        if fingerprint and self.recorder.replaying:
+            return await loop.run_in_executor(None, self.recorder.replay, fingerprint)
+        started = time.perf_counter()
+        status_code, content, ttfb = None, b'', None
+        try:
+            combined_headers = {**self.headers, **(headers or {})}
+            if files:
+                status_code, content, ttfb = await self.http.request('POST', url, headers=combined_headers, files=files, data=payload, idempotent=True)
+            else:
+                status_code, content, ttfb = await self.http.request('POST', url, headers=combined_headers, json=payload)
+            logging.info(f"POST request to {url} successful.")
+            result = {"status_code": status_code, "data": json.loads(content)}
+            result['timing'] = build_timing(started, status_code, ttfb, len(content))
+            if fingerprint:
+                await loop.run_in_executor(None, self.recorder.record, fingerprint, result)
+            return result
+        except AsyncHttpError as e:
+            logging.error(f"POST request to {url} failed: {e}")
+            return {'error': str(e), 'timing': build_timing(started, e.status_code)}
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON response from {url}: {e}")
+            return {'error': f"Failed to parse response: {e}", 'timing': build_timing(started, status_code, ttfb, len(content))}
@@ -0,0 +1,124 @@
+import csv
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from modules.local_metrics import LOCAL_METRICS
+
+TABLE_FIELDNAMES = ['chunk_size', 'chunk_overlap', 'collection', 'ingestion_time', 'mb_per_sec', 'docs_per_sec', 'vector_count', 'estimated_vector_memory_bytes', 'quality', 'pareto', 'error']
+
+
+def expand_grid(chunk_sizes: List[int], chunk_overlaps: List[int]) -> List[Dict[str, int]]:
+    """Return every (chunk_size, chunk_overlap) setting of the grid, skipping overlaps not smaller than the chunk."""
+    settings = []
+    for chunk_size in chunk_sizes:
+        for chunk_overlap in chunk_overlaps:
+            if chunk_overlap >= chunk_size:
+                logging.warning(f"Skipping chunking setting {chunk_size}/{chunk_overlap}: overlap must be smaller than the chunk size.")
+                continue
+            settings.append({'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap})
+    return settings
+
+
+def mark_pareto(rows: List[Dict[str, Any]], cost_key: str = 'ingestion_time', quality_key: str = 'quality') -> List[Dict[str, Any]]:
+    """Flag the rows no other row beats on both cost (lower is better) and quality (higher is better)."""
+    measured = [row for row in rows if row.get(cost_key) is not None and row.get(quality_key) is not None]
+    for row in rows:
+        row['pareto'] = False
+    for row in measured:
+        row['pareto'] = not any(
+            other[cost_key] <= row[cost_key] and other[quality_key] >= row[quality_key]
+            and (other[cost_key] < row[cost_key] or other[quality_key] > row[quality_key])
+            for other in measured
+        )
+    return rows
+
+
+class ChunkingSweep:
+    def __init__(self, api_module, framework_name: str, settings: List[Dict[str, int]], run_suite: Callable[[Any, str], Tuple[List[Dict[str, Any]], Dict[str, Any]]], evaluate: Callable[[List[Dict[str, Any]], str], List[Dict[str, Any]]], collection_prefix: str = 'scarf-sweep', embedding_dim: Optional[int] = None, cleanup: bool = False, allow_wipe: bool = False):
+        """Initialize a sweep; run_suite ingests the dataset and asks the questions, returning the results and the ingestion report."""
+        self.api_module = api_module
+        self.framework_name = framework_name
+        self.settings = settings
+        self.run_suite = run_suite
+        self.evaluate = evaluate
+        self.collection_prefix = collection_prefix
+        self.embedding_dim = embedding_dim
+        self.cleanup = cleanup
+        # Frameworks that isolate a setting by wiping their only collection need an explicit opt-in
+        self.allow_wipe = allow_wipe
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Ingest, query and evaluate every setting in its own collection, returning one row per setting."""
+        rows = []
+        # The chunking may be a system-wide setting, so it is put back once the sweep is over
+        original = self.api_module.get_chunking()
+        if 'error' in original:
+            logging.warning(f"[{self.framework_name}] Could not read the current chunking, it will not be restored: {original['error']}")
+        try:
+            for setting in self.settings:
+                collection = f"{self.collection_prefix}-{setting['chunk_size']}-{setting['chunk_overlap']}"
+                logging.info(f"[{self.framework_name}] Chunking sweep: {setting['chunk_size']}/{setting['chunk_overlap']} in '{collection}'...")
+                rows.append(self._run_setting(setting, collection))
+        finally:
+            if 'error' not in original and original['chunk_size'] is not None and original['chunk_overlap'] is not None:
+                logging.info(f"[{self.framework_name}] Restoring chunking {original['chunk_size']}/{original['chunk_overlap']}...")
+                self.api_module.set_chunking(original['chunk_size'], original['chunk_overlap'])
+        return mark_pareto(rows)
+
+    def _run_setting(self, setting: Dict[str, int], collection: str) -> Dict[str, Any]:
+        row = {**setting, 'collection': collection, 'ingestion_time': None, 'mb_per_sec': None, 'docs_per_sec': None, 'vector_count': None, 'estimated_vector_memory_bytes': None, 'quality': None, 'scores': {}, 'error': None}
+        response = self.api_module.isolate_collection(collection, allow_wipe=self.allow_wipe)
+        if 'error' not in response:
+            response = self.api_module.set_chunking(setting['chunk_size'], setting['chunk_overlap'])
+        if 'error' in response:
+            row['error'] = response['error']
+            return row
+        # The vector count may be database wide, so only the growth during this setting is attributed to it
+        vectors_before = self.api_module.count_vectors().get('vector_count')
+
+        results, ingestion = self.run_suite(self.api_module, collection)
+        row['ingestion_time'] = ingestion.get('duration')
+        row['mb_per_sec'] = ingestion.get('mb_per_sec')
+        row['docs_per_sec'] = ingestion.get('docs_per_sec')
+        row['ingestion'] = ingestion
+
+        vectors_after = self.api_module.count_vectors().get('vector_count')
+        if vectors_before is not None and vectors_after is not None:
+            row['vector_count'] = vectors_after - vectors_before
+            if self.embedding_dim:
+                # float32 embeddings, payloads and index overhead are not counted
+                row['estimated_vector_memory_bytes'] = row['vector_count'] * self.embedding_dim * 4
+
+        row['scores'] = self._mean_scores(self.evaluate(results, collection))
+        # Quality is the mean judge score; the local metrics are reported but do not count
+        judge_scores = [score for metric, score in row['scores'].items() if metric not in LOCAL_METRICS]
+        if judge_scores:
+            row['quality'] = sum(judge_scores) / len(judge_scores)
+        if self.cleanup and hasattr(self.api_module, 'delete_workspace'):
+            self.api_module.delete_workspace(self.api_module.workspace_slug)
+        logging.info(f"[{self.framework_name}] {collection}: ingestion {row['ingestion_time']}s, {row['vector_count']} vectors, quality {row['quality']}")
+        return row
+
+    @staticmethod
+    def _mean_scores(evaluation_results: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Return the mean score of every metric, ignoring jobs without a score."""
+        scores = {}
+        for record in evaluation_results:
+            if record.get('score') is not None:
+                scores.setdefault(record['metric'], []).append(record['score'])
+        return {metric: sum(values) / len(values) for metric, values in scores.items()}
+
+    @staticmethod
+    def save(rows: List[Dict[str, Any]], json_path: str, csv_path: str) -> None:
+        """Write the full sweep report to JSON and the cost/quality table to CSV, cheapest setting first."""
+        table = sorted(rows, key=lambda row: (row['ingestion_time'] is None, row['ingestion_time'] or 0))
+        try:
+            with open(json_path, 'w') as file:
+                json.dump(table, file, indent=4)
+            with open(csv_path, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=TABLE_FIELDNAMES, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(table)
+            logging.info(f"Chunking sweep saved to {json_path} and {csv_path}.")
+        except IOError as e:
+            logging.error(f"Error saving chunking sweep: {e}")
@@ -0,0 +1,237 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Text fields are stored once in the blob side table and referenced by content hash from the score tables
+RESULT_TEXT_FIELDS = ['question', 'text_response', 'expected_response', 'full_response']
+EVALUATION_TEXT_FIELDS = ['question', 'text_response', 'expected_response', 'full_response', 'reason']
+TABLES = ['results', 'evaluations']
+BATCH_SIZE = 10000
+
+
+def _require_pyarrow():
+    # pyarrow is only needed by the columnar store, so it is imported when the store is used
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        import pyarrow.compute
+    except ImportError:
+        raise ImportError("The columnar result store needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def blob_text(value: Any, as_json: bool = False) -> Optional[str]:
+    """Return the text stored for a field: strings as they are, other values, or any value when as_json is set, as canonical JSON."""
+    if value is None:
+        return None
+    return value if isinstance(value, str) and not as_json else json.dumps(value, sort_keys=True)
+
+
+def blob_id(text: Optional[str]) -> Optional[str]:
+    """Return the content hash a text is stored under."""
+    if text is None:
+        return None
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+
+class ResultStore:
+    def __init__(self, root: str):
+        """Open a store of Parquet tables under root: one partition per run, and a deduplicated blob table shared by all runs."""
+        self.pa = _require_pyarrow()
+        self.root = root
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        # The ids of the stored blobs are indexed, so a write looks its texts up instead of reading every blob file
+        self._index = sqlite3.connect(os.path.join(root, 'blobs', 'index.sqlite'))
+        self._index.execute("CREATE TABLE IF NOT EXISTS blob_ids (id TEXT PRIMARY KEY)")
+        if self._blob_files() and self._index.execute("SELECT 1 FROM blob_ids LIMIT 1").fetchone() is None:
+            self._index_blobs(self._blob_files())
+
+    def runs(self) -> List[str]:
+        """Return the ids of the stored runs, oldest first."""
+        run_ids = set()
+        for table in TABLES:
+            table_dir = os.path.join(self.root, table)
+            if os.path.isdir(table_dir):
+                run_ids.update(name.split('=', 1)[1] for name in os.listdir(table_dir) if name.startswith('run_id='))
+        return sorted(run_ids)
+
+    def write_run(self, run_id: str, results: Optional[Iterable[Dict[str, Any]]] = None, evaluations: Optional[Iterable[Dict[str, Any]]] = None) -> Dict[str, int]:
+        """Store the results and evaluations of a run, replacing a previous copy of it, and return the rows and new blobs written."""
+        new_blobs: Dict[str, str] = {}
+        counts = {'results': 0, 'evaluations': 0}
+        written = []
+        if results is not None:
+            counts['results'], temporary_path, path = self._write_partition('results', run_id, (self._result_row(record, new_blobs) for record in results), self._results_schema())
+            written.append((temporary_path, path))
+        if evaluations is not None:
+            counts['evaluations'], temporary_path, path = self._write_partition('evaluations', run_id, (self._evaluation_row(record, new_blobs) for record in evaluations), self._evaluations_schema())
+            written.append((temporary_path, path))
+        if new_blobs:
+            self._write_blobs(run_id, new_blobs)
+        # The partitions are published only once the blobs they reference are stored
+        for temporary_path, path in written:
+            os.replace(temporary_path, path)
+        counts['new_blobs'] = len(new_blobs)
+        logging.info(f"Stored run {run_id}: {counts['results']} results, {counts['evaluations']} evaluations, {len(new_blobs)} new texts.")
+        return counts
+
+    def table(self, name: str, runs: Optional[Sequence[str]] = None, columns: Optional[List[str]] = None, filter=None):
+        """Return a stored table as an Arrow table, optionally restricted to some runs, columns and an Arrow filter expression."""
+        if name not in TABLES:
+            raise ValueError(f"Unknown table '{name}'. Expected one of {TABLES}.")
+        table_dir = os.path.join(self.root, name)
+        if not os.path.isdir(table_dir):
+            schema = self._results_schema() if name == 'results' else self._evaluations_schema()
+            return schema.empty_table().append_column('run_id', self.pa.array([], self.pa.string())).select(columns or schema.names + ['run_id'])
+        # Run ids are always strings, even when they look like numbers
+        partitioning = self.pa.dataset.partitioning(self.pa.schema([('run_id', self.pa.string())]), flavor='hive')
+        dataset = self.pa.dataset.dataset(table_dir, format='parquet', partitioning=partitioning)
+        expression = filter
+        if runs is not None:
+            run_filter = self.pa.dataset.field('run_id').isin(list(runs))
+            expression = run_filter if expression is None else expression & run_filter
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def aggregate(self, by: Sequence[str] = ('framework', 'filename', 'metric'), runs: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Return the count, mean, standard deviation, min and max score of every group of evaluations, across the given runs."""
+        table = self.table('evaluations', runs=runs, columns=list(by) + ['score'])
+        grouped = table.group_by(list(by)).aggregate([('score', 'count'), ('score', 'mean'), ('score', 'stddev'), ('score', 'min'), ('score', 'max')])
+        return grouped.sort_by([(key, 'ascending') for key in by]).to_pylist()
+
+    def latency(self, by: Sequence[str] = ('framework',), runs: Optional[Sequence[str]] = None, quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99)) -> List[Dict[str, Any]]:
+        """Return the count, mean and quantiles of the question wall time of every group of results."""
+        table = self.table('results', runs=runs, columns=list(by) + ['wall_time'])
+        options = self.pa.compute.TDigestOptions(q=list(quantiles))
+        grouped = table.group_by(list(by)).aggregate([('wall_time', 'count'), ('wall_time', 'mean'), ('wall_time', 'tdigest', options)])
+        rows = grouped.sort_by([(key, 'ascending') for key in by]).to_pylist()
+        for row in rows:
+            for quantile, value in zip(quantiles, row.pop('wall_time_tdigest') or []):
+                row[f"wall_time_p{quantile * 100:g}"] = value
+        return rows
+
+    def texts(self, ids: Iterable[Optional[str]]) -> Dict[str, str]:
+        """Return the stored texts of the given blob ids."""
+        wanted = sorted({blob for blob in ids if blob})
+        if not wanted or not self._blob_files():
+            return {}
+        blobs = self.pa.dataset.dataset(self._blob_files(), format='parquet').to_table(filter=self.pa.dataset.field('id').isin(wanted))
+        return dict(zip(blobs.column('id').to_pylist(), blobs.column('text').to_pylist()))
+
+    def iter_records(self, name: str, runs: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield the stored records of a table with their texts resolved, in the shape they had in the JSON results."""
+        table = self.table(name, runs=runs)
+        text_fields = RESULT_TEXT_FIELDS if name == 'results' else EVALUATION_TEXT_FIELDS
+        for batch in table.to_batches(max_chunksize=BATCH_SIZE):
+            rows = batch.to_pylist()
+            texts = self.texts(row[field] for row in rows for field in text_fields)
+            for row in rows:
+                for field in text_fields:
+                    text = texts.get(row[field])
+                    row[field] = json.loads(text) if field == 'full_response' and text is not None else text
+                yield row
+
+    def import_json(self, run_id: str, results_path: Optional[str] = None, evaluations_path: Optional[str] = None) -> Dict[str, int]:
+        """Store a run saved as test_results.json and evaluation_results.json."""
+        def load(path):
+            if not path or not os.path.exists(path):
+                return None
+            with open(path, 'r') as file:
+                return json.load(file)
+        return self.write_run(run_id, results=load(results_path), evaluations=load(evaluations_path))
+
+    def _blob_files(self) -> List[str]:
+        blob_dir = os.path.join(self.root, 'blobs')
+        return sorted(os.path.join(blob_dir, name) for name in os.listdir(blob_dir) if name.endswith('.parquet'))
+
+    def _index_blobs(self, paths: List[str]) -> None:
+        ids = self.pa.dataset.dataset(paths, format='parquet').to_table(columns=['id']).column('id').to_pylist()
+        self._index.executemany("INSERT OR IGNORE INTO blob_ids (id) VALUES (?)", ((identifier,) for identifier in ids))
+        self._index.commit()
+
+    def _write_blobs(self, run_id: str, new_blobs: Dict[str, str]) -> None:
+        path = os.path.join(self.root, 'blobs', f"{len(self._blob_files()):06d}-{run_id}.parquet")
+        temporary_path = os.path.join(self.root, 'blobs', f".{os.path.basename(path)}.tmp")
+        self.pa.parquet.write_table(self.pa.table({'id': list(new_blobs), 'text': list(new_blobs.values())}), temporary_path, compression='zstd')
+        os.replace(temporary_path, path)
+        self._index.executemany("INSERT OR IGNORE INTO blob_ids (id) VALUES (?)", ((identifier,) for identifier in new_blobs))
+        self._index.commit()
+
+    def _reference(self, value: Any, new_blobs: Dict[str, str], as_json: bool = False) -> Optional[str]:
+        text = blob_text(value, as_json)
+        identifier = blob_id(text)
+        if identifier is not None and identifier not in new_blobs and self._index.execute("SELECT 1 FROM blob_ids WHERE id = ?", (identifier,)).fetchone() is None:
+            new_blobs[identifier] = text
+        return identifier
+
+    def _result_row(self, record: Dict[str, Any], new_blobs: Dict[str, str]) -> Dict[str, Any]:
+        timing = record.get('timing') or {}
+        full_response = record.get('full_response')
+        row = {field: self._reference(record.get(field), new_blobs, as_json=field == 'full_response') for field in RESULT_TEXT_FIELDS}
+        row.update({
+            'framework': record.get('framework'),
+            'filename': record.get('filename'),
+            'file_path': record.get('file_path'),
+            'tags': list(record.get('tags') or []),
+            'wall_time': timing.get('wall_time'),
+            'ttfb': timing.get('ttfb'),
+            'response_size': timing.get('response_size'),
+            'status_code': timing.get('status_code'),
+            'error': isinstance(full_response, dict) and 'error' in full_response
+        })
+        return row
+
+    def _evaluation_row(self, record: Dict[str, Any], new_blobs: Dict[str, str]) -> Dict[str, Any]:
+        row = {field: self._reference(record.get(field), new_blobs, as_json=field == 'full_response') for field in EVALUATION_TEXT_FIELDS}
+        score = record.get('score')
+        row.update({
+            'framework': record.get('framework'),
+            'filename': record.get('filename'),
+            'file_path': record.get('file_path'),
+            'metric': record.get('metric'),
+            'score': float(score) if isinstance(score, (int, float)) else None,
+            'short_circuited': bool(record.get('short_circuited', False))
+        })
+        return row
+
+    def _results_schema(self):
+        pa = self.pa
+        return pa.schema([
+            ('framework', pa.string()), ('filename', pa.string()), ('file_path', pa.string()),
+            ('question', pa.string()), ('text_response', pa.string()), ('expected_response', pa.string()), ('full_response', pa.string()),
+            ('tags', pa.list_(pa.string())), ('wall_time', pa.float64()), ('ttfb', pa.float64()),
+            ('response_size', pa.int64()), ('status_code', pa.int64()), ('error', pa.bool_())
+        ])
+
+    def _evaluations_schema(self):
+        pa = self.pa
+        return pa.schema([
+            ('framework', pa.string()), ('filename', pa.string()), ('file_path', pa.string()),
+            ('question', pa.string()), ('text_response', pa.string()), ('expected_response', pa.string()), ('full_response', pa.string()),
+            ('metric', pa.string()), ('score', pa.float64()), ('reason', pa.string()), ('short_circuited', pa.bool_())
+        ])
+
+    def _write_partition(self, table: str, run_id: str, rows: Iterator[Dict[str, Any]], schema) -> Tuple[int, str, str]:
+        """Write the rows of a run to a hidden temporary file, and return the row count, that file and the path to publish it at."""
+        partition = os.path.join(self.root, table, f"run_id={run_id}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, 'part-0.parquet')
+        # Hidden until published, so readers never see a half-written file
+        temporary_path = os.path.join(partition, '.part-0.parquet.tmp')
+        count = 0
+        # Rows are written in batches, so a run is never held in memory as a whole
+        with self.pa.parquet.ParquetWriter(temporary_path, schema, compression='zstd') as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == BATCH_SIZE:
+                    writer.write_batch(self.pa.RecordBatch.from_pylist(batch, schema=schema))
+                    count += len(batch)
+                    batch = []
+            if batch:
+                writer.write_batch(self.pa.RecordBatch.from_pylist(batch, schema=schema))
+                count += len(batch)
+        return count, temporary_path, path
@@ -0,0 +1,99 @@
+import json
+import uuid
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+from modules.latency_report import describe
+from modules.question_dataset import GENERIC_FILE, normalize_record
+
+SESSION_MODES = ['shared', 'per_question']
+# Prefix of the sessions of replayed runs, under which recorded runs are fingerprinted
+REPLAY_PREFIX = 'scarf-replay'
+
+
+class SessionPolicy:
+    def __init__(self, mode: str = 'per_question', prefix: Optional[str] = None):
+        """Initialize how questions are mapped to framework chat sessions."""
+        if mode not in SESSION_MODES:
+            raise ValueError(f"Invalid session mode '{mode}'. Expected one of {SESSION_MODES}.")
+        self.mode = mode
+        # A random prefix keeps the sessions of every run, and of a resumed run, apart; replayed runs use a fixed one
+        self.prefix = prefix or uuid.uuid4().hex[:12]
+
+    def session_for(self, framework: str, filename: str, question: str) -> Optional[str]:
+        """Return the session a single question is asked in, or None for the framework's default session."""
+        if self.mode == 'shared':
+            return None
+        return self.session_id(framework, filename, question)
+
+    def session_id(self, *parts: str) -> str:
+        """Return the session id of the given parts, stable for a prefix."""
+        digest = hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+        return f"{self.prefix}-{digest}"
+
+
+def load_conversations(path: str) -> List[Dict[str, Any]]:
+    """Load scripted conversations from a JSONL file, or a JSON array, of {id, file, turns, tags} records."""
+    with open(path, 'r') as file:
+        if path.lower().endswith('.json'):
+            raw_conversations = json.load(file)
+        else:
+            raw_conversations = [json.loads(line) for line in file if line.strip()]
+
+    conversations = []
+    for index, raw in enumerate(raw_conversations):
+        # A turn is a question record, or just the question text
+        turns = [normalize_record({'question': turn} if isinstance(turn, str) else turn) for turn in raw.get('turns', [])]
+        turns = [{'question': turn['question'], 'expected_answer': turn['expected_answer']} for turn in turns if turn['question']]
+        if not turns:
+            logging.warning(f"Skipping conversation {index} of {path}: it has no turns.")
+            continue
+        conversations.append({'id': str(raw.get('id') or f"conversation-{index}"), 'file': raw.get('file') or GENERIC_FILE, 'turns': turns, 'tags': list(raw.get('tags') or [])})
+    logging.info(f"Loaded {len(conversations)} conversations with {sum(len(c['turns']) for c in conversations)} turns from {path}.")
+    return conversations
+
+
+def conversation_documents(conversations: List[Dict[str, Any]]) -> List[str]:
+    """Return the distinct documents the conversations are about, in order of first appearance."""
+    return list(dict.fromkeys(conversation['file'] for conversation in conversations if conversation['file'] != GENERIC_FILE))
+
+
+def slope(points: List[tuple]) -> Optional[float]:
+    """Return the least squares slope of (x, y) points, or None when x does not vary."""
+    points = [(x, y) for x, y in points if y is not None]
+    if len({x for x, _ in points}) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+
+
+class ConversationDepth:
+    MEASURES = ['wall_time', 'prompt_tokens', 'completion_tokens', 'history_chars']
+
+    def __init__(self):
+        """Initialize the per-turn latency and token usage of scripted conversations."""
+        self._turns = {}
+        self._conversations = set()
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Add an answered turn, from the session and timing fields of its result."""
+        session = result.get('session') or {}
+        turn = session.get('turn')
+        if turn is None:
+            return
+        self._conversations.add(session.get('conversation'))
+        values = {**session, 'wall_time': (result.get('timing') or {}).get('wall_time')}
+        stats = self._turns.setdefault(turn, {'requests': 0, 'errors': 0, **{measure: [] for measure in self.MEASURES}})
+        stats['requests'] += 1
+        stats['errors'] += int('error' in (result.get('full_response') or {}))
+        for measure in self.MEASURES:
+            stats[measure].append(values.get(measure))
+
+    def report(self) -> Dict[str, Any]:
+        """Return the distribution of every measure by turn, and how much its mean grows from one turn to the next."""
+        turns = {}
+        for turn, stats in sorted(self._turns.items()):
+            turns[str(turn)] = {'requests': stats['requests'], 'errors': stats['errors'], **{measure: describe(stats[measure]) for measure in self.MEASURES}}
+        growth = {measure: slope([(int(turn), stats[measure]['mean']) for turn, stats in turns.items()]) for measure in self.MEASURES}
+        return {'conversations': len(self._conversations), 'turns': turns, 'growth_per_turn': growth}
@@ -0,0 +1,16 @@
+import os
+import logging
+
+
+def get_api_key(api_key_file_path: str) -> str:
+    """Retrieve the API key from a file."""
+    if os.path.exists(api_key_file_path):
+        try:
+            with open(api_key_file_path, 'r') as file:
+                return file.read().strip()
+        except IOError as e:
+            logging.error(f"Error reading API key from file {api_key_file_path}: {e}")
+            raise
+    else:
+        logging.error(f"API key non provided as flag and file {api_key_file_path} not found.")
+        raise ValueError(f"API key is missing. Provide it as an argument or in the {api_key_file_path} file.")
@@ -0,0 +1,33 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+
+class QuestionDispatcher:
+    def __init__(self, max_in_flight: int = 1):
+        """Initialize the dispatcher with the maximum number of concurrent requests."""
+        self.max_in_flight = max(1, int(max_in_flight or 1))
+
+    def imap(self, func: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to every item concurrently, yielding results in input order."""
+        if self.max_in_flight == 1:
+            for item in items:
+                yield func(item)
+            return
+
+        # Keep a bounded window of futures so lazy inputs are never fully materialised
+        window_size = self.max_in_flight * 2
+        logging.debug(f"Dispatching with {self.max_in_flight} requests in flight.")
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window_size:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def map(self, func: Callable[[Any], Any], items: Iterable[Any]) -> list:
+        """Apply func to every item concurrently and return the ordered list of results."""
+        return list(self.imap(func, items))
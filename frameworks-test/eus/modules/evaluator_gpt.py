@@ -1,43 +1,68 @@
 import os
 import logging
-from deepeval import evaluate
-from deepeval.test_case import LLMTestCase, LLMTestCaseParams
-from deepeval.metrics import (
-    AnswerRelevancyMetric,
-    FaithfulnessMetric,
-    ContextualPrecisionMetric,
-    ContextualRecallMetric,
-    ContextualRelevancyMetric,
-    BiasMetric,
-    HallucinationMetric,
-    GEval
-)
-from deepeval.metrics.ragas import RagasMetric
+from typing import Iterable, Iterator, Optional
+from modules.adapter_registry import get_adapter
+from modules.dispatcher import QuestionDispatcher
+from modules.judge_backend import JudgeBackend
+from modules.local_metrics import LocalScorer
+from modules.metric_pool import MetricPool
+from modules.run_manifest import RunManifest
+from modules.score_cache import ScoreCache, make_key, metric_fingerprint
 
 
 class EvaluatorGPT:
-    def __init__(self, api_key: str):
-        """Initialize the evaluator with an API key."""
+    def __init__(self, api_key: Optional[str], max_workers: int = 1, cache: Optional[ScoreCache] = None, manifest: Optional[RunManifest] = None, judge: Optional[JudgeBackend] = None, local_scorer: Optional[LocalScorer] = None):
+        """Initialize the evaluator with an API key, the number of parallel judge calls, an optional score cache, run manifest, judge backend and local metrics."""
         self.api_key = api_key
+        self.max_workers = max_workers
+        self.cache = cache
+        self.manifest = manifest
+        self.judge = judge or JudgeBackend()
+        self.judge_model = self.judge.model
+        self.local_scorer = local_scorer
+        self.short_circuited = 0
         self.metrics_quality_response = ["relevancy"]
         self.metrics_rag = ["contextual_relevancy"]
-
-    def get_metric(self, name: str):
-        """Return the metric object corresponding to the given name."""
+        # Metrics and their judge client are built once per worker thread and reused across jobs
+        self.metric_pool = MetricPool(self.get_metric, self.create_judge)
+
+    def create_judge(self):
+        """Create the judge model client shared by the metrics of a worker thread."""
+        return self.judge.create()
+
+    def get_metric(self, name: str, judge=None):
+        """Return the metric object corresponding to the given name, judged by the given client or the judge model."""
+        # deepeval is heavy to import, so it is only loaded once the first metric is needed
+        from deepeval.test_case import LLMTestCaseParams
+        from deepeval.metrics import (
+            AnswerRelevancyMetric,
+            FaithfulnessMetric,
+            ContextualPrecisionMetric,
+            ContextualRecallMetric,
+            ContextualRelevancyMetric,
+            BiasMetric,
+            GEval
+        )
+        model = judge or self.judge_model
         if name == "relevancy":
-            return AnswerRelevancyMetric(threshold=0.7, model="gpt-4o-mini", include_reason=True)
+            return AnswerRelevancyMetric(threshold=0.7, model=model, include_reason=True)
         elif name == "faithfulness":
-            return FaithfulnessMetric(threshold=0.7, model="gpt-4o-mini", include_reason=True)
+            return FaithfulnessMetric(threshold=0.7, model=model, include_reason=True)
         elif name == 'bias':
-            return BiasMetric(threshold=0.5)
+            # With OpenAI, bias keeps deepeval's default judge model
+            return BiasMetric(threshold=0.5) if self.judge.backend == 'openai' else BiasMetric(threshold=0.5, model=model)
         elif name == "contextual_precision":
-            return ContextualPrecisionMetric(threshold=0.7, model="gpt-4o-mini", include_reason=True)
+            return ContextualPrecisionMetric(threshold=0.7, model=model, include_reason=True)
         elif name == "contextual_recall":
-            return ContextualRecallMetric(threshold=0.7, model="gpt-4o-mini", include_reason=True)
+            return ContextualRecallMetric(threshold=0.7, model=model, include_reason=True)
         elif name == "contextual_relevancy":
-            return ContextualRelevancyMetric(threshold=0.7, model="gpt-4o-mini", include_reason=True)
+            return ContextualRelevancyMetric(threshold=0.7, model=model, include_reason=True)
         elif name == "ragas":
-            return RagasMetric(threshold=0.5, model="gpt-4o-mini")
+            from deepeval.metrics.ragas import RagasMetric
+            # Ragas builds its own LangChain client from the model name, so it always calls OpenAI
+            if self.judge.backend != 'openai':
+                logging.warning(f"The ragas metric ignores the {self.judge.backend} judge backend and calls OpenAI.")
+            return RagasMetric(threshold=0.5, model=self.judge_model)
         elif name == "geval":
             return GEval(
                 name="Correctness",
@@ -47,12 +72,13 @@ class EvaluatorGPT:
                     "Heavily penalize omission of detail",
                     "Vague language or contradicting opinions are OK"
                 ],
-                model="gpt-4o-mini",
+                model=model,
                 evaluation_params=[LLMTestCaseParams.INPUT, LLMTestCaseParams.ACTUAL_OUTPUT]
             )
 
     def create_test_case(self, input: str, output: str, expected_output=None, rag_output=None):
         """Create a test case object with the given input and output."""
+        from deepeval.test_case import LLMTestCase
         if rag_output:
             return LLMTestCase(input=input, actual_output=output, expected_output=expected_output, retrieval_context=rag_output)
         return LLMTestCase(input=input, actual_output=output, expected_output=expected_output)
@@ -65,75 +91,125 @@ class EvaluatorGPT:
 
     def get_data_interaction(self, interaction: dict):
         """Extract the input, output, expected response, and RAG output from the interaction."""
-        rag_output = []
-
-        if interaction['framework'] == "cheshirecat":
-            input = interaction['question']
-            output = interaction['text_response']
-            expected_response = interaction.get('expected_response', '')
-
-            full_response_memory = interaction.get('full_response', {}).get('data', {}).get('why', {}).get('memory', {}).get('declarative', [])
-            for element in full_response_memory:
-                rag_output.append(element.get('page_content', ''))
-
-            return input, output, expected_response, rag_output
-
-        elif interaction['framework'] == "anythingllm":
-            input = interaction['question']
-            output = interaction['text_response']
-            expected_response = interaction.get('expected_response', '')
-
-            full_response_memory = interaction.get('full_response', {}).get('data', {}).get('source', [])
-            for element in full_response_memory:
-                rag_output.append(element)
-
-            return input, output, expected_response, rag_output
-
-    def evaluate_model(self, data_interaction: list):
-        """Evaluate test cases using selected metrics and return the results."""
-        if not data_interaction:
+        input = interaction['question']
+        output = interaction['text_response']
+        expected_response = interaction.get('expected_response', '')
+        rag_output = get_adapter(interaction['framework']).extract_context(interaction.get('full_response', {}))
+        return input, output, expected_response, rag_output
+
+    def build_jobs(self, data_interaction: list) -> list:
+        """Build the full list of (interaction x metric) evaluation jobs."""
+        return list(self.iter_jobs(data_interaction))
+
+    def iter_jobs(self, data_interaction: Iterable[dict]) -> Iterator[dict]:
+        """Lazily yield the (interaction x metric) evaluation jobs of an interaction stream."""
+        for index, interaction in enumerate(data_interaction):
+            input, output, expected_output, rag_output = self.get_data_interaction(interaction)
+            job = {
+                "interaction": interaction,
+                "index": index,
+                "input": input,
+                "output": output,
+                "expected_output": expected_output,
+                "rag_output": rag_output
+            }
+            verdict = None
+            if self.local_scorer is not None:
+                # Local metrics are computed inline: they cost microseconds, unlike a judge call
+                scores = self.local_scorer.score(output, expected_output, rag_output, interaction.get('full_response'))
+                verdict = self.local_scorer.verdict(scores)
+                for metric_name in self.local_scorer.metrics:
+                    yield dict(job, metric=metric_name, use_rag=False, result=(scores[metric_name], self.local_scorer.reason(metric_name, scores)))
+            metric_names = [(name, False) for name in self.metrics_quality_response] + [(name, True) for name in self.metrics_rag]
+            for metric_name, use_rag in metric_names:
+                # The verdict grades the answer, so it settles the answer quality metrics; the retrieved context is always judged
+                if verdict is not None and not use_rag:
+                    self.short_circuited += 1
+                    score = 1.0 if verdict == 'pass' else 0.0
+                    yield dict(job, metric=metric_name, use_rag=use_rag, result=(score, f"Short-circuited by the local metrics: the answer {'matches the expected answer' if verdict == 'pass' else 'is empty or an error'}."), short_circuited=True)
+                elif use_rag and not rag_output:
+                    # Nothing retrieved is the worst retrieval, as the judge would score it, not a missing score
+                    yield dict(job, metric=metric_name, use_rag=use_rag, result=(0.0, "No retrieval context: the framework returned no sources for this question."))
+                else:
+                    yield dict(job, metric=metric_name, use_rag=use_rag)
+
+    def run_job(self, job: dict) -> dict:
+        """Measure a single job and return its evaluation record."""
+        if "result" in job:
+            return self.make_record(job, *job["result"])
+        interaction = job["interaction"]
+        unit_key = RunManifest.evaluation_key(interaction, job["metric"], job["index"]) if self.manifest else None
+        if unit_key and self.manifest.is_done(unit_key):
+            # Only the score and reason are checkpointed, the rest of the record comes from the interaction
+            return self.make_record(job, *self.manifest.get(unit_key))
+
+        rag_output = job["rag_output"] if job["use_rag"] else None
+        test_case = self.create_test_case(job["input"], job["output"], job["expected_output"], rag_output)
+        metric = self.metric_pool.get(job["metric"])
+        if self.cache is None:
+            score, reason = self.evaluate_test_cases(test_case, metric)
+        else:
+            cache_key = make_key(job["metric"], metric_fingerprint(metric), self.judge.name, job["input"], job["output"], job["expected_output"], rag_output)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                score, reason = cached
+            else:
+                score, reason = self.evaluate_test_cases(test_case, metric)
+                self.cache.put(cache_key, score, reason)
+        record = self.make_record(job, score, reason)
+        if unit_key and score is not None:
+            self.manifest.mark_done(unit_key, [score, reason])
+        return record
+
+    def make_record(self, job: dict, score, reason) -> dict:
+        """Return the evaluation record of a job."""
+        interaction = job["interaction"]
+        record = {
+            "framework": interaction['framework'],
+            "filename": interaction['filename'],
+            "file_path": interaction['file_path'],
+            "question": job["input"],
+            "text_response": job["output"],
+            "full_response": job["rag_output"],
+            "expected_response": job["expected_output"],
+            "metric": job["metric"],
+            "score": score,
+            "reason": reason
+        }
+        if job.get("short_circuited"):
+            record["short_circuited"] = True
+        return record
+
+    def evaluate_model(self, data_interaction: Iterable[dict], sink=None):
+        """Evaluate a list or lazy stream of interactions; records go to the sink when one is given, otherwise they are returned."""
+        if isinstance(data_interaction, list) and not data_interaction:
             logging.warning("No data interactions found to evaluate.")
             return []
 
-        os.environ["OPENAI_API_KEY"] = self.api_key
-
-        results_eval = []
-
-        for interaction in data_interaction:
-            input, output, expected_output, rag_output = self.get_data_interaction(interaction)
+        if self.api_key:
+            os.environ["OPENAI_API_KEY"] = self.api_key
+        self.short_circuited = 0
 
-            for metric_name in self.metrics_quality_response:
-                metric = self.get_metric(metric_name)
-                test_case = self.create_test_case(input, output, expected_output)
-                score, reason = self.evaluate_test_cases(test_case, metric)
-                results_eval.append({
-                    "framework": interaction['framework'],
-                    "filename": interaction['filename'],
-                    "file_path": interaction['file_path'],
-                    "question": input,
-                    "text_response": output,
-                    "full_response": rag_output,
-                    "expected_response": expected_output,
-                    "metric": metric_name,
-                    "score": score,
-                    "reason": reason
-                })
-
-            for metric_name in self.metrics_rag:
-                metric = self.get_metric(metric_name)
-                test_case = self.create_test_case(input, output, expected_output, rag_output)
-                score, reason = self.evaluate_test_cases(test_case, metric)
-                results_eval.append({
-                    "framework": interaction['framework'],
-                    "filename": interaction['filename'],
-                    "file_path": interaction['file_path'],
-                    "question": input,
-                    "text_response": output,
-                    "full_response": rag_output,
-                    "expected_response": expected_output,
-                    "metric": metric_name,
-                    "score": score,
-                    "reason": reason
-                })
+        if isinstance(data_interaction, list):
+            jobs = self.build_jobs(data_interaction)
+            logging.info(f"Evaluating {len(jobs)} jobs with {self.max_workers} worker(s)...")
+        else:
+            jobs = self.iter_jobs(data_interaction)
+            logging.info(f"Evaluating streamed interactions with {self.max_workers} worker(s)...")
 
+        # Results are returned in job order, whichever job finishes first
+        results_eval = []
+        for record in QuestionDispatcher(max_in_flight=self.max_workers).imap(self.run_job, jobs):
+            if sink is not None:
+                sink.write(record)
+            else:
+                results_eval.append(record)
+
+        pool_stats = self.metric_pool.stats()
+        logging.info(f"Metric pool: {pool_stats['created']} metrics built, {pool_stats['reused']} reuses.")
+        if self.short_circuited:
+            logging.info(f"Local metrics short-circuited {self.short_circuited} judge jobs.")
+        if self.cache is not None:
+            stats = self.cache.stats()
+            logging.info(f"Score cache: {stats['hits']} hits, {stats['misses']} misses.")
         return results_eval
@@ -0,0 +1,80 @@
+import time
+import random
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from typing import Any, Optional
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# A 429 means the request was refused before being processed, so even a non-idempotent request can be sent again
+NOT_PROCESSED_STATUS_CODES = {429}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+def backoff_delay(attempt: int, backoff_factor: float, max_backoff: float, retry_after: Optional[str] = None) -> float:
+    """Return the delay before the next attempt: exponential backoff with full jitter, or Retry-After when given."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), max_backoff)
+    return random.uniform(0, min(max_backoff, backoff_factor * (2 ** attempt)))
+
+
+class HttpSession:
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10.0, read_timeout: float = 300.0, max_retries: int = 3, backoff_factor: float = 0.5, max_backoff: float = 30.0):
+        """Initialize a pooled keep-alive session with timeouts and retry settings."""
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs: Any) -> requests.Response:
+        """Send a request, retrying connection errors, timeouts, 429 and 5xx responses with exponential backoff.
+
+        A non-idempotent request, by default any POST, is only retried when it never reached the server or got a 429,
+        so a question the framework already answered is not asked twice.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else NOT_PROCESSED_STATUS_CODES
+        attempt = 0
+        while True:
+            self._rewind_files(kwargs.get('files'))
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries or not (idempotent or self._not_sent(e)):
+                    raise
+                delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff)
+                logging.warning(f"{method} request to {url} failed ({e}), retrying in {delay:.2f}s...")
+            else:
+                if response.status_code not in retry_status_codes or attempt >= self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, self.backoff_factor, self.max_backoff, response.headers.get('Retry-After'))
+                logging.warning(f"{method} request to {url} returned {response.status_code}, retrying in {delay:.2f}s...")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    @staticmethod
+    def _not_sent(error: Exception) -> bool:
+        """Return whether a failed request never reached the server, because the connection could not be established."""
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+    @staticmethod
+    def _rewind_files(files: Optional[dict]) -> None:
+        """Seek uploaded files back to the start so a retried request sends the whole content."""
+        for value in (files or {}).values():
+            if isinstance(value, tuple) and len(value) > 1 and hasattr(value[1], 'seek'):
+                value[1].seek(0)
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from modules.dispatcher import QuestionDispatcher
+from modules.latency_report import describe
+from modules.run_manifest import RunManifest
+
+# Several ingestors (one per framework) may share the same registry file
+_registry_lock = threading.Lock()
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Return the sha256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentIngestor:
+    def __init__(self, api_module, framework_name: str, target: str, registry_path: Optional[str] = None, max_concurrency: int = 4, dedup: bool = True, wait: bool = True, poll_interval: float = 2.0, timeout: float = 600.0, manifest: Optional[RunManifest] = None, tracker=None):
+        """Initialize the ingestion stage of a framework; target identifies the rabbithole or workspace the documents go to."""
+        self.api_module = api_module
+        self.framework_name = framework_name
+        self.target = target
+        self.registry_path = registry_path
+        self.max_concurrency = max_concurrency
+        self.dedup = dedup
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.manifest = manifest
+        self.tracker = tracker
+
+    def ingest(self, file_paths: List[str]) -> Dict[str, Any]:
+        """Upload the documents not already held by the framework concurrently and wait until they are indexed."""
+        started = time.perf_counter()
+        held = self._held_documents(self.api_module.list_documents()) if self.dedup and hasattr(self.api_module, 'list_documents') else None
+        entries = self._plan(file_paths, held)
+
+        def upload(entry):
+            upload_started = time.perf_counter()
+            result = self.api_module.upload_document(entry['file_path'])
+            if 'error' not in result and hasattr(self.api_module, 'embed_document'):
+                result = self._merge_embedding(result, self.api_module.embed_document(result))
+            self._finish_upload(entry, result, upload_started)
+
+        pending = [entry for entry in entries if entry['status'] == 'pending']
+        QuestionDispatcher(max_in_flight=self.max_concurrency).map(upload, pending)
+
+        waiting = self._waiting(entries)
+        if waiting:
+            deadline = time.perf_counter() + self.timeout
+            previous = {}
+            while waiting and time.perf_counter() < deadline:
+                listing = self._held_documents(self.api_module.list_documents())
+                previous = self._update_indexed(waiting, listing, previous)
+                waiting = self._waiting(entries)
+                if waiting:
+                    time.sleep(self.poll_interval)
+        return self._complete(entries, started)
+
+    async def ingest_async(self, file_paths: List[str]) -> Dict[str, Any]:
+        """Same as ingest, for async clients."""
+        started = time.perf_counter()
+        held = self._held_documents(await self.api_module.list_documents()) if self.dedup and hasattr(self.api_module, 'list_documents') else None
+        entries = self._plan(file_paths, held)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def upload(entry):
+            async with semaphore:
+                upload_started = time.perf_counter()
+                result = await self.api_module.upload_document(entry['file_path'])
+                if 'error' not in result and hasattr(self.api_module, 'embed_document'):
+                    result = self._merge_embedding(result, await self.api_module.embed_document(result))
+            self._finish_upload(entry, result, upload_started)
+
+        await asyncio.gather(*(upload(entry) for entry in entries if entry['status'] == 'pending'))
+
+        waiting = self._waiting(entries)
+        if waiting:
+            deadline = time.perf_counter() + self.timeout
+            previous = {}
+            while waiting and time.perf_counter() < deadline:
+                listing = self._held_documents(await self.api_module.list_documents())
+                previous = self._update_indexed(waiting, listing, previous)
+                waiting = self._waiting(entries)
+                if waiting:
+                    await asyncio.sleep(self.poll_interval)
+        # Completing records the uploads in the fsynced run manifest, which must not block the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._complete, entries, started)
+
+    def _plan(self, file_paths: List[str], held: Optional[Dict[str, int]]) -> List[Dict[str, Any]]:
+        """Hash every file and decide which ones must be uploaded."""
+        registry = self._load_registry().get(self.target, {})
+        seen = {}
+        entries = []
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            entry = {'filename': filename, 'file_path': file_path, 'sha256': None, 'size': None, 'status': 'pending', 'upload_time': None, 'index_time': None}
+            entries.append(entry)
+            try:
+                entry['sha256'] = file_sha256(file_path)
+                entry['size'] = os.path.getsize(file_path)
+            except OSError as e:
+                logging.error(f"[{self.framework_name}] Cannot read {file_path}: {e}")
+                entry['status'] = 'failed'
+                continue
+
+            upload_key = RunManifest.upload_key(self.framework_name, filename) if self.manifest is not None else None
+            if upload_key and self.manifest.is_done(upload_key):
+                entry['status'] = 'skipped'
+                logging.info(f"[{self.framework_name}] Skipping upload of {filename}, already completed in this run.")
+            elif not self.dedup:
+                continue
+            elif held is not None and filename in held and registry.get(filename, entry['sha256']) == entry['sha256']:
+                # A document we never registered is assumed to be the same one
+                entry['status'] = 'skipped'
+                logging.info(f"[{self.framework_name}] Skipping upload of {filename}, already held by {self.target}.")
+                seen.setdefault(entry['sha256'], filename)
+            elif entry['sha256'] in seen:
+                entry['status'] = 'duplicate'
+                logging.info(f"[{self.framework_name}] Skipping upload of {filename}, same content as {seen[entry['sha256']]}.")
+            else:
+                if held is not None and filename in held:
+                    logging.warning(f"[{self.framework_name}] {filename} changed since it was uploaded to {self.target}, uploading it again.")
+                seen[entry['sha256']] = filename
+        return entries
+
+    @staticmethod
+    def _merge_embedding(upload_result: Dict[str, Any], embed_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold the embedding step into the upload result, so a failed embedding fails the upload."""
+        if 'error' in embed_result:
+            return {**upload_result, 'error': f"Embedding failed: {embed_result['error']}"}
+        return upload_result
+
+    def _finish_upload(self, entry: Dict[str, Any], result: Dict[str, Any], upload_started: float) -> None:
+        entry['upload_time'] = time.perf_counter() - upload_started
+        entry['_started'] = upload_started
+        if self.tracker is not None:
+            self.tracker.record(self.framework_name, 'upload_document', result.get('timing'))
+        if 'error' in result:
+            entry['status'] = 'failed'
+            entry['error'] = result['error']
+        else:
+            entry['status'] = 'uploaded'
+
+    def _waiting(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the uploaded entries that are not indexed yet, when completion can be tracked."""
+        if not self.wait or not hasattr(self.api_module, 'list_documents'):
+            return []
+        return [entry for entry in entries if entry['status'] == 'uploaded' and not entry.get('untracked')]
+
+    def _update_indexed(self, waiting: List[Dict[str, Any]], listing: Optional[Dict[str, int]], previous: Dict[str, int]) -> Dict[str, int]:
+        """Mark as indexed the documents whose chunk count did not change since the previous poll."""
+        if listing is None:
+            # Without a listing the indexing cannot be followed, so the documents stay uploaded instead of waiting for the timeout
+            logging.warning(f"[{self.framework_name}] Not waiting for {len(waiting)} document(s) to be indexed, their completion cannot be tracked.")
+            for entry in waiting:
+                entry['untracked'] = True
+            return previous
+        now = time.perf_counter()
+        for entry in waiting:
+            chunks = listing.get(entry['filename'])
+            # Chunks are embedded one after the other: the document is complete once its count stops growing
+            if chunks and chunks == previous.get(entry['filename']):
+                entry['status'] = 'indexed'
+                entry['chunks'] = chunks
+                entry['index_time'] = now - entry['_started']
+                logging.info(f"[{self.framework_name}] {entry['filename']} indexed with {chunks} chunks in {entry['index_time']:.2f}s.")
+        return listing
+
+    def _complete(self, entries: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+        """Record the ingested documents and build the ingestion report."""
+        duration = time.perf_counter() - started
+        for entry in self._waiting(entries):
+            entry['status'] = 'not_indexed'
+            logging.warning(f"[{self.framework_name}] {entry['filename']} was not indexed within {self.timeout}s.")
+
+        ingested = [entry for entry in entries if entry['status'] in ('uploaded', 'indexed')]
+        for entry in ingested:
+            if self.manifest is not None:
+                self.manifest.mark_done(RunManifest.upload_key(self.framework_name, entry['filename']))
+        self._save_registry({entry['filename']: entry['sha256'] for entry in ingested})
+
+        uploaded = [entry for entry in entries if entry['upload_time'] is not None]
+        uploaded_bytes = sum(entry['size'] for entry in uploaded)
+        statuses = {}
+        for entry in entries:
+            entry.pop('_started', None)
+            statuses[entry['status']] = statuses.get(entry['status'], 0) + 1
+        report = {
+            'target': self.target,
+            'documents': len(entries),
+            'statuses': statuses,
+            'uploaded_bytes': uploaded_bytes,
+            'duration': duration,
+            'mb_per_sec': uploaded_bytes / 1e6 / duration if duration else None,
+            'docs_per_sec': len(uploaded) / duration if duration else None,
+            'upload_time': describe([entry['upload_time'] for entry in uploaded]),
+            'index_time': describe([entry['index_time'] for entry in uploaded]),
+            'files': entries
+        }
+        logging.info(f"[{self.framework_name}] Ingestion completed in {duration:.2f}s: {statuses}, {len(uploaded)} documents uploaded at {report['docs_per_sec'] or 0:.2f} docs/s, {report['mb_per_sec'] or 0:.3f} MB/s.")
+        if self.tracker is not None:
+            self.tracker.attach(self.framework_name, 'ingestion', report)
+        return report
+
+    def _held_documents(self, response: Dict[str, Any]) -> Optional[Dict[str, int]]:
+        """Return the documents held by the framework, or None when they cannot be listed."""
+        if 'error' in response:
+            logging.warning(f"[{self.framework_name}] Cannot list the documents held by {self.target}: {response['error']}")
+            return None
+        return response.get('documents', {})
+
+    def _load_registry(self) -> Dict[str, Dict[str, str]]:
+        with _registry_lock:
+            return self._read_registry()
+
+    def _read_registry(self) -> Dict[str, Dict[str, str]]:
+        if not self.registry_path or not os.path.exists(self.registry_path):
+            return {}
+        try:
+            with open(self.registry_path, 'r') as file:
+                return json.load(file)
+        except (IOError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable ingestion registry {self.registry_path}: {e}")
+            return {}
+
+    def _save_registry(self, hashes: Dict[str, str]) -> None:
+        """Atomically add the content hashes of the ingested documents to the registry."""
+        if not self.registry_path or not hashes:
+            return
+        with _registry_lock:
+            registry = self._read_registry()
+            registry.setdefault(self.target, {}).update(hashes)
+            os.makedirs(os.path.dirname(self.registry_path) or '.', exist_ok=True)
+            tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(registry, file, indent=4)
+            os.replace(tmp_path, self.registry_path)
@@ -0,0 +1,61 @@
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+JUDGE_BACKENDS = ['openai', 'local', 'stub']
+DEFAULT_JUDGE_MODEL = "gpt-4o-mini"
+DEFAULT_LOCAL_URL = "http://localhost:11434/v1"
+
+
+class JudgeBackend:
+    def __init__(self, backend: str = 'openai', model: str = DEFAULT_JUDGE_MODEL, base_url: str = DEFAULT_LOCAL_URL, api_key: Optional[str] = None, max_concurrency: int = 4, temperature: float = 0.0, http: Optional[Dict[str, Any]] = None):
+        """Initialize the judge settings: OpenAI, a local OpenAI-compatible endpoint such as ollama, or the offline stub."""
+        if backend not in JUDGE_BACKENDS:
+            raise ValueError(f"Unknown judge backend '{backend}'. Expected one of {JUDGE_BACKENDS}.")
+        self.backend = backend
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.temperature = temperature
+        self.http_config = http or {}
+        # Shared by the judges of every worker thread, so the local server never gets more than max_concurrency requests
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._http = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """Return the judge identity used in score cache keys; OpenAI keeps the bare model name of earlier caches."""
+        return self.model if self.backend == 'openai' else f"{self.backend}:{self.model}"
+
+    @property
+    def needs_openai_key(self) -> bool:
+        return self.backend == 'openai'
+
+    def create(self):
+        """Create a judge client for the metrics of one worker thread."""
+        # deepeval is heavy to import, so the judge models are only loaded once the first metric is built
+        if self.backend == 'openai':
+            from deepeval.models import GPTModel
+            return GPTModel(model=self.model)
+        if self.backend == 'stub':
+            from modules.judge_models import StubJudge
+            return StubJudge(self.model)
+        from modules.judge_models import LocalJudge
+        return LocalJudge(self.model, self.base_url, self._session(), self.semaphore, api_key=self.api_key, temperature=self.temperature, max_concurrency=self.max_concurrency)
+
+    def close(self) -> None:
+        """Close the pooled connections to the local endpoint, if any."""
+        if self._http is not None:
+            self._http.close()
+
+    def _session(self):
+        with self._lock:
+            if self._http is None:
+                from modules.http_session import HttpSession
+                http_config = dict(self.http_config)
+                http_config.setdefault('pool_size', self.max_concurrency)
+                self._http = HttpSession(**http_config)
+                logging.info(f"Judging with {self.model} at {self.base_url}, at most {self.max_concurrency} requests at a time.")
+            return self._http
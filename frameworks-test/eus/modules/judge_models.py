@@ -0,0 +1,121 @@
+import json
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Literal, Optional, Union, get_args, get_origin
+from deepeval.models import DeepEvalBaseLLM
+
+VERDICTS = ("yes", "no")
+
+
+def parse_json_response(text: str, schema):
+    """Parse the JSON object of a judge answer, ignoring any text around it, into the schema the metric expects."""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError(f"The judge did not answer with a JSON object: {text[:200]}")
+    return schema(**json.loads(text[start:end + 1]))
+
+
+class LocalJudge(DeepEvalBaseLLM):
+    def __init__(self, model: str, base_url: str, http, semaphore: threading.BoundedSemaphore, api_key: Optional[str] = None, temperature: float = 0.0, max_concurrency: int = 4):
+        """Initialize a judge served by an OpenAI-compatible chat completions endpoint, such as ollama or vLLM."""
+        self.model_name = model
+        self.base_url = base_url
+        self.http = http
+        self.semaphore = semaphore
+        self.headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        super().__init__(model)
+
+    def load_model(self):
+        return self.model_name
+
+    def get_model_name(self) -> str:
+        return self.model_name
+
+    def generate(self, prompt: str, schema=None):
+        """Send a prompt to the endpoint, waiting for a free slot, and return the answer or the schema it fills."""
+        payload = {
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': self.temperature
+        }
+        if schema is not None:
+            payload['response_format'] = {'type': 'json_object'}
+        with self.semaphore:
+            response = self.http.request('POST', f"{self.base_url}/chat/completions", json=payload, headers=self.headers, idempotent=True)
+        response.raise_for_status()
+        text = response.json()['choices'][0]['message']['content']
+        return parse_json_response(text, schema) if schema is not None else text
+
+    async def a_generate(self, prompt: str, schema=None):
+        return await asyncio.to_thread(self.generate, prompt, schema)
+
+    def batch_generate(self, prompts: List[str], schemas: Optional[list] = None) -> list:
+        """Send a batch of prompts at once, so the server batches them together, and return the answers in order."""
+        schemas = schemas or [None] * len(prompts)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(prompts)))) as executor:
+            return list(executor.map(self.generate, prompts, schemas))
+
+
+class StubJudge(DeepEvalBaseLLM):
+    def __init__(self, model: str = "stub"):
+        """Initialize an offline judge whose answers are derived from a hash of the prompt, so scores are reproducible."""
+        self.model_name = model
+        super().__init__(model)
+
+    def load_model(self):
+        return self.model_name
+
+    def get_model_name(self) -> str:
+        return f"stub:{self.model_name}"
+
+    def generate(self, prompt: str, schema=None):
+        if schema is None:
+            return f"Stub judge answer {self._seed(prompt) % 1000}."
+        return self._build(schema, prompt)
+
+    async def a_generate(self, prompt: str, schema=None):
+        return self.generate(prompt, schema)
+
+    def batch_generate(self, prompts: List[str], schemas: Optional[list] = None) -> list:
+        schemas = schemas or [None] * len(prompts)
+        return [self.generate(prompt, schema) for prompt, schema in zip(prompts, schemas)]
+
+    @staticmethod
+    def _seed(*parts: str) -> int:
+        return int(hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()[:12], 16)
+
+    def _build(self, schema, path: str):
+        fields = getattr(schema, 'model_fields', None) or getattr(schema, '__fields__', {})
+        values = {}
+        for name, field in fields.items():
+            annotation = getattr(field, 'annotation', None) or getattr(field, 'outer_type_', str)
+            values[name] = self._value(annotation, name, f"{path}/{name}")
+        return schema(**values)
+
+    def _value(self, annotation, name: str, path: str) -> Any:
+        seed = self._seed(path)
+        origin, args = get_origin(annotation), get_args(annotation)
+        if origin is Union:
+            return self._value(next(arg for arg in args if arg is not type(None)), name, path)
+        if origin is Literal:
+            return args[seed % len(args)]
+        if origin in (list, List):
+            return [self._value(args[0] if args else str, name, f"{path}/{index}") for index in range(1 + seed % 3)]
+        if origin is dict or annotation is dict:
+            return {}
+        if isinstance(annotation, type) and (hasattr(annotation, 'model_fields') or hasattr(annotation, '__fields__')):
+            return self._build(annotation, path)
+        if annotation is bool:
+            return seed % 2 == 0
+        if annotation is int:
+            # Integer fields are G-Eval style 0-10 scores
+            return seed % 11
+        if annotation is float:
+            return (seed % 101) / 100
+        if name == 'verdict':
+            return VERDICTS[seed % len(VERDICTS)]
+        return f"Stub {name} {seed % 1000}."
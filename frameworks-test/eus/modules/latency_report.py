@@ -0,0 +1,140 @@
+import time
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+STREAM_MEASURES = ['ttft', 'inter_token_latency', 'generation_time', 'tokens']
+
+
+def build_timing(started: float, status_code: Optional[int] = None, ttfb: Optional[float] = None, response_size: Optional[int] = None) -> Dict[str, Any]:
+    """Build the timing record of a request started at the given perf_counter value."""
+    return {
+        'wall_time': time.perf_counter() - started,
+        'ttfb': ttfb,
+        'response_size': response_size,
+        'status_code': status_code
+    }
+
+
+def timing_from_response(started: float, response=None) -> Dict[str, Any]:
+    """Build the timing record of a requests call; TTFB is the time until the response headers were parsed."""
+    if response is None:
+        return build_timing(started)
+    return build_timing(started, response.status_code, response.elapsed.total_seconds(), len(response.content))
+
+
+def stream_timing(started: float, arrivals: List[float], status_code: Optional[int] = None, ttfb: Optional[float] = None, response_size: Optional[int] = None) -> Dict[str, Any]:
+    """Build the timing record of a streamed answer from the perf_counter arrival times of its tokens."""
+    timing = build_timing(started, status_code, ttfb, response_size)
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    timing.update({
+        'ttft': arrivals[0] - started if arrivals else None,
+        'inter_token_latency': sum(gaps) / len(gaps) if gaps else None,
+        'generation_time': arrivals[-1] - arrivals[0] if arrivals else None,
+        'tokens': len(arrivals)
+    })
+    return timing
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Return the p-th percentile of values using linear interpolation."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def describe(values: List[float]) -> Dict[str, Optional[float]]:
+    """Return count, mean, max and p50/p90/p99 of a list of values."""
+    values = [value for value in values if value is not None]
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None
+    }
+
+
+def is_error(timing: Dict[str, Any]) -> bool:
+    """Return whether a timed request failed."""
+    status_code = timing.get('status_code')
+    return status_code is None or status_code >= 400
+
+
+class LatencyTracker:
+    def __init__(self):
+        """Initialize an empty, thread-safe collection of request timings."""
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._suite_times = {}
+        self._reports = {}
+
+    def start(self, framework: str) -> None:
+        """Mark the start of the test suite of a framework."""
+        with self._lock:
+            self._suite_times[framework] = [time.perf_counter(), None]
+
+    def stop(self, framework: str) -> None:
+        """Mark the end of the test suite of a framework."""
+        with self._lock:
+            if framework in self._suite_times:
+                self._suite_times[framework][1] = time.perf_counter()
+
+    def record(self, framework: str, operation: str, timing: Optional[Dict[str, Any]]) -> None:
+        """Record the timing of one framework call, e.g. send_message or upload_document."""
+        if not timing:
+            return
+        with self._lock:
+            self._timings.setdefault(framework, {}).setdefault(operation, []).append(timing)
+
+    def attach(self, framework: str, name: str, report: Dict[str, Any]) -> None:
+        """Attach a stage report, e.g. the ingestion report, to the summary of a framework."""
+        with self._lock:
+            self._reports.setdefault(framework, {})[name] = report
+
+    def summary(self) -> Dict[str, Any]:
+        """Return per-framework latency percentiles, throughput and error rate of every operation."""
+        with self._lock:
+            timings = {framework: {operation: list(values) for operation, values in operations.items()} for framework, operations in self._timings.items()}
+            suite_times = dict(self._suite_times)
+            reports = {framework: dict(stages) for framework, stages in self._reports.items()}
+
+        summary = {}
+        for framework, operations in timings.items():
+            started, stopped = suite_times.get(framework, (None, None))
+            duration = (stopped - started) if started is not None and stopped is not None else None
+            framework_summary = {'suite_duration': duration}
+            for operation, values in operations.items():
+                errors = sum(1 for timing in values if is_error(timing))
+                framework_summary[operation] = {
+                    'requests': len(values),
+                    'errors': errors,
+                    'error_rate': errors / len(values),
+                    'throughput_per_sec': len(values) / duration if duration else None,
+                    'wall_time': describe([timing['wall_time'] for timing in values]),
+                    'ttfb': describe([timing.get('ttfb') for timing in values]),
+                    'response_size': describe([timing.get('response_size') for timing in values])
+                }
+                # Streamed answers also report what users wait for: the first token and the pace of the next ones
+                if any('ttft' in timing for timing in values):
+                    for measure in STREAM_MEASURES:
+                        framework_summary[operation][measure] = describe([timing.get(measure) for timing in values])
+            summary[framework] = framework_summary
+        for framework, stages in reports.items():
+            summary.setdefault(framework, {}).update(stages)
+        return summary
+
+    def save(self, path: str) -> None:
+        """Write the summary to a JSON file."""
+        try:
+            with open(path, 'w') as file:
+                json.dump(self.summary(), file, indent=4)
+            logging.info(f"Latency summary successfully saved to {path}.")
+        except IOError as e:
+            logging.error(f"Error saving latency summary to {path}: {e}")
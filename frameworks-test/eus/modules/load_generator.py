@@ -0,0 +1,138 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from modules.latency_report import describe
+
+
+class LoadGenerator:
+    MODES = ['open', 'closed']
+
+    def __init__(self, api_module, questions: List[str], mode: str = 'open', levels: Optional[List[float]] = None, step_duration: float = 30.0, max_workers: int = 64, arrival: str = 'poisson', saturation_threshold: float = 0.9, max_error_rate: float = 0.05, seed: Optional[int] = None):
+        """Initialize a load generator; levels are arrival rates in requests/sec (open mode) or virtual users (closed mode)."""
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid load test mode '{mode}'. Expected one of {self.MODES}.")
+        if not questions:
+            raise ValueError("The load test needs at least one question.")
+        self.api_module = api_module
+        self.questions = questions
+        self.mode = mode
+        self.levels = levels or [1, 2, 4, 8]
+        self.step_duration = step_duration
+        self.max_workers = max_workers
+        self.arrival = arrival
+        self.saturation_threshold = saturation_threshold
+        self.max_error_rate = max_error_rate
+        self.random = random.Random(seed)
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Run every load level in increasing order and return one report per step."""
+        steps = []
+        for level in sorted(self.levels):
+            logging.info(f"Load test step: {self.mode} loop at level {level} for {self.step_duration}s...")
+            samples, start, elapsed = self._run_open(level) if self.mode == 'open' else self._run_closed(int(level))
+            step = self._report(level, samples, start, elapsed)
+            if self.mode == 'closed' and steps:
+                # In closed loop the framework is saturated when more users no longer bring more throughput
+                min_growth = 2 - self.saturation_threshold
+                step['saturated'] = step['saturated'] or step['throughput_per_sec'] < steps[-1]['throughput_per_sec'] * min_growth
+            logging.info(f"Level {level}: {step['throughput_per_sec']:.2f} req/s, p50 {step['latency']['p50']}, p99 {step['latency']['p99']}, error rate {step['error_rate']:.2%}")
+            steps.append(step)
+        return steps
+
+    @staticmethod
+    def saturation_level(steps: List[Dict[str, Any]]) -> Optional[float]:
+        """Return the first load level at which the framework was saturated, if any."""
+        for step in steps:
+            if step['saturated']:
+                return step['level']
+        return None
+
+    def _timed_call(self, question: str, scheduled: float) -> Dict[str, Any]:
+        """Send one question; latency counts from the scheduled time so queueing delay is not hidden."""
+        started = time.perf_counter()
+        try:
+            response = self.api_module.send_message(question)
+            error = 'error' in response.get('full_response', {})
+        except Exception as e:
+            logging.error(f"Load test request failed: {e}")
+            error = True
+        completed = time.perf_counter()
+        return {'latency': completed - scheduled, 'service_time': completed - started, 'scheduled': scheduled, 'completed': completed, 'error': error}
+
+    def _next_interval(self, rate: float) -> float:
+        if self.arrival == 'poisson':
+            return self.random.expovariate(rate)
+        return 1.0 / rate
+
+    def _run_open(self, rate: float):
+        """Send requests at a target arrival rate regardless of how fast responses come back."""
+        futures = []
+        start = time.perf_counter()
+        end = start + self.step_duration
+        scheduled = start
+        index = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                scheduled += self._next_interval(rate)
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                question = self.questions[index % len(self.questions)]
+                futures.append(executor.submit(self._timed_call, question, scheduled))
+                index += 1
+            samples = [future.result() for future in futures]
+        return samples, start, time.perf_counter() - start
+
+    def _run_closed(self, users: int):
+        """Run a fixed number of virtual users, each sending its next question as soon as the previous one returns."""
+        samples = []
+        lock = threading.Lock()
+        start = time.perf_counter()
+        end = start + self.step_duration
+
+        def virtual_user(user):
+            index = user
+            while time.perf_counter() < end:
+                sample = self._timed_call(self.questions[index % len(self.questions)], time.perf_counter())
+                with lock:
+                    samples.append(sample)
+                index += users
+
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            list(executor.map(virtual_user, range(users)))
+        return samples, start, time.perf_counter() - start
+
+    def _report(self, level: float, samples: List[Dict[str, Any]], start: float, elapsed: float) -> Dict[str, Any]:
+        errors = sum(1 for sample in samples if sample['error'])
+        throughput = len(samples) / elapsed if elapsed else 0.0
+        error_rate = errors / len(samples) if samples else 0.0
+        # Random arrivals offer more or fewer requests than the level, so the offered rate is the one actually sent
+        offered = len(samples) / self.step_duration
+        # The drain after the last send would dilute throughput, so only answers within the send window count
+        window_end = start + self.step_duration
+        answered = sum(1 for sample in samples if sample['completed'] <= window_end)
+        # Requests sent less than a typical service time before the end could not be answered in the window even without queueing
+        service_time = describe([sample['service_time'] for sample in samples])
+        due = sum(1 for sample in samples if sample['scheduled'] + (service_time['p50'] or 0.0) <= window_end)
+        step = {
+            'mode': self.mode,
+            'level': level,
+            'duration': elapsed,
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': error_rate,
+            'throughput_per_sec': throughput,
+            'offered_per_sec': offered if self.mode == 'open' else None,
+            'window_throughput_per_sec': answered / self.step_duration,
+            'latency': describe([sample['latency'] for sample in samples]),
+            'service_time': service_time
+        }
+        # In open loop the framework is saturated when it cannot keep up with the offered rate
+        keeps_up = self.mode == 'closed' or answered >= self.saturation_threshold * due
+        step['saturated'] = not keeps_up or error_rate > self.max_error_rate
+        return step
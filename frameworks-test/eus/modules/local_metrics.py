@@ -0,0 +1,86 @@
+import re
+from collections import Counter
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from modules.question_dataset import NO_EXPECTED_RESPONSE
+
+LOCAL_METRICS = ['answer_ok', 'exact_match', 'fuzzy_match', 'token_f1', 'context_overlap']
+
+
+@lru_cache(maxsize=4096)
+def normalize_text(text: str) -> str:
+    """Lowercase a text, drop punctuation and collapse whitespace."""
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+@lru_cache(maxsize=4096)
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Return the normalized word tokens of a text."""
+    return tuple(normalize_text(text).split())
+
+
+def token_f1(answer_tokens: Tuple[str, ...], expected_tokens: Tuple[str, ...]) -> float:
+    """Return the F1 of the tokens shared by an answer and the expected answer."""
+    common = sum((Counter(answer_tokens) & Counter(expected_tokens)).values())
+    if not common:
+        return 0.0
+    precision = common / len(answer_tokens)
+    recall = common / len(expected_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+class LocalScorer:
+    def __init__(self, metrics: Optional[List[str]] = None, short_circuit: bool = False, pass_threshold: float = 0.9):
+        """Initialize the local metrics, optionally skipping judge calls for clearly failed or trivially correct answers."""
+        self.metrics = metrics if metrics is not None else list(LOCAL_METRICS)
+        unknown = set(self.metrics) - set(LOCAL_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown local metrics {sorted(unknown)}. Expected some of {LOCAL_METRICS}.")
+        self.short_circuit = short_circuit
+        self.pass_threshold = pass_threshold
+
+    def score(self, output: Any, expected_output: Any, rag_output: Optional[List[str]], full_response: Any = None) -> Dict[str, Optional[float]]:
+        """Return every local metric of an answer; metrics that cannot be computed, e.g. without an expected answer, are None."""
+        # The metrics compare strings, which numpy arrays would not speed up, so each answer is scored once as its jobs are built
+        failed = not isinstance(output, str) or not output.strip() or (isinstance(full_response, dict) and 'error' in full_response)
+        scores = dict.fromkeys(LOCAL_METRICS)
+        scores['answer_ok'] = 0.0 if failed else 1.0
+        if failed:
+            return scores
+        answer = normalize_text(output)
+        answer_tokens = tokenize(output)
+        if isinstance(expected_output, str) and expected_output.strip() and expected_output != NO_EXPECTED_RESPONSE:
+            expected = normalize_text(expected_output)
+            scores['exact_match'] = 1.0 if answer == expected else 0.0
+            scores['fuzzy_match'] = round(SequenceMatcher(None, answer, expected).ratio(), 4)
+            scores['token_f1'] = round(token_f1(answer_tokens, tokenize(expected_output)), 4)
+        if rag_output:
+            # Contexts repeat across the questions of a document, so their tokens come from the cache
+            context_tokens = set()
+            for context in rag_output:
+                if isinstance(context, str):
+                    context_tokens.update(tokenize(context))
+            answer_vocabulary = set(answer_tokens)
+            scores['context_overlap'] = round(len(answer_vocabulary & context_tokens) / len(answer_vocabulary), 4) if answer_vocabulary else 0.0
+        return scores
+
+    def verdict(self, scores: Dict[str, Optional[float]]) -> Optional[str]:
+        """Return 'fail' for an empty or error answer, 'pass' for a match of the expected answer, None when the judge must decide."""
+        if not self.short_circuit:
+            return None
+        if scores['answer_ok'] == 0.0:
+            return 'fail'
+        if scores['exact_match'] == 1.0 or (scores['token_f1'] is not None and scores['token_f1'] >= self.pass_threshold):
+            return 'pass'
+        return None
+
+    @staticmethod
+    def reason(metric: str, scores: Dict[str, Optional[float]]) -> str:
+        """Explain a local score in the style of the judge reasons."""
+        if scores['answer_ok'] == 0.0:
+            return "The answer is empty or the framework returned an error."
+        if scores[metric] is None:
+            return "Not computed: no expected answer or retrieval context."
+        return f"Local {metric.replace('_', ' ')} score."
+
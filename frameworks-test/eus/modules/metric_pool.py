@@ -0,0 +1,51 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Per-measurement results a metric keeps on itself; cleared so a reused metric never reports a previous case
+RESULT_ATTRIBUTES = ("score", "reason", "success", "error")
+
+
+class MetricPool:
+    def __init__(self, metric_factory: Callable[[str, Any], Any], judge_factory: Optional[Callable[[], Any]] = None):
+        """Initialize a pool building each metric, and the judge client shared by the metrics, once per thread."""
+        self.metric_factory = metric_factory
+        self.judge_factory = judge_factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, name: str) -> Any:
+        """Return the calling thread's instance of a metric, ready to measure a new test case."""
+        metrics = self._thread_metrics()
+        metric = metrics.get(name)
+        if metric is None:
+            metric = self.metric_factory(name, self._thread_judge())
+            metrics[name] = metric
+            with self._lock:
+                self.created += 1
+            logging.debug(f"Built metric {name} for thread {threading.current_thread().name}.")
+        else:
+            for attribute in RESULT_ATTRIBUTES:
+                if hasattr(metric, attribute):
+                    setattr(metric, attribute, None)
+            with self._lock:
+                self.reused += 1
+        return metric
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many metrics were built and how many times one was reused."""
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused}
+
+    def _thread_metrics(self) -> Dict[str, Any]:
+        if not hasattr(self._local, 'metrics'):
+            self._local.metrics = {}
+        return self._local.metrics
+
+    def _thread_judge(self) -> Any:
+        # Metrics are stateful, so each thread gets its own; the judge client is shared only within a thread
+        if not hasattr(self._local, 'judge'):
+            self._local.judge = self.judge_factory() if self.judge_factory else None
+        return self._local.judge
@@ -0,0 +1,96 @@
+import csv
+import json
+import logging
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+FORMATS = ['jsonl', 'csv']
+GENERIC_FILE = "generic question"
+NO_EXPECTED_RESPONSE = "No expected response available"
+
+
+def parse_shard(shard: Optional[str]) -> Tuple[int, Optional[int]]:
+    """Parse a START:STOP record range; either bound may be omitted."""
+    if not shard:
+        return 0, None
+    try:
+        start, stop = shard.split(':')
+        return int(start) if start else 0, int(stop) if stop else None
+    except ValueError:
+        raise ValueError(f"Invalid shard '{shard}'. Expected format: START:STOP")
+
+
+def detect_format(path: str) -> str:
+    """Return the dataset format from the file extension."""
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported question file '{path}'. Expected one of {FORMATS}.")
+    return extension
+
+
+def normalize_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a question record with file, question, expected_answer and tags; an empty file means a generic question."""
+    tags = raw.get('tags') or []
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(';') if tag.strip()]
+    expected_answer = raw.get('expected_answer', raw.get('expected_response'))
+    return {
+        'file': raw.get('file') or GENERIC_FILE,
+        'question': raw.get('question', ''),
+        'expected_answer': expected_answer if expected_answer else NO_EXPECTED_RESPONSE,
+        'tags': tags
+    }
+
+
+def iter_questions(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Lazily yield the question records of a JSONL or CSV file, from record start (included) to stop (excluded)."""
+    with open(path, 'r', newline='') as file:
+        if detect_format(path) == 'csv':
+            rows = csv.DictReader(file)
+        else:
+            rows = _iter_json_lines(file, path)
+        for raw in islice(rows, start, stop):
+            record = normalize_record(raw)
+            if not record['question']:
+                if raw:
+                    logging.warning(f"Skipping a record without a question in {path}.")
+                continue
+            yield record
+
+
+def count_records(path: str) -> int:
+    """Return the number of records of a question file, as counted by shard ranges."""
+    with open(path, 'r', newline='') as file:
+        rows = csv.DictReader(file) if detect_format(path) == 'csv' else _iter_json_lines(file, path)
+        return sum(1 for _ in rows)
+
+
+def write_questions(records: Iterable[Dict[str, Any]], path: str) -> int:
+    """Write question records to a JSONL file and return their number."""
+    count = 0
+    with open(path, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def list_documents(path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """Return the distinct documents referenced by a range of question records, in order of first appearance."""
+    documents = {}
+    for record in iter_questions(path, start, stop):
+        if record['file'] != GENERIC_FILE:
+            documents.setdefault(record['file'], None)
+    return list(documents)
+
+
+def _iter_json_lines(file, path: str) -> Iterator[Dict[str, Any]]:
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Malformed lines still count as records, so shard boundaries do not move
+            logging.warning(f"Skipping malformed line {line_number} in {path}.")
+            yield {}
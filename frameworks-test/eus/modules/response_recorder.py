@@ -0,0 +1,77 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+
+class ResponseRecorder:
+    MODES = ['off', 'record', 'replay']
+    # Request headers that select what the framework answers, such as the Cheshire Cat session
+    FINGERPRINT_HEADERS = ('user_id',)
+
+    def __init__(self, directory: str, mode: str = 'record'):
+        """Initialize the recorder that persists API responses under the given directory."""
+        if mode not in self.MODES:
+            raise ValueError(f"Invalid recorder mode '{mode}'. Expected one of {self.MODES}.")
+        self.directory = directory
+        self.mode = mode
+        self.session_alias = None
+        os.makedirs(directory, exist_ok=True)
+        logging.info(f"Response recorder in '{mode}' mode using {directory}")
+        if mode == 'replay':
+            logging.info("Replayed responses report the latency measured when they were recorded.")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def alias_sessions(self, prefix: str, recorded_prefix: str) -> None:
+        """Fingerprint the session ids starting with prefix as if they started with recorded_prefix."""
+        self.session_alias = (prefix, recorded_prefix) if prefix != recorded_prefix else None
+
+    def fingerprint(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None, files: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> str:
+        """Compute the fingerprint of a request from its method, URL, payload, file contents and allow-listed headers."""
+        digest = hashlib.sha256()
+        digest.update(method.upper().encode('utf-8'))
+        digest.update(url.encode('utf-8'))
+        digest.update(self._unalias(json.dumps(payload, sort_keys=True, default=str)).encode('utf-8'))
+        selected = {name: value for name, value in (headers or {}).items() if name in self.FINGERPRINT_HEADERS}
+        if selected:
+            digest.update(self._unalias(json.dumps(selected, sort_keys=True)).encode('utf-8'))
+        for field_name, (file_name, file, content_type) in sorted((files or {}).items()):
+            digest.update(f"{field_name}:{file_name}:{content_type}".encode('utf-8'))
+            position = file.tell()
+            digest.update(hashlib.sha256(file.read()).digest())
+            file.seek(position)
+        return digest.hexdigest()
+
+    def record(self, fingerprint: str, response: Dict[str, Any]) -> None:
+        """Persist a response with its timing, atomically replacing any previous recording."""
+        if self.mode != 'record':
+            return
+        path = self._path(fingerprint)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(response, file)
+        os.replace(tmp_path, path)
+
+    def replay(self, fingerprint: str) -> Dict[str, Any]:
+        """Return the recorded response for a fingerprint."""
+        path = self._path(fingerprint)
+        try:
+            with open(path, 'r') as file:
+                return json.load(file)
+        except (IOError, ValueError) as e:
+            logging.error(f"No recorded response for request {fingerprint}: {e}")
+            return {'error': f"No recorded response for request {fingerprint}"}
+
+    def _unalias(self, serialized: str) -> str:
+        if self.session_alias is None:
+            return serialized
+        prefix, recorded_prefix = self.session_alias
+        return serialized.replace(f'"{prefix}-', f'"{recorded_prefix}-')
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{fingerprint}.json")
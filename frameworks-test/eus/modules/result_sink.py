@@ -0,0 +1,87 @@
+import os
+import csv
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class StreamingResultWriter:
+    def __init__(self, results_dir: str = 'results', jsonl_filename: str = 'test_results.jsonl', csv_filename: Optional[str] = None, fieldnames: Optional[List[str]] = None, flush: bool = True, fsync: bool = False):
+        """Open the JSONL (and optionally CSV) files that results are appended to as they complete."""
+        os.makedirs(results_dir, exist_ok=True)
+        self.jsonl_path = os.path.join(results_dir, jsonl_filename)
+        self.csv_path = os.path.join(results_dir, csv_filename) if csv_filename else None
+        self.flush = flush
+        self.fsync = fsync
+        self.count = 0
+        self._lock = threading.Lock()
+        self._jsonl_file = open(self.jsonl_path, 'w')
+        self._csv_file = None
+        self._csv_writer = None
+        if self.csv_path:
+            self._csv_file = open(self.csv_path, 'w', newline='')
+            self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=fieldnames, extrasaction='ignore')
+            self._csv_writer.writeheader()
+        logging.info(f"Streaming results to {self.jsonl_path}" + (f" and {self.csv_path}" if self.csv_path else ""))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def write(self, result: Dict[str, Any]) -> None:
+        """Append one result to the stream files."""
+        line = json.dumps(result)
+        with self._lock:
+            self._jsonl_file.write(line + '\n')
+            if self._csv_writer:
+                self._csv_writer.writerow(result)
+            self.count += 1
+            if self.flush or self.fsync:
+                self._flush()
+
+    def close(self) -> None:
+        """Flush and close the stream files."""
+        with self._lock:
+            if self._jsonl_file.closed:
+                return
+            self._flush()
+            self._jsonl_file.close()
+            if self._csv_file:
+                self._csv_file.close()
+        logging.info(f"{self.count} results streamed to {self.jsonl_path}.")
+
+    def _flush(self) -> None:
+        for file in (self._jsonl_file, self._csv_file):
+            if file is None:
+                continue
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Lazily read the records of a JSONL file, skipping a truncated last line."""
+    with open(path, 'r') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping malformed line {line_number} in {path}.")
+
+
+def dump_json_array(records: Iterable[Dict[str, Any]], path: str, indent: int = 4) -> int:
+    """Write records as an indented JSON array one at a time, with the same layout as json.dump."""
+    count = 0
+    padding = ' ' * indent
+    with open(path, 'w') as file:
+        for record in records:
+            body = json.dumps(record, indent=indent).replace('\n', '\n' + padding)
+            file.write(('[\n' if count == 0 else ',\n') + padding + body)
+            count += 1
+        file.write('\n]' if count else '[]')
+    return count
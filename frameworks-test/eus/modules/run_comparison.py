@@ -0,0 +1,110 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from modules.columnar_store import ResultStore
+
+# Rows of two runs are paired on these keys; the question is its content hash in the store
+SCORE_KEYS = ['framework', 'filename', 'question', 'metric']
+LATENCY_KEYS = ['framework', 'filename', 'question']
+# Bootstrap resamples are drawn in blocks of at most this many cells, so memory stays bounded on large suites
+MAX_BOOTSTRAP_CELLS = 4_000_000
+
+
+def bootstrap_mean_ci(deltas: np.ndarray, resamples: int = 2000, confidence: float = 0.95, rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+    """Return the percentile bootstrap confidence interval of the mean of paired deltas."""
+    rng = rng or np.random.default_rng()
+    count = len(deltas)
+    means = np.empty(resamples)
+    block = max(1, MAX_BOOTSTRAP_CELLS // count)
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        means[start:start + size] = deltas[rng.integers(0, count, size=(size, count))].mean(axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+class RunComparison:
+    def __init__(self, store: ResultStore, baseline: str, candidates: List[str], by: Sequence[str] = ('framework', 'metric'), resamples: int = 2000, confidence: float = 0.95, min_score_delta: float = 0.02, min_latency_delta: float = 0.05, seed: int = 0):
+        """Initialize a comparison of candidate runs against a baseline run, grouped by the given columns."""
+        self.store = store
+        self.baseline = baseline
+        self.candidates = candidates
+        self.by = list(by)
+        self.resamples = resamples
+        self.confidence = confidence
+        self.min_score_delta = min_score_delta
+        self.min_latency_delta = min_latency_delta
+        self.seed = seed
+
+    def compare(self) -> List[Dict[str, Any]]:
+        """Return the score and latency deltas of every candidate and group, with their confidence intervals and status."""
+        rows = []
+        for candidate in self.candidates:
+            rows.extend(self._compare_measure('score', 'evaluations', 'score', SCORE_KEYS, candidate, higher_is_better=True, min_delta=self.min_score_delta))
+            rows.extend(self._compare_measure('latency', 'results', 'wall_time', LATENCY_KEYS, candidate, higher_is_better=False, min_delta=self.min_latency_delta))
+        return rows
+
+    @staticmethod
+    def regressions(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [row for row in rows if row['status'] == 'regression']
+
+    def paired(self, table: str, column: str, keys: List[str], candidate: str):
+        """Return the mean value of every key in the baseline and the candidate run, for the keys present in both."""
+        pa = self.store.pa
+        sides = []
+        for run_id, name in ((self.baseline, 'baseline'), (candidate, 'candidate')):
+            values = self.store.table(table, runs=[run_id], columns=keys + [column])
+            # A question asked several times in a run counts once, with its mean value
+            values = values.group_by(keys).aggregate([(column, 'mean')])
+            sides.append(values.rename_columns(keys + [name]))
+        joined = sides[0].join(sides[1], keys=keys, join_type='inner')
+        unmatched = sides[0].num_rows + sides[1].num_rows - 2 * joined.num_rows
+        if unmatched:
+            logging.warning(f"{unmatched} {table} keys are only in one of {self.baseline} and {candidate}; they are not compared.")
+        return joined.filter(pa.compute.and_(pa.compute.is_valid(joined['baseline']), pa.compute.is_valid(joined['candidate'])))
+
+    def _compare_measure(self, measure: str, table: str, column: str, keys: List[str], candidate: str, higher_is_better: bool, min_delta: float) -> List[Dict[str, Any]]:
+        pa = self.store.pa
+        joined = self.paired(table, column, keys, candidate)
+        group_columns = [key for key in self.by if key in keys]
+        if joined.num_rows == 0:
+            return []
+        baseline = joined['baseline'].to_numpy()
+        deltas = joined['candidate'].to_numpy() - baseline
+        if group_columns:
+            labels = pa.compute.binary_join_element_wise(*[pa.compute.cast(joined[key], pa.string()) for key in group_columns], '\x1f').to_numpy(zero_copy_only=False)
+            groups, inverse = np.unique(labels, return_inverse=True)
+        else:
+            groups, inverse = np.array(['']), np.zeros(len(deltas), dtype=int)
+        # Rows are sorted by group once, then each group is a contiguous slice
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(groups)))
+        rng = np.random.default_rng(self.seed)
+
+        rows = []
+        start = 0
+        for group, stop in zip(groups, bounds):
+            indices = order[start:stop]
+            start = stop
+            group_deltas = deltas[indices]
+            low, high = bootstrap_mean_ci(group_deltas, self.resamples, self.confidence, rng)
+            delta = float(group_deltas.mean())
+            # A change counts when the whole interval is on one side of zero and the mean moved by at least min_delta
+            decreased = high < 0 and delta <= -min_delta
+            increased = low > 0 and delta >= min_delta
+            worse, better = (decreased, increased) if higher_is_better else (increased, decreased)
+            # Latency has no metric column; every row keeps the same columns anyway
+            row = {'candidate': candidate, 'measure': measure, **{key: None for key in self.by}}
+            row.update(zip(group_columns, group.split('\x1f')) if group_columns else [])
+            row.update({
+                'pairs': len(indices),
+                'baseline_mean': float(baseline[indices].mean()),
+                'candidate_mean': float(baseline[indices].mean() + delta),
+                'delta': delta,
+                'ci_low': low,
+                'ci_high': high,
+                'status': 'regression' if worse else 'improvement' if better else 'unchanged'
+            })
+            rows.append(row)
+        return rows
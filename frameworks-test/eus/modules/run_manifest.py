@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class RunManifest:
+    def __init__(self, runs_dir: str, run_id: str):
+        """Open the manifest of a run, loading the units already completed."""
+        self.run_id = run_id
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.manifest_path = os.path.join(self.run_dir, 'manifest.json')
+        self.journal_path = os.path.join(self.run_dir, 'units.jsonl')
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._offsets = {}
+        self._load_journal()
+        self._journal = open(self.journal_path, 'ab')
+
+    @classmethod
+    def create(cls, runs_dir: str, metadata: Optional[Dict[str, Any]] = None, keep_runs: Optional[int] = None) -> 'RunManifest':
+        """Create the manifest of a new run with a timestamp based run id, pruning all but the keep_runs latest completed runs."""
+        if keep_runs is not None:
+            cls.prune(runs_dir, keep_runs)
+        run_id = time.strftime('%Y%m%d-%H%M%S')
+        suffix = 1
+        while os.path.exists(os.path.join(runs_dir, run_id)):
+            run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        manifest = cls(runs_dir, run_id)
+        manifest.write_metadata({**(metadata or {}), 'run_id': run_id, 'created_at': time.time(), 'status': 'running'})
+        logging.info(f"Started run {run_id}. Resume it with --resume {run_id}")
+        return manifest
+
+    @classmethod
+    def resume(cls, runs_dir: str, run_id: str, metadata: Optional[Dict[str, Any]] = None) -> 'RunManifest':
+        """Open the manifest of an unfinished run, refusing it when its metadata differs from the given one."""
+        manifest_path = os.path.join(runs_dir, run_id, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"Run {run_id} not found in {runs_dir}.")
+        with open(manifest_path, 'r') as file:
+            saved = json.load(file)
+        if saved.get('status') == 'completed':
+            raise ValueError(f"Run {run_id} already completed, there is nothing to resume.")
+        # Completed units are matched by key, so they only stand for the same work under the same configuration and questions
+        mismatched = sorted(key for key, value in (metadata or {}).items() if saved.get(key) != value)
+        if mismatched:
+            raise ValueError(f"Run {run_id} cannot be resumed: {', '.join(mismatched)} changed since it started.")
+        manifest = cls(runs_dir, run_id)
+        manifest.write_metadata({**saved, 'status': 'running', 'resumed_at': time.time()})
+        logging.info(f"Resuming run {run_id}: {manifest.completed} units already completed.")
+        return manifest
+
+    @staticmethod
+    def upload_key(framework: str, filename: str) -> str:
+        return json.dumps(['upload', framework, filename])
+
+    @staticmethod
+    def question_key(framework: str, filename: str, question: str, index: int) -> str:
+        # The record index keeps the repeated questions of a file apart
+        return json.dumps(['question', framework, filename, question, index])
+
+    @staticmethod
+    def conversation_key(framework: str, conversation_id: str) -> str:
+        return json.dumps(['conversation', framework, conversation_id])
+
+    @staticmethod
+    def evaluation_key(interaction: Dict[str, Any], metric: str, index: int) -> str:
+        return json.dumps(['evaluation', interaction['framework'], interaction['filename'], interaction['question'], metric, index])
+
+    @staticmethod
+    def prune(runs_dir: str, keep_runs: int) -> List[str]:
+        """Delete all but the keep_runs most recent completed runs and return their ids; unfinished runs are kept for --resume."""
+        if not os.path.isdir(runs_dir):
+            return []
+        completed = []
+        for run_id in sorted(os.listdir(runs_dir)):
+            try:
+                with open(os.path.join(runs_dir, run_id, 'manifest.json'), 'r') as file:
+                    if json.load(file).get('status') == 'completed':
+                        completed.append(run_id)
+            except (IOError, ValueError):
+                continue
+        pruned = completed[:max(0, len(completed) - keep_runs)]
+        for run_id in pruned:
+            shutil.rmtree(os.path.join(runs_dir, run_id), ignore_errors=True)
+        if pruned:
+            logging.info(f"Pruned {len(pruned)} completed runs from {runs_dir}.")
+        return pruned
+
+    @property
+    def completed(self) -> int:
+        """Number of completed units."""
+        return len(self._offsets)
+
+    def is_done(self, key: str) -> bool:
+        """Return whether a unit was already completed."""
+        return key in self._offsets
+
+    def get(self, key: str) -> Any:
+        """Return the stored result of a completed unit."""
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                return None
+            with open(self.journal_path, 'rb') as file:
+                file.seek(offset)
+                return json.loads(file.readline())['result']
+
+    def mark_done(self, key: str, result: Any = None) -> None:
+        """Durably record a completed unit and its result."""
+        line = json.dumps({'key': key, 'result': result}).encode('utf-8')
+        with self._lock:
+            self._journal.seek(0, os.SEEK_END)
+            offset = self._journal.tell()
+            # One line per unit, fsynced before it counts as done: a torn last line is ignored on load
+            self._journal.write(line + b'\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._offsets[key] = offset
+
+    def read_metadata(self) -> Dict[str, Any]:
+        with open(self.manifest_path, 'r') as file:
+            return json.load(file)
+
+    def write_metadata(self, metadata: Dict[str, Any]) -> None:
+        """Atomically replace the run metadata."""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(metadata, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def finish(self) -> None:
+        """Mark the run as completed and delete the journal, whose results are now in the run outputs."""
+        self.write_metadata({**self.read_metadata(), 'status': 'completed', 'completed_at': time.time(), 'units': self.completed})
+        with self._lock:
+            self._journal.close()
+            os.remove(self.journal_path)
+
+    def _load_journal(self) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        valid_size = 0
+        with open(self.journal_path, 'rb') as file:
+            offset = 0
+            for line in file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("truncated line")
+                    self._offsets[json.loads(line)['key']] = offset
+                    valid_size = offset + len(line)
+                except (ValueError, KeyError):
+                    logging.warning(f"Ignoring incomplete unit at offset {offset} of {self.journal_path}.")
+                    break
+                offset += len(line)
+        # Drop a torn tail so new units are appended after the last complete one
+        if valid_size < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as file:
+                file.truncate(valid_size)
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def metric_fingerprint(metric) -> Dict[str, Any]:
+    """Return the configuration of a metric instance that influences its score."""
+    fingerprint = {"class": metric.__class__.__name__}
+    for attribute in ("threshold", "include_reason", "strict_mode", "name", "criteria", "evaluation_steps"):
+        value = getattr(metric, attribute, None)
+        if isinstance(value, (str, int, float, bool, list, tuple)) or value is None:
+            fingerprint[attribute] = value
+    evaluation_params = getattr(metric, "evaluation_params", None)
+    if evaluation_params:
+        fingerprint["evaluation_params"] = [str(param) for param in evaluation_params]
+    return fingerprint
+
+
+def make_key(metric_name: str, metric_config: Dict[str, Any], judge_model: str, input: str, actual_output: Any, expected_output: Any = None, retrieval_context: Optional[List[str]] = None) -> str:
+    """Build the content-addressed cache key of an evaluation job."""
+    content = {
+        "metric_name": metric_name,
+        "metric_config": metric_config,
+        "judge_model": judge_model,
+        "input": input,
+        "actual_output": actual_output,
+        "expected_output": expected_output,
+        "retrieval_context": retrieval_context
+    }
+    serialized = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    # An entry's last use is only refreshed when older than this, and refreshes are written in batches
+    TOUCH_INTERVAL = 3600
+    TOUCH_BATCH = 100
+    # Limits are enforced again every so many puts, so a long run cannot grow the cache without bound
+    EVICT_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: Optional[int] = None, max_age_days: Optional[float] = None):
+        """Open (or create) the SQLite score cache at the given path."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "key TEXT PRIMARY KEY, score REAL, reason TEXT, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS scores_accessed_at ON scores (accessed_at)")
+        self._connection.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[Tuple[float, Optional[str]]]:
+        """Return the cached (score, reason) for a key, or None on a miss."""
+        with self._lock:
+            row = self._connection.execute("SELECT score, reason, created_at, accessed_at FROM scores WHERE key = ?", (key,)).fetchone()
+            if row is None or self._is_expired(row[2]):
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[3] > self.TOUCH_INTERVAL:
+                self._touched[key] = now
+                if len(self._touched) >= self.TOUCH_BATCH:
+                    self._flush_touched()
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key: str, score: float, reason: Optional[str]) -> None:
+        """Store the score and reason of an evaluation job."""
+        if score is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO scores (key, score, reason, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, score, reason, now, now)
+            )
+            self._connection.commit()
+            self._puts += 1
+            evict = self._puts % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove expired entries and the least recently used ones above max_entries."""
+        removed = 0
+        with self._lock:
+            # Pending last uses are written first, so recently hit entries are not evicted as unused
+            self._flush_touched()
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._connection.execute("DELETE FROM scores WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_entries:
+                removed += self._connection.execute(
+                    "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            self._connection.commit()
+        if removed:
+            logging.info(f"Evicted {removed} entries from score cache {self.path}.")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        """Apply eviction and close the database."""
+        self.evict()
+        with self._lock:
+            self._connection.close()
+
+    def _flush_touched(self) -> None:
+        """Write the pending last-use times in one transaction; the caller holds the lock."""
+        if not self._touched:
+            return
+        self._connection.executemany("UPDATE scores SET accessed_at = ? WHERE key = ?", [(accessed_at, key) for key, accessed_at in self._touched.items()])
+        self._connection.commit()
+        self._touched = {}
+
+    def _is_expired(self, created_at: float) -> bool:
+        return bool(self.max_age_days) and created_at < time.time() - self.max_age_days * 86400
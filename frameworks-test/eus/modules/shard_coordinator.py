@@ -0,0 +1,110 @@
+import os
+import json
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+def split_ranges(total: int, shards: int) -> List[Tuple[int, int]]:
+    """Split total records into at most shards contiguous (start, stop) ranges of nearly equal size."""
+    shards = max(1, min(shards, total))
+    size, remainder = divmod(total, shards)
+    ranges = []
+    start = 0
+    for index in range(shards):
+        stop = start + size + (1 if index < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def latest_run_id(results_dir: str) -> Optional[str]:
+    """Return the id of the most recent unfinished run of a results directory, if any."""
+    runs_dir = os.path.join(results_dir, 'runs')
+    if not os.path.isdir(runs_dir):
+        return None
+    for run_id in sorted(os.listdir(runs_dir), reverse=True):
+        try:
+            with open(os.path.join(runs_dir, run_id, 'manifest.json'), 'r') as file:
+                if json.load(file).get('status') != 'completed':
+                    return run_id
+        except (IOError, ValueError):
+            continue
+    return None
+
+
+class ShardCoordinator:
+    def __init__(self, worker_command: List[str], shard_root: str, ranges: List[Tuple[int, int]], workers: int = 2, max_retries: int = 2):
+        """Initialize a coordinator that runs worker_command once per record range, at most workers at a time."""
+        self.worker_command = worker_command
+        self.shard_root = shard_root
+        self.ranges = ranges
+        self.workers = workers
+        self.max_retries = max_retries
+        self.statuses: Optional[List[Dict[str, Any]]] = None
+        self._merged: Optional[List[str]] = None
+
+    def shard_dir(self, index: int) -> str:
+        return os.path.join(self.shard_root, f"shard-{index:04d}")
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Run every shard in its own worker process, retrying failed ones, and return their statuses in shard order."""
+        logging.info(f"Running {len(self.ranges)} shards with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shard') as executor:
+            statuses = list(executor.map(self._run_shard, range(len(self.ranges))))
+        self.statuses = statuses
+        failed = [status['shard'] for status in statuses if not status['succeeded']]
+        if failed:
+            logging.error(f"Shards {failed} failed after {self.max_retries} retries; their results are missing from the merge.")
+        return statuses
+
+    def _run_shard(self, index: int) -> Dict[str, Any]:
+        start, stop = self.ranges[index]
+        results_dir = self.shard_dir(index)
+        # Shard directories are reused across coordinator runs, so the results of a previous run must not survive
+        shutil.rmtree(results_dir, ignore_errors=True)
+        os.makedirs(results_dir, exist_ok=True)
+        command = self.worker_command + ['--shard', f"{start}:{stop}", '--results-dir', results_dir]
+        run_id = None
+        for attempt in range(self.max_retries + 1):
+            # A retried shard resumes the checkpoint of its first attempt instead of starting over
+            if attempt and run_id is None:
+                run_id = latest_run_id(results_dir)
+            resume = ['--resume', run_id] if run_id else []
+            logging.info(f"Shard {index} ({start}:{stop}) attempt {attempt + 1}...")
+            with open(os.path.join(results_dir, 'worker.log'), 'a') as log_file:
+                return_code = subprocess.call(command + resume, stdout=log_file, stderr=subprocess.STDOUT)
+            if return_code == 0:
+                logging.info(f"Shard {index} completed.")
+                return {'shard': index, 'start': start, 'stop': stop, 'attempts': attempt + 1, 'succeeded': True}
+            logging.warning(f"Shard {index} failed with exit code {return_code}, see {results_dir}/worker.log.")
+        return {'shard': index, 'start': start, 'stop': stop, 'attempts': self.max_retries + 1, 'succeeded': False}
+
+    def merged_shards(self) -> List[str]:
+        """Return the shard directories to merge: the succeeded shards of this run, or every finished shard found."""
+        if self.statuses is not None:
+            return [os.path.basename(self.shard_dir(status['shard'])) for status in self.statuses if status['succeeded']]
+        if self._merged is None:
+            # Merging shards run elsewhere: take every shard directory found whose checkpointed run finished
+            shard_dirs = sorted(name for name in os.listdir(self.shard_root) if name.startswith('shard-')) if os.path.isdir(self.shard_root) else []
+            unfinished = [name for name in shard_dirs if latest_run_id(os.path.join(self.shard_root, name))]
+            if unfinished:
+                logging.warning(f"Not merging shards {unfinished}: their runs did not finish.")
+            self._merged = [name for name in shard_dirs if name not in unfinished]
+        return self._merged
+
+    def iter_merged(self, filename: str, frameworks: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily read a result file of every merged shard, grouped by framework then shard order, like a single run writes it."""
+        shard_dirs = self.merged_shards()
+        for framework_name in frameworks or [None]:
+            for shard_dir in shard_dirs:
+                path = os.path.join(self.shard_root, shard_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'r') as file:
+                    records = json.load(file)
+                for record in records:
+                    if framework_name is None or record.get('framework') == framework_name:
+                        yield record
@@ -1,58 +1,72 @@
-from deepeval import evaluate
-from deepeval.test_case import LLMTestCase
-from deepeval import evaluate
-from deepeval.metrics import AnswerRelevancyMetric, FaithfulnessMetric, ContextualPrecisionMetric, ContextualRecallMetric, ContextualRelevancyMetric, BiasMetric
-from deepeval import evaluate
-from deepeval.test_case import LLMTestCaseParams
-from deepeval.metrics.ragas import RagasMetric
-from deepeval.metrics import HallucinationMetric
-import os
-from deepeval.metrics import GEval
 import argparse
 import os
 import json
+from modules.adapter_registry import get_adapter
+from modules.judge_backend import DEFAULT_JUDGE_MODEL, DEFAULT_LOCAL_URL, JUDGE_BACKENDS, JudgeBackend
+from modules.metric_pool import MetricPool
+from modules.score_cache import ScoreCache, make_key, metric_fingerprint
 
 parser = argparse.ArgumentParser(description='Evaluate a language model with RAG on a set of test cases.')
 parser.add_argument('--path_data', type=str, default="./results/test_results.json", help='Path to the data file containing the responses to evaluate.')
 parser.add_argument('--path_output', type=str, default="./results/output_results",help='Path to the output file to save the results.')
 parser.add_argument('--api_key', default="", type=str, help='API key for GPT model.')
+parser.add_argument('--cache_path', default="", type=str, help='Path to the SQLite score cache. Disabled when empty.')
+parser.add_argument('--cache_max_entries', default=None, type=int, help='Maximum number of entries kept in the score cache.')
+parser.add_argument('--cache_max_age_days', default=None, type=float, help='Maximum age in days of the score cache entries.')
+parser.add_argument('--judge_backend', default="openai", choices=JUDGE_BACKENDS, help='Judge with OpenAI, a local OpenAI-compatible endpoint such as ollama, or the offline stub.')
+parser.add_argument('--judge_model', default=DEFAULT_JUDGE_MODEL, type=str, help='Name of the judge model.')
+parser.add_argument('--judge_base_url', default=DEFAULT_LOCAL_URL, type=str, help='Base URL of the local judge endpoint.')
+parser.add_argument('--judge_max_concurrency', default=4, type=int, help='Maximum number of requests sent at once to the local judge endpoint.')
 args = parser.parse_args()
 
+judge_backend = JudgeBackend(args.judge_backend, model=args.judge_model, base_url=args.judge_base_url, max_concurrency=args.judge_max_concurrency)
+
+
+def create_judge():
+    """
+    Create the judge model client shared by the metrics.
+    """
+    return judge_backend.create()
 
 
-def metrics(name):
+def metrics(name, judge=None):
     """
-    Return the metric object corresponding to the given name.
+    Return the metric object corresponding to the given name, judged by the given client or the judge model.
     """
+    # deepeval is imported on first use, so --help and argument errors do not pay for it
+    from deepeval.test_case import LLMTestCaseParams
+    from deepeval.metrics import AnswerRelevancyMetric, FaithfulnessMetric, ContextualPrecisionMetric, ContextualRecallMetric, ContextualRelevancyMetric, BiasMetric, GEval
+    model = judge or args.judge_model
     if name=="relevancy":
         metric = AnswerRelevancyMetric(
                 threshold=0.7,
-                model="gpt-4o-mini",
+                model=model,
                 include_reason=True)
     elif name=="faithfulness":
         metric = FaithfulnessMetric(
             threshold=0.7,
-            model="gpt-4o-mini",
+            model=model,
             include_reason=True)
     elif name=='bias':
-        metric = BiasMetric(threshold=0.5)
+        metric = BiasMetric(threshold=0.5) if args.judge_backend == "openai" else BiasMetric(threshold=0.5, model=model)
     elif name=="contextual_precision":
         metric = ContextualPrecisionMetric(
             threshold=0.7,
-            model="gpt-4o-mini",
+            model=model,
             include_reason=True)
     elif name=="contextual_recall":
         metric = ContextualRecallMetric(
             threshold=0.7,
-            model="gpt-4o-mini",
+            model=model,
             include_reason=True)
     elif name=="contextual_relevancy":
         metric = ContextualRelevancyMetric(
             threshold=0.7,
-            model="gpt-4o-mini",
+            model=model,
             include_reason=True)
     elif name=="ragas":
-        metric = RagasMetric(threshold=0.5, model="gpt-4o-mini")
+        from deepeval.metrics.ragas import RagasMetric
+        metric = RagasMetric(threshold=0.5, model=args.judge_model)
     elif name=="geval":
         metric = GEval(
         name="Correctness",
@@ -62,7 +76,7 @@ def metrics(name):
             "Check whether the facts in 'actual output' contradicts any facts in 'expected output'",
             "You should also heavily penalize omission of detail",
             "Vague language, or contradicting OPINIONS, are OK"
-        ], model="gpt-4o-mini",
+        ], model=model,
         evaluation_params=[LLMTestCaseParams.INPUT, LLMTestCaseParams.ACTUAL_OUTPUT])
 
     return metric
@@ -73,6 +87,7 @@ def create_test_case(input, output, expected_output=None, rag_output=None):
     """
     Create a test case object with the given input and output.
     """
+    from deepeval.test_case import LLMTestCase
     if rag_output is not None:
         return LLMTestCase(
             input=input,
@@ -97,6 +112,21 @@ def evaluate_test_cases(test_cases, metric):
 
 
 
+def evaluate_with_cache(cache, metric_name, metric, test_case, input, output, expected_output=None, rag_output=None):
+    """
+    Evaluate a test case, reusing the cached score when the same job was already evaluated.
+    """
+    if cache is None:
+        return evaluate_test_cases(test_case, metric)
+    key = make_key(metric_name, metric_fingerprint(metric), judge_backend.name, input, output, expected_output, rag_output)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    score, reason = evaluate_test_cases(test_case, metric)
+    cache.put(key, score, reason)
+    return score, reason
+
+
 def save_results_to_json(results, path):
     """
     Save the results to a JSON file.
@@ -109,46 +139,28 @@ def get_data_interaction(interaction):
     """
     Get the input and output from the interaction.
     """
+    input = interaction['question']
+    output = interaction['text_response']
+    expected_response = interaction['expected_response']
+    rag_ouptut = get_adapter(interaction['framework']).extract_context(interaction['full_response'])
 
-    rag_ouptut = []
-    
-    if interaction['framework'] == "cheshirecat":
-        input = interaction['question']
-        output = interaction['text_response']
-        expected_response = interaction['expected_response']
-
-        full_response_memory = interaction['full_response']['data']['why']['memory']['declarative']
-
-        for element in full_response_memory:
-            rag_ouptut.append(element['page_content'])
-        
-        return input, output, expected_response, rag_ouptut
-    
-    elif interaction['framework'] == "anythingllm":
-        input = interaction['question']
-        output = interaction['text_response']
-        expected_response = interaction['expected_response']
-        # verify if is it correct since anythingllm does not response
-        full_response_memory = interaction['full_response']['data']['source']
-
-        for element in full_response_memory:
-            rag_ouptut.append(element)
-        
-        return input, output, expected_response, rag_ouptut
-    
-
-
-
-
+    return input, output, expected_response, rag_ouptut
 
 
 def main():
-    os.environ["OPENAI_API_KEY"]=args.api_key
+    if args.api_key:
+        os.environ["OPENAI_API_KEY"]=args.api_key
     # Load the data file
     with open(args.path_data, "r") as f:
         data_interaction = json.load(f)
 
+    cache = None
+    if args.cache_path:
+        cache = ScoreCache(args.cache_path, max_entries=args.cache_max_entries, max_age_days=args.cache_max_age_days)
+
     results_eval = []
+    # Each metric and the judge client are built once and reused for every interaction
+    metric_pool = MetricPool(metrics, create_judge)
     metrics_quality_response = ["relevancy"] #["relevancy", "bias"]
     metrics_rag = ["contextual_relevancy"] #others [ "faithfulness", "contextual_recall", "contextual_precision", 'ragas', 'geval']
                                 
@@ -158,10 +170,11 @@ def main():
         
         for metric_name in metrics_quality_response:
             
-            metric = metrics(metric_name)
+            metric = metric_pool.get(metric_name)
             # None rag_output since this metric does not use it
             test_case = create_test_case(input, output, expected_output, rag_output=None)
-            score, reason = evaluate_test_cases(test_case, metric)
+            # Same cache key fields as EvaluatorGPT, so both entry points share cached scores
+            score, reason = evaluate_with_cache(cache, metric_name, metric, test_case, input, output, expected_output, rag_output=None)
             results_eval.append({
                 "framework": interaction['framework'],
                 "filename": interaction['filename'],
@@ -176,9 +189,9 @@ def main():
             })
 
         for metric_name in metrics_rag:
-            metric = metrics(metric_name)
+            metric = metric_pool.get(metric_name)
             test_case = create_test_case(input, output, expected_output, rag_output)
-            score, reason = evaluate_test_cases(test_case, metric)
+            score, reason = evaluate_with_cache(cache, metric_name, metric, test_case, input, output, expected_output, rag_output)
             results_eval.append({
                 "framework": interaction['framework'],
                 "filename": interaction['filename'],
@@ -193,6 +206,14 @@ def main():
             })
 
     save_results_to_json(results_eval, args.path_output)
+
+    pool_stats = metric_pool.stats()
+    print(f"Metric pool: {pool_stats['created']} metrics built, {pool_stats['reused']} reused")
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Score cache: {stats['hits']} hits, {stats['misses']} misses")
+        cache.close()
         
     
 
@@ -1,11 +1,28 @@
 import logging
 import argparse
 import os
+import sys
 import json
 import csv
-from modules.cheshirecat_api import CheshireCatAPI
-from modules.anythingllm_api import AnythingLLMAPI
-from modules.evaluator_gpt import EvaluatorGPT
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from modules.adapter_registry import available_adapters, get_adapter
+from modules.credentials import get_api_key
+from modules.dispatcher import QuestionDispatcher
+from modules.response_recorder import ResponseRecorder
+from modules.latency_report import LatencyTracker
+from modules.load_generator import LoadGenerator
+from modules.ingestion import DocumentIngestor, file_sha256
+from modules.judge_backend import JUDGE_BACKENDS, JudgeBackend
+from modules.local_metrics import LocalScorer
+from modules.chunking_sweep import ChunkingSweep, expand_grid
+from modules.conversation import REPLAY_PREFIX, SESSION_MODES, ConversationDepth, SessionPolicy, conversation_documents, load_conversations
+from modules.question_dataset import GENERIC_FILE, NO_EXPECTED_RESPONSE, count_records, iter_questions, list_documents, parse_shard, write_questions
+from modules.shard_coordinator import ShardCoordinator, split_ranges
+from modules.run_manifest import RunManifest
+from modules.result_sink import StreamingResultWriter, dump_json_array, iter_jsonl
 
 
 def load_config(config_file: str) -> dict:
@@ -35,25 +52,14 @@ def parse_api_keys(api_key_args: list) -> dict:
     return api_keys
 
 
-def get_api_key(api_key_file_path: str) -> str:
-    """Retrieve the API key from a file."""
-    if os.path.exists(api_key_file_path):
-        try:
-            with open(api_key_file_path, 'r') as file:
-                return file.read().strip()
-        except IOError as e:
-            logging.error(f"Error reading API key from file {api_key_file_path}: {e}")
-            raise
-    else:
-        logging.error(f"API key non provided as flag and file {api_key_file_path} not found.")
-        raise ValueError(f"API key is missing. Provide it as an argument or in the {api_key_file_path} file.")
+RESULT_FIELDNAMES = ['framework', 'filename', 'file_path', 'question', 'text_response', 'full_response', 'expected_response', 'timing', 'tags', 'session']
 
 
 def save_results_to_csv(results, filename='test_results.csv', results_dir='results'):
     """Save test results to a CSV file inside results_dir directory."""
     os.makedirs(results_dir, exist_ok=True)
     file_path = os.path.join(results_dir, filename)
-    fieldnames = ['framework', 'filename', 'file_path', 'question', 'text_response', 'full_response', 'expected_response']
+    fieldnames = RESULT_FIELDNAMES
     try:
         with open(file_path, 'w', newline='') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -77,55 +83,658 @@ def save_results_to_json(results, filename='test_results.json', results_dir='res
         logging.error(f"Error saving results to {file_path}: {e}")
 
 
-def run_tests(api_module, framework_name, generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses):
-    """Run the tests for generic questions and file-specific questions."""
-    results = []
-
-    # Test generic questions
-    for i, question in enumerate(generic_questions):
-        response = api_module.send_message(question)
-        results.append({
-            'framework': framework_name,
-            'filename': "generic question",
-            'file_path': "N/A",
-            'question': question,
-            'text_response': response.get('text_response', {}),
-            'full_response': response.get('full_response', {}),
-            'expected_response': generic_expected_responses[i] if i < len(generic_expected_responses) else 'No expected response available'
-        })
-
-    # Test document upload and specific questions
+def build_result(framework_name, filename, file_path, question, expected_response, response, tags=None, session=None):
+    """Build a result record from a framework response."""
+    return {
+        'framework': framework_name,
+        'filename': filename,
+        'file_path': file_path,
+        'question': question,
+        # Clients that only return the raw response are parsed by their adapter
+        'text_response': response['text_response'] if 'text_response' in response else get_adapter(framework_name).parse_response(response.get('full_response', {})),
+        'full_response': response.get('full_response', {}),
+        'expected_response': expected_response,
+        'timing': response.get('timing', {}),
+        'tags': tags or [],
+        'session': session or {}
+    }
+
+
+def session_record(framework_name, response, session_id, conversation=None, turn=None, history_chars=None):
+    """Return the session fields of a result: its session, its turn in a conversation and the token usage the framework reported."""
+    usage = get_adapter(framework_name).token_usage(response.get('full_response', {}))
+    return {'id': session_id, 'conversation': conversation, 'turn': turn, 'history_chars': history_chars, **usage}
+
+
+def get_expected_response(expected_responses, i):
+    """Return the i-th expected response or a placeholder when it is missing."""
+    return expected_responses[i] if i < len(expected_responses) else NO_EXPECTED_RESPONSE
+
+
+def iter_test_stages(generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses):
+    """Yield (file_path to upload or None, question jobs) stages in the order the tests must run."""
+    # Generic questions are asked before any document is uploaded
+    generic_jobs = [
+        (GENERIC_FILE, "N/A", question, get_expected_response(generic_expected_responses, i), [])
+        for i, question in enumerate(generic_questions)
+    ]
+    yield None, generic_jobs
+
+    # Each file is uploaded before its specific questions
     for filename in dataset_files:
         file_path = os.path.join(dataset_folder, filename)
-        upload_result = api_module.upload_document(file_path)
-
         specific_questions = file_specific_questions.get(filename, [])
         expected_responses = file_expected_responses.get(filename, [])
 
-        for i, question in enumerate(specific_questions):
-            response = api_module.send_message(question)
-            results.append({
-                'framework': framework_name,
-                'filename': filename,
-                'file_path': file_path,
-                'question': question,
-                'text_response': response.get('text_response', {}),
-                'full_response': response.get('full_response', {}),
-                "expected_response": expected_responses[i] if i < len(expected_responses) else 'No expected response available'
-            })
+        specific_jobs = [
+            (filename, file_path, question, get_expected_response(expected_responses, i), [])
+            for i, question in enumerate(specific_questions)
+        ]
+        yield file_path, specific_jobs
+
+
+def iter_stream_stages(dataset_folder, dataset_files, question_records):
+    """Yield the stages of a streamed question set: every document is uploaded first, then the questions are asked in file order."""
+    for filename in dataset_files:
+        yield os.path.join(dataset_folder, filename), []
+    jobs = (
+        (record['file'], "N/A" if record['file'] == GENERIC_FILE else os.path.join(dataset_folder, record['file']), record['question'], record['expected_answer'], record['tags'])
+        for record in question_records
+    )
+    yield None, jobs
+
+
+def count_questions(generic_questions, dataset_files, file_specific_questions):
+    """Return the total number of questions of a test suite."""
+    return len(generic_questions) + sum(len(file_specific_questions.get(filename, [])) for filename in dataset_files)
+
+
+def run_tests(api_module, framework_name, generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses, max_concurrency=1, sink=None, manifest=None, tracker=None, ingestor=None, question_records=None, sessions=None, stream=False, ingest_first=False):
+    """Run the tests for generic questions and file-specific questions, writing results to the sink when one is given."""
+    dispatcher = QuestionDispatcher(max_in_flight=max_concurrency)
+    send = api_module.stream_message if stream else api_module.send_message
+    results = []
+    answered = 0
+    # A streamed question set is never counted, so it is not read twice
+    total_questions = count_questions(generic_questions, dataset_files, file_specific_questions) if question_records is None else None
+    ingested = False
+    if ingest_first and ingestor is not None:
+        # The generic questions are then asked against the whole dataset, not an empty collection
+        ingestor.ingest([os.path.join(dataset_folder, filename) for filename in dataset_files])
+        ingested = True
+
+    def ask(indexed_job):
+        index, (filename, file_path, question, expected_response, tags) = indexed_job
+        key = RunManifest.question_key(framework_name, filename, question, index) if manifest else None
+        if key and manifest.is_done(key):
+            return manifest.get(key)
+        session_id = sessions.session_for(framework_name, filename, question) if sessions else None
+        response = send(question, session_id=session_id)
+        if tracker is not None:
+            tracker.record(framework_name, 'send_message', response.get('timing'))
+        result = build_result(framework_name, filename, file_path, question, expected_response, response, tags, session_record(framework_name, response, session_id))
+        if key and 'error' not in result['full_response']:
+            manifest.mark_done(key, result)
+        return result
+
+    if question_records is None:
+        stages = iter_test_stages(generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses)
+    else:
+        stages = iter_stream_stages(dataset_folder, dataset_files, question_records)
+    for upload_path, jobs in stages:
+        upload_key = RunManifest.upload_key(framework_name, os.path.basename(upload_path)) if upload_path and manifest else None
+        if upload_path and ingestor is not None:
+            # All documents are ingested together before the first file-specific question
+            if not ingested:
+                ingestor.ingest([os.path.join(dataset_folder, filename) for filename in dataset_files])
+                ingested = True
+        elif upload_key and manifest.is_done(upload_key):
+            logging.info(f"[{framework_name}] Skipping upload of {upload_path}, already completed in this run.")
+        elif upload_path:
+            upload_result = api_module.upload_document(upload_path)
+            if tracker is not None:
+                tracker.record(framework_name, 'upload_document', upload_result.get('timing'))
+            if upload_key and 'error' not in upload_result:
+                manifest.mark_done(upload_key)
+        for result in dispatcher.imap(ask, enumerate(jobs)):
+            if sink is not None:
+                sink.write(result)
+            else:
+                results.append(result)
+            answered += 1
+            logging.info(f"[{framework_name}] Progress: {answered}/{total_questions or '?'} questions answered.")
 
     return results
 
 
+async def run_tests_async(api_module, framework_name, generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses, max_concurrency=1, sink=None, manifest=None, tracker=None, ingestor=None, question_records=None, sessions=None):
+    """Run the tests with an async client, keeping up to max_concurrency questions in flight."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    window_size = max(1, max_concurrency) * 2
+    results = []
+    answered = 0
+    # A streamed question set is never counted, so it is not read twice
+    total_questions = count_questions(generic_questions, dataset_files, file_specific_questions) if question_records is None else None
+    ingested = False
+    loop = asyncio.get_running_loop()
+
+    async def ask(index, job):
+        filename, file_path, question, expected_response, tags = job
+        key = RunManifest.question_key(framework_name, filename, question, index) if manifest else None
+        if key and manifest.is_done(key):
+            result = manifest.get(key)
+        else:
+            session_id = sessions.session_for(framework_name, filename, question) if sessions else None
+            async with semaphore:
+                response = await api_module.send_message(question, session_id=session_id)
+            if tracker is not None:
+                tracker.record(framework_name, 'send_message', response.get('timing'))
+            result = build_result(framework_name, filename, file_path, question, expected_response, response, tags, session_record(framework_name, response, session_id))
+            if key and 'error' not in result['full_response']:
+                # The journal is fsynced, which would block every question in flight if done on the event loop
+                await loop.run_in_executor(None, manifest.mark_done, key, result)
+        return result
+
+    def collect(result):
+        # Results are written in job order, as they are awaited, not in the order the tasks complete
+        if sink is not None:
+            sink.write(result)
+        else:
+            results.append(result)
+
+    if question_records is None:
+        stages = iter_test_stages(generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses)
+    else:
+        stages = iter_stream_stages(dataset_folder, dataset_files, question_records)
+    for upload_path, jobs in stages:
+        upload_key = RunManifest.upload_key(framework_name, os.path.basename(upload_path)) if upload_path and manifest else None
+        if upload_path and ingestor is not None:
+            # All documents are ingested together before the first file-specific question
+            if not ingested:
+                await ingestor.ingest_async([os.path.join(dataset_folder, filename) for filename in dataset_files])
+                ingested = True
+        elif upload_key and manifest.is_done(upload_key):
+            logging.info(f"[{framework_name}] Skipping upload of {upload_path}, already completed in this run.")
+        elif upload_path:
+            upload_result = await api_module.upload_document(upload_path)
+            if tracker is not None:
+                tracker.record(framework_name, 'upload_document', upload_result.get('timing'))
+            if upload_key and 'error' not in upload_result:
+                await loop.run_in_executor(None, manifest.mark_done, upload_key)
+        # A bounded window of tasks, awaited in job order, so lazy job streams are never fully materialised
+        pending = deque()
+        for index, job in enumerate(jobs):
+            pending.append(asyncio.ensure_future(ask(index, job)))
+            if len(pending) >= window_size:
+                collect(await pending.popleft())
+                answered += 1
+        while pending:
+            collect(await pending.popleft())
+            answered += 1
+        logging.info(f"[{framework_name}] Progress: {answered}/{total_questions or '?'} questions answered.")
+
+    return results
+
+
+def run_conversations(api_module, framework_name, conversations, dataset_folder, sessions, max_concurrency=1, sink=None, manifest=None, tracker=None, ingestor=None, upload=True, stream=False):
+    """Run scripted conversations, each in its own session with its turns asked in order; up to max_concurrency conversations run side by side."""
+    dispatcher = QuestionDispatcher(max_in_flight=max_concurrency)
+    send = api_module.stream_message if stream else api_module.send_message
+    depth = ConversationDepth()
+    results = []
+    answered = 0
+
+    file_paths = [os.path.join(dataset_folder, filename) for filename in conversation_documents(conversations)] if upload else []
+    if ingestor is not None:
+        ingestor.ingest(file_paths)
+    else:
+        for file_path in file_paths:
+            upload_key = RunManifest.upload_key(framework_name, os.path.basename(file_path)) if manifest else None
+            if upload_key and manifest.is_done(upload_key):
+                logging.info(f"[{framework_name}] Skipping upload of {file_path}, already completed in this run.")
+                continue
+            upload_result = api_module.upload_document(file_path)
+            if tracker is not None:
+                tracker.record(framework_name, 'upload_document', upload_result.get('timing'))
+            if upload_key and 'error' not in upload_result:
+                manifest.mark_done(upload_key)
+
+    def converse(conversation):
+        key = RunManifest.conversation_key(framework_name, conversation['id']) if manifest else None
+        if key and manifest.is_done(key):
+            return manifest.get(key)
+        # A conversation that was interrupted starts over in a new session when the run is resumed
+        session_id = sessions.session_id(framework_name, 'conversation', conversation['id'])
+        file_path = "N/A" if conversation['file'] == GENERIC_FILE else os.path.join(dataset_folder, conversation['file'])
+        conversation_results = []
+        history_chars = 0
+        for turn, item in enumerate(conversation['turns'], start=1):
+            response = send(item['question'], session_id=session_id)
+            if tracker is not None:
+                tracker.record(framework_name, 'send_message', response.get('timing'))
+            session = session_record(framework_name, response, session_id, conversation['id'], turn, history_chars)
+            result = build_result(framework_name, conversation['file'], file_path, item['question'], item['expected_answer'], response, conversation['tags'], session)
+            # Characters of the earlier turns, a proxy of the prompt growth when the framework reports no token usage
+            history_chars += len(item['question']) + len(str(result['text_response']))
+            conversation_results.append(result)
+        if key and all('error' not in result['full_response'] for result in conversation_results):
+            manifest.mark_done(key, conversation_results)
+        return conversation_results
+
+    for conversation_results in dispatcher.imap(converse, conversations):
+        for result in conversation_results:
+            depth.add(result)
+            if sink is not None:
+                sink.write(result)
+            else:
+                results.append(result)
+        answered += 1
+        logging.info(f"[{framework_name}] Progress: {answered}/{len(conversations)} conversations completed.")
+
+    if tracker is not None:
+        tracker.attach(framework_name, 'conversation_depth', depth.report())
+    return results
+
+
+def create_sessions(config: dict, args, recorder=None) -> SessionPolicy:
+    """Create the session policy of a suite from the sessions section and the command line."""
+    sessions_config = config.get('sessions', {})
+    replay_prefix = sessions_config.get('prefix') or REPLAY_PREFIX
+    # A recording run asks in fresh sessions, which the recorder files under the fixed ids a replay will send
+    prefix = replay_prefix if args.replay_mode == 'replay' else sessions_config.get('prefix')
+    sessions = SessionPolicy(mode=args.session_mode or sessions_config.get('mode', 'per_question'), prefix=prefix)
+    if recorder is not None and args.replay_mode == 'record':
+        recorder.alias_sessions(sessions.prefix, replay_prefix)
+    return sessions
+
+
+def stream_answers(framework_name: str, config: dict, args) -> bool:
+    """Return whether the answers of a framework are streamed token by token."""
+    return args.stream_answers or config[framework_name].get('stream', False)
+
+
+def create_recorder(args, framework_name: str):
+    """Create the response recorder of a framework, or None when record/replay is off."""
+    if args.replay_mode == 'off':
+        return None
+    return ResponseRecorder(os.path.join(args.replay_dir, framework_name), mode=args.replay_mode)
+
+
+def create_client(framework_name: str, config: dict, args, api_keys: dict, asynchronous: bool = False):
+    """Create the sync or async API client of a framework through its adapter."""
+    return get_adapter(framework_name).create_client(config, args, api_keys, recorder=create_recorder(args, framework_name), asynchronous=asynchronous)
+
+
+def create_ingestor(framework_name: str, api_module, config: dict, manifest=None, tracker=None):
+    """Create the ingestion stage of a framework, or None to upload each document before its questions."""
+    ingestion_config = config.get('ingestion', {})
+    if not ingestion_config.get('enabled', False):
+        return None
+    target = f"{framework_name}:{api_module.base_url}"
+    if getattr(api_module, 'workspace_slug', None):
+        target += f"/{api_module.workspace_slug}"
+    return DocumentIngestor(
+        api_module,
+        framework_name,
+        target,
+        registry_path=ingestion_config.get('registry_path'),
+        max_concurrency=ingestion_config.get('max_concurrency', 4),
+        dedup=ingestion_config.get('dedup', True),
+        wait=ingestion_config.get('wait', True),
+        poll_interval=ingestion_config.get('poll_interval', 2),
+        timeout=ingestion_config.get('timeout', 600),
+        manifest=manifest,
+        tracker=tracker
+    )
+
+
+def dataset_arguments(config: dict, args) -> dict:
+    """Return the dataset arguments of run_tests, from the questions file when one is given, otherwise from config.json."""
+    dataset = config['dataset']
+    questions_file = args.questions_file or dataset.get('questions_file')
+    arguments = {
+        'generic_questions': dataset.get('generic_questions', []),
+        'generic_expected_responses': dataset.get('generic_expected_responses', []),
+        'dataset_folder': dataset['path'],
+        'dataset_files': dataset.get('file_names', []),
+        'file_specific_questions': dataset.get('file_specific_questions', {}),
+        'file_expected_responses': dataset.get('file_expected_responses', {})
+    }
+    if questions_file:
+        start, stop = parse_shard(args.shard)
+        logging.info(f"Reading questions {start}:{stop if stop is not None else ''} from {questions_file}")
+        # Only the documents of the shard are uploaded; the questions themselves are read lazily while they are asked
+        arguments['dataset_files'] = list_documents(questions_file, start, stop)
+        arguments['question_records'] = iter_questions(questions_file, start, stop)
+    if args.no_upload:
+        arguments['dataset_files'] = []
+    return arguments
+
+
+def run_framework_suite(framework_name: str, config: dict, args, api_keys: dict, sink=None, manifest=None, tracker=None) -> list:
+    """Create the client for a framework and run the whole test suite against it."""
+    if tracker is not None:
+        tracker.start(framework_name)
+    try:
+        conversations_file = args.conversations or config.get('sessions', {}).get('conversations_file')
+        if conversations_file:
+            return run_framework_conversations(framework_name, conversations_file, config, args, api_keys, sink=sink, manifest=manifest, tracker=tracker)
+
+        stream = stream_answers(framework_name, config, args)
+        if args.async_clients and stream:
+            logging.warning(f"[{framework_name}] Streamed answers are read with the sync client.")
+        elif args.async_clients:
+            return asyncio.run(run_framework_suite_async(framework_name, config, args, api_keys, sink=sink, manifest=manifest, tracker=tracker))
+
+        api_module = create_client(framework_name, config, args, api_keys)
+
+        max_concurrency = config[framework_name].get('max_concurrency', 1)
+
+        logging.info(f"Running tests for {framework_name} API...")
+        return run_tests(api_module, framework_name, **dataset_arguments(config, args), max_concurrency=max_concurrency, sink=sink, manifest=manifest, tracker=tracker, ingestor=create_ingestor(framework_name, api_module, config, manifest, tracker), sessions=create_sessions(config, args, getattr(api_module, 'recorder', None)), stream=stream)
+    finally:
+        if tracker is not None:
+            tracker.stop(framework_name)
+
+
+async def run_framework_suite_async(framework_name: str, config: dict, args, api_keys: dict, sink=None, manifest=None, tracker=None) -> list:
+    """Run the whole test suite of a framework with its async client."""
+    max_concurrency = config[framework_name].get('max_concurrency', 1)
+
+    async with create_client(framework_name, config, args, api_keys, asynchronous=True) as api_module:
+        logging.info(f"Running async tests for {framework_name} API...")
+        return await run_tests_async(api_module, framework_name, **dataset_arguments(config, args), max_concurrency=max_concurrency, sink=sink, manifest=manifest, tracker=tracker, ingestor=create_ingestor(framework_name, api_module, config, manifest, tracker), sessions=create_sessions(config, args, getattr(api_module, 'recorder', None)))
+
+
+def run_framework_conversations(framework_name: str, conversations_file: str, config: dict, args, api_keys: dict, sink=None, manifest=None, tracker=None) -> list:
+    """Run the scripted conversations of a file against a framework."""
+    if args.async_clients:
+        logging.warning(f"[{framework_name}] Scripted conversations run with the sync client.")
+    stream = stream_answers(framework_name, config, args)
+    api_module = create_client(framework_name, config, args, api_keys)
+    max_concurrency = config[framework_name].get('max_concurrency', 1)
+
+    logging.info(f"Running scripted conversations for {framework_name} API...")
+    return run_conversations(api_module, framework_name, load_conversations(conversations_file), config['dataset']['path'], create_sessions(config, args, getattr(api_module, 'recorder', None)), max_concurrency=max_concurrency, sink=sink, manifest=manifest, tracker=tracker, ingestor=create_ingestor(framework_name, api_module, config, manifest, tracker), upload=not args.no_upload, stream=stream)
+
+
+def run_framework_suites(frameworks: list, config: dict, args, api_keys: dict, parallel: bool = False, sink=None, manifest=None, tracker=None) -> list:
+    """Run the suites of the selected frameworks and merge their results in framework order."""
+    if not parallel or len(frameworks) < 2:
+        all_results = []
+        for framework_name in frameworks:
+            all_results.extend(run_framework_suite(framework_name, config, args, api_keys, sink=sink, manifest=manifest, tracker=tracker))
+        return all_results
+
+    def run_isolated(framework_name):
+        try:
+            return run_framework_suite(framework_name, config, args, api_keys, sink=sink, manifest=manifest, tracker=tracker)
+        except Exception as e:
+            logging.error(f"[{framework_name}] Test suite failed, its results are skipped: {e}")
+            return []
+
+    logging.info(f"Running test suites in parallel for: {', '.join(frameworks)}")
+    with ThreadPoolExecutor(max_workers=len(frameworks), thread_name_prefix='suite') as executor:
+        suite_results = list(executor.map(run_isolated, frameworks))
+
+    # executor.map keeps the order of frameworks, so the merge does not depend on which suite finishes first
+    all_results = []
+    for results in suite_results:
+        all_results.extend(results)
+    return all_results
+
+
+def run_load_test(framework_name: str, config: dict, args, api_keys: dict) -> dict:
+    """Replay the configured questions against a framework at increasing load levels."""
+    load_config = config.get('load_test', {})
+    dataset = config['dataset']
+    api_module = create_client(framework_name, config, args, api_keys)
+
+    if load_config.get('upload_documents', False):
+        file_paths = [os.path.join(dataset['path'], filename) for filename in dataset['file_names']]
+        ingestor = create_ingestor(framework_name, api_module, config)
+        if ingestor is not None:
+            ingestor.ingest(file_paths)
+        else:
+            for file_path in file_paths:
+                api_module.upload_document(file_path)
+
+    questions = list(dataset['generic_questions'])
+    for filename in dataset['file_names']:
+        questions.extend(dataset['file_specific_questions'].get(filename, []))
+
+    generator = LoadGenerator(
+        api_module,
+        questions,
+        mode=load_config.get('mode', 'open'),
+        levels=load_config.get('levels'),
+        step_duration=load_config.get('step_duration', 30),
+        max_workers=load_config.get('max_workers', 64),
+        arrival=load_config.get('arrival', 'poisson'),
+        seed=load_config.get('seed')
+    )
+    logging.info(f"Running {generator.mode} loop load test for {framework_name} API...")
+    steps = generator.run()
+    return {'framework': framework_name, 'mode': generator.mode, 'saturation_level': LoadGenerator.saturation_level(steps), 'steps': steps}
+
+
+def create_evaluator(config: dict, args, api_keys: dict, manifest=None):
+    """Create the evaluator and the score cache it uses, if any."""
+    # The evaluator is only imported when there is something to evaluate
+    from modules.evaluator_gpt import EvaluatorGPT
+    from modules.score_cache import ScoreCache
+
+    judge_config = dict(config['evaluator'].get('judge', {}))
+    if args.judge_backend:
+        judge_config['backend'] = args.judge_backend
+    if args.judge_model:
+        judge_config['model'] = args.judge_model
+    judge = JudgeBackend(**judge_config)
+
+    local_config = dict(config['evaluator'].get('local_metrics', {}))
+    if args.short_circuit:
+        local_config.update(enabled=True, short_circuit=True)
+    local_scorer = LocalScorer(**local_config) if local_config.pop('enabled', False) else None
+
+    evaluator_api_key = api_keys.get('evaluator')
+    # Local and stub judges run offline, without an OpenAI key
+    if not evaluator_api_key and judge.needs_openai_key:
+        evaluator_api_key = get_api_key(config['evaluator']['api_key_file_path'])
+    logging.debug(f"evaluator api_key: {evaluator_api_key}")
+
+    cache_config = config['evaluator'].get('cache')
+    score_cache = ScoreCache(**cache_config) if cache_config and not args.no_cache else None
+    evaluator = EvaluatorGPT(api_key=evaluator_api_key, max_workers=config['evaluator'].get('max_workers', 1), cache=score_cache, manifest=manifest, judge=judge, local_scorer=local_scorer)
+    return evaluator, score_cache
+
+
+def run_chunking_sweep(framework_name: str, config: dict, args, api_keys: dict, evaluator) -> list:
+    """Ingest the dataset under every chunking setting of the grid, then ask and evaluate the questions for each one."""
+    sweep_config = config.get('chunking_sweep', {})
+    max_concurrency = config[framework_name].get('max_concurrency', 1)
+    ingestion_config = config.get('ingestion', {})
+    api_module = create_client(framework_name, config, args, api_keys)
+    results_dir = os.path.join(args.results_dir, 'chunking_sweep', framework_name)
+
+    def run_suite(api_module, collection):
+        tracker = LatencyTracker()
+        # Every setting starts from an empty collection, so there is nothing to deduplicate against; it is filled before any question
+        ingestor = DocumentIngestor(api_module, framework_name, api_module.base_url, max_concurrency=ingestion_config.get('max_concurrency', 4), dedup=False, poll_interval=ingestion_config.get('poll_interval', 2), timeout=ingestion_config.get('timeout', 600), tracker=tracker)
+        results = run_tests(api_module, framework_name, **dataset_arguments(config, args), max_concurrency=max_concurrency, tracker=tracker, ingestor=ingestor, sessions=create_sessions(config, args, getattr(api_module, 'recorder', None)), ingest_first=True)
+        save_results_to_json(results, results_dir=os.path.join(results_dir, collection))
+        return results, tracker.summary().get(framework_name, {}).get('ingestion', {})
+
+    def evaluate(results, collection):
+        if evaluator is None:
+            return []
+        evaluation_results = evaluator.evaluate_model(data_interaction=results)
+        save_results_to_json(evaluation_results, filename='evaluation_results.json', results_dir=os.path.join(results_dir, collection))
+        return evaluation_results
+
+    sweep = ChunkingSweep(
+        api_module,
+        framework_name,
+        expand_grid(sweep_config.get('chunk_sizes', [512]), sweep_config.get('chunk_overlaps', [64])),
+        run_suite,
+        evaluate,
+        collection_prefix=sweep_config.get('collection_prefix', 'scarf-sweep'),
+        embedding_dim=sweep_config.get('embedding_dim'),
+        cleanup=sweep_config.get('cleanup', False),
+        allow_wipe=args.allow_wipe
+    )
+    logging.info(f"Running chunking sweep for {framework_name} API over {len(sweep.settings)} settings...")
+    rows = sweep.run()
+    os.makedirs(args.results_dir, exist_ok=True)
+    ChunkingSweep.save(rows, os.path.join(args.results_dir, f'chunking_sweep_{framework_name}.json'), os.path.join(args.results_dir, f'chunking_sweep_{framework_name}.csv'))
+    return rows
+
+
+def iter_streamed_results(path: str, frameworks: list):
+    """Lazily read streamed results back in framework order."""
+    for framework_name in frameworks:
+        for result in iter_jsonl(path):
+            if result['framework'] == framework_name:
+                yield result
+
+
+def store_run(config: dict, args, run_id: str, results, evaluations=None) -> None:
+    """Add the results and evaluations of a run to the columnar result store, when it is enabled."""
+    store_config = config.get('result_store', {})
+    if not (store_config.get('enabled', False) or args.store):
+        return
+    # pyarrow is only imported when the store is used
+    from modules.columnar_store import ResultStore
+    ResultStore(store_config.get('path') or os.path.join(args.results_dir, 'store')).write_run(run_id, results=results, evaluations=evaluations)
+
+
+def run_metadata(config: dict, args) -> dict:
+    """Return the inputs the completed units of a run depend on, so a resumed run can be checked against them."""
+    questions_file = args.questions_file or config['dataset'].get('questions_file')
+    return {
+        'config': args.config,
+        'config_sha256': file_sha256(args.config),
+        'api': args.api,
+        'questions_file': questions_file,
+        'questions_sha256': file_sha256(questions_file) if questions_file else None,
+        'conversations': args.conversations,
+        'conversations_sha256': file_sha256(args.conversations) if args.conversations else None,
+        'shard': args.shard
+    }
+
+
+def export_inline_questions(config: dict, path: str) -> int:
+    """Write the questions of config.json to a JSONL question file, so they can be split into shards."""
+    dataset = config['dataset']
+    stages = iter_test_stages(dataset['generic_questions'], dataset['generic_expected_responses'], dataset['path'], dataset['file_names'], dataset['file_specific_questions'], dataset['file_expected_responses'])
+    records = (
+        {'file': '' if filename == GENERIC_FILE else filename, 'question': question, 'expected_answer': expected_response, 'tags': tags}
+        for _, jobs in stages
+        for filename, _, question, expected_response, tags in jobs
+    )
+    return write_questions(records, path)
+
+
+def worker_command(args, questions_file: str) -> list:
+    """Return the command line of a worker process running one shard of the question file."""
+    command = [sys.executable, os.path.abspath(__file__), '--config', args.config, '--api', args.api, '--questions-file', questions_file, '--no-upload', '--replay-mode', args.replay_mode, '--replay-dir', args.replay_dir]
+    if args.apikey:
+        command += ['--apikey'] + args.apikey
+    for option in ('username', 'password', 'judge_backend', 'judge_model', 'session_mode', 'conversations', 'loglevel'):
+        if getattr(args, option):
+            command += ['--' + option.replace('_', '-'), getattr(args, option)]
+    for flag in ('parallel_frameworks', 'no_cache', 'no_eval', 'short_circuit', 'async_clients', 'stream_answers', 'stream_results', 'fsync_results', 'store', 'allow_wipe', 'no_checkpoint'):
+        if getattr(args, flag):
+            command.append('--' + flag.replace('_', '-'))
+    return command
+
+
+def ingest_shared_documents(frameworks: list, config: dict, args, api_keys: dict, questions_file: str) -> None:
+    """Upload the documents of the question file once, before the workers start asking questions."""
+    file_paths = [os.path.join(config['dataset']['path'], filename) for filename in list_documents(questions_file)]
+    for framework_name in frameworks:
+        api_module = create_client(framework_name, config, args, api_keys)
+        ingestor = create_ingestor(framework_name, api_module, config)
+        if ingestor is not None:
+            ingestor.ingest(file_paths)
+        else:
+            for file_path in file_paths:
+                api_module.upload_document(file_path)
+
+
+def run_distributed(frameworks: list, config: dict, args, api_keys: dict) -> bool:
+    """Split the question set into shards, run them in worker processes and merge their results; return whether every shard succeeded."""
+    distributed_config = config.get('distributed', {})
+    shard_root = os.path.join(args.results_dir, 'shards')
+    os.makedirs(shard_root, exist_ok=True)
+    coordinator = ShardCoordinator([], shard_root, [])
+
+    if not args.merge_shards:
+        questions_file = args.questions_file or config['dataset'].get('questions_file')
+        if not questions_file:
+            questions_file = os.path.join(shard_root, 'questions.jsonl')
+            export_inline_questions(config, questions_file)
+        if not args.no_upload:
+            ingest_shared_documents(frameworks, config, args, api_keys, questions_file)
+
+        shards = distributed_config.get('shards') or args.workers
+        coordinator = ShardCoordinator(
+            worker_command(args, questions_file),
+            shard_root,
+            split_ranges(count_records(questions_file), shards),
+            workers=args.workers,
+            max_retries=distributed_config.get('max_retries', 2)
+        )
+        statuses = coordinator.run()
+        save_results_to_json(statuses, filename='shards.json', results_dir=args.results_dir)
+        succeeded = all(status['succeeded'] for status in statuses)
+    else:
+        succeeded = True
+
+    save_results_to_csv(coordinator.iter_merged('test_results.json', frameworks), results_dir=args.results_dir)
+    dump_json_array(coordinator.iter_merged('test_results.json', frameworks), os.path.join(args.results_dir, 'test_results.json'))
+    if not args.no_eval:
+        dump_json_array(coordinator.iter_merged('evaluation_results.json', frameworks), os.path.join(args.results_dir, 'evaluation_results.json'))
+    logging.info(f"Shard results merged into {args.results_dir}.")
+    return succeeded
+
+
 def main():
     parser = argparse.ArgumentParser(description='API Test Runner')
     parser.add_argument('--apikey', type=str, nargs='+', help='API key(s) for authentication in the format module_name:api_key')
     parser.add_argument('--config', type=str, default='./config.json', help='Path to the configuration file')
-    parser.add_argument('--api', type=str, choices=['cheshirecat', 'anythingllm', 'all'], default='all', help='Select the API to test')
+    parser.add_argument('--api', type=str, choices=available_adapters() + ['all'], default='all', help='Select the API to test')
     parser.add_argument('--username', type=str, help='Username for CheshireCat API', required=False)
     parser.add_argument('--password', type=str, help='Password for CheshireCat API', required=False)
+    parser.add_argument('--parallel-frameworks', action='store_true', help='Run the framework test suites side by side instead of one after the other')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the evaluation score cache configured in the configuration file')
+    parser.add_argument('--replay-mode', type=str, choices=ResponseRecorder.MODES, default='off', help='Record framework responses to disk or replay them without network calls')
+    parser.add_argument('--replay-dir', type=str, default='./results/replay', help='Directory of the recorded framework responses')
+    parser.add_argument('--async-clients', action='store_true', help='Use the asyncio clients, keeping up to max_concurrency questions in flight from a single thread')
+    parser.add_argument('--stream-answers', action='store_true', help='Read the answers token by token, from the AnythingLLM streaming chat and the Cheshire Cat websocket, and report time to first token')
+    parser.add_argument('--stream-results', action='store_true', help='Append results to JSONL/CSV files as they complete instead of keeping them in memory')
+    parser.add_argument('--fsync-results', action='store_true', help='fsync the streamed result files after every record')
+    parser.add_argument('--no-checkpoint', action='store_true', help='Do not checkpoint the run, so it cannot be resumed, even when checkpoint is enabled in the configuration file')
+    parser.add_argument('--resume', type=str, metavar='RUN_ID', help='Resume an interrupted run, skipping the uploads, questions and evaluations it already completed')
+    parser.add_argument('--load-test', action='store_true', help='Run the load test configured in the load_test section instead of the quality benchmark')
+    parser.add_argument('--chunking-sweep', action='store_true', help='Re-ingest the dataset under every chunking setting of the chunking_sweep section into isolated collections and compare ingestion cost with answer quality')
+    parser.add_argument('--allow-wipe', action='store_true', help='Let the chunking sweep wipe the declarative memory of Cheshire Cat, which deletes every document it holds')
+    parser.add_argument('--questions-file', type=str, help='JSONL or CSV question set (file, question, expected_answer, tags) read lazily instead of the dataset questions in the configuration file')
+    parser.add_argument('--shard', type=str, metavar='START:STOP', help='Only run the question records in this range of the questions file')
+    parser.add_argument('--no-eval', action='store_true', help='Only collect the framework responses, without loading or running the evaluator')
+    parser.add_argument('--results-dir', type=str, default='results', help='Directory the results, summaries and run checkpoints are written to')
+    parser.add_argument('--no-upload', action='store_true', help='Do not upload the documents, they are already ingested')
+    parser.add_argument('--workers', type=int, help='Coordinator mode: split the question set into shards and run them in this many worker processes')
+    parser.add_argument('--merge-shards', action='store_true', help='Only merge the shard results found under <results-dir>/shards, e.g. after running shards on several machines')
+    parser.add_argument('--store', action='store_true', help='Also add the run to the columnar result store, even when result_store is disabled in the configuration file')
+    parser.add_argument('--short-circuit', action='store_true', help='Skip the judge for empty or error answers and for answers matching the expected answer, scoring them from the local metrics')
+    parser.add_argument('--judge-backend', type=str, choices=JUDGE_BACKENDS, help='Judge the answers with OpenAI, a local OpenAI-compatible endpoint or the offline stub, instead of the evaluator judge section')
+    parser.add_argument('--judge-model', type=str, help='Judge model name, e.g. an ollama model when the judge backend is local')
+    parser.add_argument('--session-mode', type=str, choices=SESSION_MODES, help='Ask every question in its own chat session, or all of them in the framework default session, instead of the sessions section')
+    parser.add_argument('--conversations', type=str, help='JSONL file of scripted multi-turn conversations, each run in its own session, instead of the dataset questions')
     parser.add_argument('--loglevel', type=str, help='Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)')
     args = parser.parse_args()
+    if args.stream_answers and args.async_clients:
+        parser.error("--stream-answers reads the answers with the sync clients and cannot be combined with --async-clients.")
 
     # Determine logging level: flag > env var > default to INFO
     loglevel = args.loglevel or os.getenv('LOGLEVEL', 'INFO').upper()
@@ -134,71 +743,85 @@ def main():
 
     config = load_config(args.config)
     api_keys = parse_api_keys(args.apikey) if args.apikey else {}
-    all_results = []
+    # "all" runs every adapter configured in the configuration file
+    frameworks = [name for name in available_adapters() if name in config] if args.api == 'all' else [args.api]
 
-    # CheshireCat API testing
-    if args.api in ['cheshirecat', 'all']:
-        base_url = config['cheshirecat']['base_url']
-        api_key_file_path = config['cheshirecat']['api_key_file_path']
-        cheshirecat_api_key = api_keys.get('cheshirecat')
-        if not cheshirecat_api_key:
-            cheshirecat_api_key = get_api_key(api_key_file_path)
-        logging.debug(f"cheshirecat api_key: {cheshirecat_api_key}")
-        cheshirecat_username = args.username if args.username else config['cheshirecat']['username']
-        cheshirecat_password = args.password if args.password else config['cheshirecat']['password']
-
-        api_module = CheshireCatAPI(base_url=base_url, api_key=cheshirecat_api_key, username=cheshirecat_username, password=cheshirecat_password)
-
-        dataset_folder = config['dataset']['path']
-        dataset_files = config['dataset']['file_names']
-        generic_questions = config['dataset']['generic_questions']
-        generic_expected_responses = config['dataset']['generic_expected_responses']
-        file_specific_questions = config['dataset']['file_specific_questions']
-        file_expected_responses = config['dataset']['file_expected_responses']
-
-        logging.info("Running tests for CheshireCat API...")
-        cheshirecat_results = run_tests(api_module, 'cheshirecat', generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses)
-        all_results.extend(cheshirecat_results)
-
-    # AnythingLLM API testing
-    if args.api in ['anythingllm', 'all']:
-        base_url = config['anythingllm']['base_url']
-        api_key_file_path = config['anythingllm']['api_key_file_path']
-        anythingllm_api_key = api_keys.get('anythingllm')
-        if not anythingllm_api_key:
-            anythingllm_api_key = get_api_key(api_key_file_path)
-        workspace_slug = config['anythingllm']['workspace_slug']
-        logging.debug(f"anythingllm api_key: {anythingllm_api_key}")
-        api_module = AnythingLLMAPI(base_url=base_url, api_key=anythingllm_api_key, workspace_slug=workspace_slug)
-
-        dataset_folder = config['dataset']['path']
-        dataset_files = config['dataset']['file_names']
-        generic_questions = config['dataset']['generic_questions']
-        file_specific_questions = config['dataset']['file_specific_questions']
-
-        logging.info("Running tests for AnythingLLM API...")
-        anythingllm_results = run_tests(api_module, 'anythingllm', generic_questions, generic_expected_responses, dataset_folder, dataset_files, file_specific_questions, file_expected_responses)
-        all_results.extend(anythingllm_results)
-
-    # Save all results to file
-    save_results_to_csv(all_results)
-    save_results_to_json(all_results)
+    if args.workers or args.merge_shards:
+        if not run_distributed(frameworks, config, args, api_keys):
+            exit(1)
+        return
+
+    if args.chunking_sweep:
+        evaluator, score_cache = create_evaluator(config, args, api_keys) if not args.no_eval else (None, None)
+        for framework_name in frameworks:
+            run_chunking_sweep(framework_name, config, args, api_keys, evaluator)
+        if score_cache is not None:
+            score_cache.close()
+        return
+
+    if args.load_test:
+        for framework_name in frameworks:
+            report = run_load_test(framework_name, config, args, api_keys)
+            save_results_to_json(report, filename=f'load_test_{framework_name}.json', results_dir=args.results_dir)
+        return
+
+    # Runs are checkpointed so that they can be resumed after a failure, unless checkpoints are turned off
+    runs_dir = os.path.join(args.results_dir, 'runs')
+    checkpoint_config = config.get('checkpoint', {})
+    if args.resume:
+        manifest = RunManifest.resume(runs_dir, args.resume, metadata=run_metadata(config, args))
+    elif args.no_checkpoint or not checkpoint_config.get('enabled', True):
+        manifest = None
+    else:
+        manifest = RunManifest.create(runs_dir, metadata=run_metadata(config, args), keep_runs=checkpoint_config.get('keep_runs'))
+    run_id = manifest.run_id if manifest else time.strftime('%Y%m%d-%H%M%S')
+    tracker = LatencyTracker()
+    if args.stream_results:
+        # Results are appended to disk as they complete and never held in memory as a whole
+        with StreamingResultWriter(results_dir=args.results_dir, csv_filename='test_results.csv', fieldnames=RESULT_FIELDNAMES, fsync=args.fsync_results) as sink:
+            run_framework_suites(frameworks, config, args, api_keys, parallel=args.parallel_frameworks, sink=sink, manifest=manifest, tracker=tracker)
+        save_results_to_csv(iter_streamed_results(sink.jsonl_path, frameworks), results_dir=args.results_dir)
+        dump_json_array(iter_streamed_results(sink.jsonl_path, frameworks), os.path.join(args.results_dir, 'test_results.json'))
+        all_results = iter_streamed_results(sink.jsonl_path, frameworks)
+    else:
+        all_results = run_framework_suites(frameworks, config, args, api_keys, parallel=args.parallel_frameworks, manifest=manifest, tracker=tracker)
 
-    # Evaluator step
-    evaluator_api_key_file_path = config['evaluator']['api_key_file_path']
-    evaluator_api_key = api_keys.get('evaluator')
-    if not evaluator_api_key:
-        evaluator_api_key = get_api_key(evaluator_api_key_file_path)
-    logging.debug(f"evaluator api_key: {evaluator_api_key}")
+        # Save all results to file
+        save_results_to_csv(all_results, results_dir=args.results_dir)
+        save_results_to_json(all_results, results_dir=args.results_dir)
 
-    # Import evaluator and evaluate the test results
-    evaluator = EvaluatorGPT(api_key=evaluator_api_key)
+    os.makedirs(args.results_dir, exist_ok=True)
+    tracker.save(os.path.join(args.results_dir, 'latency_summary.json'))
 
-    # Perform evaluation and get the evaluation results
-    evaluation_results = evaluator.evaluate_model(data_interaction=all_results)
+    # Streamed results are read back from disk instead of being held in memory
+    stored_results = (lambda: iter_streamed_results(sink.jsonl_path, frameworks)) if args.stream_results else (lambda: all_results)
+
+    if args.no_eval:
+        logging.info("Evaluation disabled, only the framework responses were collected.")
+        store_run(config, args, run_id, stored_results())
+        if manifest:
+            manifest.finish()
+        return
 
-    # Save the evaluation results in the calling script
-    save_results_to_json(results=evaluation_results, filename='evaluation_results.json')
+    # Evaluator step
+    evaluator, score_cache = create_evaluator(config, args, api_keys, manifest=manifest)
+
+    # Perform evaluation and get the evaluation results
+    if args.stream_results:
+        with StreamingResultWriter(results_dir=args.results_dir, jsonl_filename='evaluation_results.jsonl', fsync=args.fsync_results) as eval_sink:
+            evaluator.evaluate_model(data_interaction=all_results, sink=eval_sink)
+        dump_json_array(iter_jsonl(eval_sink.jsonl_path), os.path.join(args.results_dir, 'evaluation_results.json'))
+        store_run(config, args, run_id, stored_results(), iter_jsonl(eval_sink.jsonl_path))
+    else:
+        evaluation_results = evaluator.evaluate_model(data_interaction=all_results)
+
+        # Save the evaluation results in the calling script
+        save_results_to_json(results=evaluation_results, filename='evaluation_results.json', results_dir=args.results_dir)
+        store_run(config, args, run_id, stored_results(), evaluation_results)
+    if score_cache is not None:
+        score_cache.close()
+    if manifest:
+        manifest.finish()
 
 
 if __name__ == '__main__':